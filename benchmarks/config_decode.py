@@ -0,0 +1,33 @@
+"""
+Benchmark decoding of stored blacklists, comparing the current JSON format with the Python literal
+format written by older versions. Run from the repository root:
+
+    python -m benchmarks.config_decode
+"""
+import ast
+import timeit
+from spotirec import conf
+
+SIZES = [100, 1000, 10000, 50000]
+
+
+def blacklist(size: int) -> dict:
+    return {f'spotify:track:{x:022d}': {'name': f'track{x}', 'uri': f'spotify:track:{x:022d}',
+                                        'artists': [f'artist{x}', f'artist{x + 1}']}
+            for x in range(size)}
+
+
+def best_of(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+if __name__ == '__main__':
+    print(f'{"entries":>8}  {"literal (ms)":>12}  {"json (ms)":>10}  {"speedup":>7}')
+    for size in SIZES:
+        data = blacklist(size)
+        literal, encoded = str(data), conf.encode(data)
+        number = max(1, 10000 // size)
+        literal_time = best_of(lambda: ast.literal_eval(literal), number)
+        json_time = best_of(lambda: conf.decode(encoded), number)
+        print(f'{size:>8}  {literal_time * 1000:>12.2f}  {json_time * 1000:>10.2f}  '
+              f'{literal_time / json_time:>6.1f}x')
@@ -0,0 +1,42 @@
+"""
+Benchmark removal of duplicates from seed and track lists, comparing the current linear time
+implementation with the quadratic one used by older versions. Run from the repository root:
+
+    python -m benchmarks.dedupe
+"""
+import timeit
+from spotirec import spotirec
+
+SIZES = [100, 1000, 10000, 20000]
+
+
+def filter_list_duplicates_quadratic(li: list) -> list:
+    new_li = [x['uri'] if type(x) is dict else x for x in li]
+    new_li = sorted(list(set(new_li)), key=new_li.index)
+    for x in li:
+        if type(x) is dict and x['uri'] in new_li:
+            new_li[new_li.index(x['uri'])] = x
+        elif x in new_li:
+            new_li[new_li.index(x)] = x
+    return new_li
+
+
+def tracks(size: int) -> list:
+    # Every fourth track is a duplicate, like candidates from overlapping recommendations
+    return [{'uri': f'spotify:track:{x - x // 4:022d}', 'name': f'track{x}'} for x in range(size)]
+
+
+def best_of(func, number: int) -> float:
+    return min(timeit.repeat(func, number=number, repeat=3)) / number
+
+
+if __name__ == '__main__':
+    print(f'{"items":>8}  {"quadratic (ms)":>14}  {"linear (ms)":>11}  {"speedup":>8}')
+    for size in SIZES:
+        data = tracks(size)
+        assert filter_list_duplicates_quadratic(data) == spotirec.filter_list_duplicates(data)
+        number = max(1, 1000 // size)
+        quadratic_time = best_of(lambda: filter_list_duplicates_quadratic(data), number)
+        linear_time = best_of(lambda: spotirec.filter_list_duplicates(data), number)
+        print(f'{size:>8}  {quadratic_time * 1000:>14.2f}  {linear_time * 1000:>11.2f}  '
+              f'{quadratic_time / linear_time:>7.0f}x')
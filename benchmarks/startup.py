@@ -0,0 +1,47 @@
+"""
+Benchmark startup of the CLI with python -X importtime, comparing the import time of spotirec with
+the time it would take if the lazily imported dependencies were imported eagerly. Run from the
+repository root:
+
+    python -m benchmarks.startup
+"""
+import statistics
+import subprocess
+import sys
+
+RUNS = 10
+LAZY = ['requests', 'requests.adapters', 'asyncio', 'concurrent.futures', 'uuid', 'PIL.Image',
+        'bottle', 'webbrowser']
+
+
+def import_time(modules: list) -> dict:
+    """
+    Import modules in a fresh interpreter
+    :param modules: modules to import, in order
+    :return: cumulative import time in microseconds of each top level import
+    """
+    code = '; '.join(f'import {x}' for x in modules)
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True,
+                            text=True, check=True).stderr
+    times = {}
+    for line in stderr.splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        # Only top level imports, nested imports are included in their cumulative time
+        if not name.startswith('  '):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+if __name__ == '__main__':
+    lazy = []
+    eager = []
+    for _ in range(RUNS):
+        lazy.append(import_time(['spotirec.main'])['spotirec.main'])
+        times = import_time(['spotirec.main'] + LAZY)
+        eager.append(sum(times.get(x, 0) for x in ['spotirec.main'] + LAZY))
+    lazy_time = statistics.median(lazy) / 1000
+    eager_time = statistics.median(eager) / 1000
+    print(f'{"imports":>8}  {"time (ms)":>9}')
+    print(f'{"lazy":>8}  {lazy_time:>9.1f}')
+    print(f'{"eager":>8}  {eager_time:>9.1f}')
+    print(f'speedup: {eager_time / lazy_time:.1f}x')
@@ -1,14 +1,209 @@
 #!/usr/bin/env python
+import bisect
+import functools
 import json
-import requests
+import random
+import re
 import sys
-from . import conf as sp_conf, log
+import threading
+import time
+from urllib import parse
+from . import cache as sp_cache, conf as sp_conf, lazy, log
+
+# The request stack is only imported once the first request is sent
+asyncio = lazy.LazyImport('asyncio')
+requests = lazy.LazyImport('requests')
+uuid = lazy.LazyImport('uuid')
+HTTPAdapter = lazy.LazyImport('requests.adapters', 'HTTPAdapter')
+ThreadPoolExecutor = lazy.LazyImport('concurrent.futures', 'ThreadPoolExecutor')
+
+
+def chunks(li: list, size: int) -> list:
+    """
+    Split a list into consecutive chunks of at most a given size
+    :param li: list to split
+    :param size: maximum size of each chunk
+    :return: list of chunks
+    """
+    return [li[x:x + size] for x in range(0, len(li), size)]
+
+
+class RequestScheduler:
+    """
+    Schedules requests sent to the API. Each endpoint is limited by a token bucket, and requests
+    that are rate limited (429) or fail server side (5xx) are retried with jittered exponential
+    backoff, honouring Retry-After if the API sends it. Server side failures are only retried for
+    idempotent methods, as the API may have applied e.g. a POST before failing.
+    """
+    RATE = 10.0
+    BURST = 10
+    MAX_RETRIES = 5
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 30.0
+    RETRY_CODES = [429, 500, 502, 503, 504]
+    IDEMPOTENT_METHODS = ['GET', 'PUT', 'DELETE']
+    ID_RE = r'/[a-zA-Z0-9]{22}(?=/|$)'
+    LOGGER = None
+
+    def __init__(self):
+        self.buckets = {}
+        self.blocked_until = 0.0
+        self.retries = 0
+        self.throttle_waits = 0
+        self.throttle_time = 0.0
+        self.lock = threading.Lock()
+
+    def set_logger(self, logger: log.Log):
+        self.LOGGER = logger
+
+    def endpoint(self, method: str, url: str) -> str:
+        """
+        Derive the endpoint of a request, such that requests for different objects of the same
+        type share a bucket, e.g. GET /tracks/{id}
+        :param method: request method
+        :param url: request url
+        :return: endpoint as a string
+        """
+        return f'{method} {re.sub(self.ID_RE, "/{id}", parse.urlparse(url).path)}'
+
+    def acquire(self, endpoint: str):
+        """
+        Take a token from the bucket of an endpoint, waiting until one is available. Also waits if
+        the API has asked us to back off.
+        :param endpoint: endpoint of the request
+        """
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(endpoint, (float(self.BURST), now))
+            tokens = min(float(self.BURST), tokens + (now - updated) * self.RATE)
+            wait = max(self.blocked_until - now, (1 - tokens) / self.RATE if tokens < 1 else 0.0)
+            # Reserve the token now, such that concurrent callers queue up behind this one
+            self.buckets[endpoint] = (tokens - 1, now)
+            if wait > 0:
+                self.throttle_waits += 1
+                self.throttle_time += wait
+        if wait > 0:
+            self.LOGGER.debug(f'throttling {endpoint} for {wait:.2f}s')
+            time.sleep(wait)
+
+    def backoff(self, attempt: int, retry_after=None) -> float:
+        """
+        Calculate the delay before retrying a request. Retry-After takes precedence, otherwise the
+        delay is drawn uniformly from an exponentially growing, capped window.
+        :param attempt: amount of attempts made so far, starting from 0
+        :param retry_after: value of the Retry-After header, if present
+        :return: delay in seconds
+        """
+        try:
+            return max(0.0, float(retry_after))
+        except (TypeError, ValueError):
+            return random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * 2 ** attempt))
+
+    def should_retry(self, method: str, status_code: int) -> bool:
+        """
+        Check whether a failed request may be retried
+        :param method: request method
+        :param status_code: status code of the response
+        :return: true if the request may be retried, otherwise false
+        """
+        if status_code == 429:
+            return True
+        return status_code in self.RETRY_CODES and method in self.IDEMPOTENT_METHODS
+
+    def send(self, session: 'requests.Session', method: str, url: str, **kwargs):
+        """
+        Send a request through the session, retrying it if it is rate limited or fails server
+        side. The last response is returned if all retries are exhausted.
+        :param session: session to send the request through
+        :param method: request method, e.g. GET, POST, PUT
+        :param url: request url
+        :param kwargs: keyword arguments passed on to the session
+        :return: response object
+        """
+        endpoint = self.endpoint(method, url)
+        request_id = uuid.uuid4().hex
+        attempt = 0
+        while True:
+            self.acquire(endpoint)
+            start = time.monotonic()
+            response = session.request(method, url, **kwargs)
+            duration = time.monotonic() - start
+            self.LOGGER.debug('%s: %s in %.3fs', endpoint, response.status_code, duration,
+                              request_id=request_id, duration=round(duration, 3),
+                              status_code=response.status_code, attempt=attempt)
+            if not self.should_retry(method, response.status_code) or attempt >= self.MAX_RETRIES:
+                return response
+            delay = self.backoff(attempt, response.headers.get('Retry-After'))
+            if response.status_code == 429:
+                # Rate limits apply to the whole application, so hold back every endpoint
+                with self.lock:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+                self.LOGGER.warning(f'rate limited on {endpoint}, retrying in {delay:.2f}s')
+            else:
+                self.LOGGER.warning(f'{endpoint} failed with status code {response.status_code}, '
+                                    f'retrying in {delay:.2f}s')
+            self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        """
+        Retrieve counters for retried requests and throttle waits.
+        :return: counters as a dict
+        """
+        return {'retries': self.retries, 'throttle_waits': self.throttle_waits,
+                'throttle_time': round(self.throttle_time, 3)}
+
+
+class GenreSeeds:
+    """
+    Registry of available genre seeds, supporting constant time lookup and prefix completion.
+    Iterating the registry yields genres in the order they were received from the API.
+    """
+
+    def __init__(self, genres: list):
+        self.genres = tuple(genres)
+        self.genre_set = frozenset(genres)
+        self.sorted_genres = tuple(sorted(self.genre_set))
+
+    def __contains__(self, genre: str) -> bool:
+        return genre in self.genre_set
+
+    def __iter__(self):
+        return iter(self.genres)
+
+    def __len__(self) -> int:
+        return len(self.genres)
+
+    def complete(self, prefix: str) -> list:
+        """
+        Find all genres starting with a prefix
+        :param prefix: prefix to complete
+        :return: sorted list of matching genres
+        """
+        matches = []
+        for genre in self.sorted_genres[bisect.bisect_left(self.sorted_genres, prefix):]:
+            if not genre.startswith(prefix):
+                break
+            matches.append(genre)
+        return matches
 
 
 class API:
     URL_BASE = 'https://api.spotify.com/v1'
+    POOL_SIZE = 10
+    BATCH_LIMITS = {'artists': 50, 'tracks': 50, 'albums': 20, 'audio-features': 100,
+                    'recommendations': 100}
+    PLAYLIST_CHUNK = 100
     LOGGER = None
     CONF = None
+    SESSION = None
+    SCHEDULER = None
+    CACHE = None
+    GENRE_SEEDS = None
+    GENRE_SEEDS_LOCK = threading.Lock()
+    # Guards creation of the session and scheduler, as the first requests may be concurrent
+    SESSION_LOCK = threading.Lock()
 
     def set_logger(self, logger: log.Log):
         self.LOGGER = logger
@@ -16,6 +211,96 @@ class API:
     def set_conf(self, conf: sp_conf.Config):
         self.CONF = conf
 
+    def set_cache(self, cache: sp_cache.ResponseCache):
+        """
+        Set the response cache used for rarely changing data, or None to disable caching.
+        :param cache: response cache object
+        """
+        self.CACHE = cache
+
+    def set_pool_size(self, size: int):
+        """
+        Set the maximum amount of keep-alive connections kept in the pool. Any existing session is
+        closed, such that the next request creates a session with the new pool size.
+        :param size: maximum amount of pooled connections
+        """
+        self.POOL_SIZE = size
+        self.close_session()
+
+    def get_session(self) -> 'requests.Session':
+        """
+        Retrieve the persistent HTTP session, creating it on first use. Requests made through the
+        session reuse connections from its keep-alive pool, rather than opening a new connection
+        for each request.
+        :return: session object
+        """
+        if self.SESSION is None:
+            with self.SESSION_LOCK:
+                if self.SESSION is None:
+                    self.LOGGER.verbose('creating http session')
+                    self.LOGGER.debug(f'pool size: {self.POOL_SIZE}')
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.POOL_SIZE)
+                    session.mount('https://', adapter)
+                    self.SESSION = session
+        return self.SESSION
+
+    def get_scheduler(self) -> RequestScheduler:
+        """
+        Retrieve the request scheduler, creating it on first use.
+        :return: scheduler object
+        """
+        if self.SCHEDULER is None:
+            with self.SESSION_LOCK:
+                if self.SCHEDULER is None:
+                    scheduler = RequestScheduler()
+                    scheduler.set_logger(self.LOGGER)
+                    self.SCHEDULER = scheduler
+        return self.SCHEDULER
+
+    def send(self, method: str, url: str, **kwargs):
+        """
+        Send a request through the persistent session. The request is scheduled according to rate
+        limits, and retried if rate limited or failing server side. Responses of rarely changing
+        data are served from the response cache, if set, and cached responses carrying an ETag are
+        revalidated with conditional requests.
+        :param method: request method, e.g. GET, POST, PUT
+        :param url: request url
+        :param kwargs: keyword arguments passed on to the session, e.g. headers, params, json
+        :return: response object
+        """
+        if method != 'GET' or self.CACHE is None:
+            return self.get_scheduler().send(self.get_session(), method, url, **kwargs)
+        # Cache entries are keyed on the url relative to the base url
+        path = url[len(self.URL_BASE):] if url.startswith(self.URL_BASE) else url
+        params = kwargs.get('params')
+        response = self.CACHE.get(path, params)
+        if response is not None:
+            return response
+        # Revalidate expired responses with a conditional request
+        etag = self.CACHE.get_etag(path, params)
+        if etag is not None:
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'If-None-Match': etag}
+        response = self.get_scheduler().send(self.get_session(), method, url, **kwargs)
+        if response.status_code == 304 and etag is not None:
+            cached = self.CACHE.revalidate(path, params)
+            if cached is not None:
+                return cached
+            # Entry was evicted since its ETag was read, request it unconditionally
+            del kwargs['headers']['If-None-Match']
+            response = self.get_scheduler().send(self.get_session(), method, url, **kwargs)
+        self.CACHE.put(path, params, response)
+        return response
+
+    def close_session(self):
+        """
+        Close the HTTP session and release its pooled connections, if it exists.
+        """
+        with self.SESSION_LOCK:
+            if self.SESSION is not None:
+                self.SESSION.close()
+                self.SESSION = None
+
     def error_handle(self, request_domain: str, expected_code: int, request_type: str,
                      response=None):
         """
@@ -30,7 +315,7 @@ class API:
                 f'{request_type} request for {request_domain} failed with status code '
                 f'{response.status_code} (expected {expected_code}). Reason: {response.reason}')
             self.LOGGER.debug(f'request: {response.request}')
-            self.LOGGER.debug(f'headers: {response.headers}')
+            self.LOGGER.debug('headers: %s', response.headers)
             self.LOGGER.debug(f'url: {response.url}')
             if response.status_code == 401:
                 self.LOGGER.info('this may be because this is a new function, and additional '
@@ -47,18 +332,83 @@ class API:
         :return: top list as json object
         """
         params = {'limit': limit}
-        response = requests.get(f'{self.URL_BASE}/me/top/{list_type}', headers=headers,
-                                params=params)
+        response = self.send('GET', f'{self.URL_BASE}/me/top/{list_type}', headers=headers,
+                             params=params)
         self.error_handle(f'top {list_type}', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
 
+    def get_page(self, url: str, headers: dict, params=None) -> json:
+        """
+        Retrieve a single page of a paging object.
+        :param url: url of the page
+        :param headers: request headers
+        :param params: request parameters, e.g. limit and offset
+        :return: page as json object
+        """
+        response = self.send('GET', url, headers=headers, params=params)
+        self.error_handle('page', 200, 'GET', response=response)
+        return json.loads(response.content.decode('utf-8'))
+
+    def paginate(self, url: str, headers: dict, params=None, prefetch=False):
+        """
+        Lazily iterate over the items of a paging object. Next links are followed only once the
+        items of the current page have been consumed, so iteration may be stopped early without
+        requesting the remaining pages.
+        :param url: url of the first page
+        :param headers: request headers
+        :param params: request parameters of the first page, e.g. limit
+        :param prefetch: whether to request the next page in the background while the current page
+                         is being consumed
+        :return: generator of items
+        """
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            page = self.get_page(url, headers, params=params)
+            while True:
+                upcoming = None
+                if page.get('next') and executor:
+                    upcoming = executor.submit(self.get_page, page['next'], headers)
+                yield from page['items']
+                if not page.get('next'):
+                    return
+                self.LOGGER.debug(f'next page: {page["next"]}')
+                page = upcoming.result() if upcoming else self.get_page(page['next'], headers)
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def iter_top_list(self, list_type: str, headers: dict, time_range=None, prefetch=False):
+        """
+        Lazily iterate over all of the user's top artists or tracks.
+        :param list_type: type of list to retrieve; 'artists' or 'tracks'
+        :param headers: request headers
+        :param time_range: time frame of the list; 'short_term', 'medium_term' or 'long_term'
+        :param prefetch: whether to request the next page in the background
+        :return: generator of artists or tracks
+        """
+        params = {'limit': 50}
+        if time_range:
+            params['time_range'] = time_range
+        return self.paginate(f'{self.URL_BASE}/me/top/{list_type}', headers, params=params,
+                             prefetch=prefetch)
+
+    def get_full_top_list(self, list_type: str, headers: dict, time_range=None) -> list:
+        """
+        Retrieve all of the user's top artists or tracks, following every page.
+        :param list_type: type of list to retrieve; 'artists' or 'tracks'
+        :param headers: request headers
+        :param time_range: time frame of the list; 'short_term', 'medium_term' or 'long_term'
+        :return: list of artists or tracks, highest ranked first
+        """
+        return list(self.iter_top_list(list_type, headers, time_range=time_range))
+
     def get_user_id(self, headers: dict) -> str:
         """
         Retrieve user ID from API.
         :param headers: request headers
         :return: user ID as a string
         """
-        response = requests.get(f'{self.URL_BASE}/me', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/me', headers=headers)
         self.error_handle('user info', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))['id']
 
@@ -75,8 +425,8 @@ class API:
         data = {'name': playlist_name,
                 'description': playlist_description}
         self.LOGGER.info('creating playlist')
-        response = requests.post(f'{self.URL_BASE}/users/{self.get_user_id(headers)}/playlists',
-                                 json=data, headers=headers)
+        response = self.send('POST', f'{self.URL_BASE}/users/{self.get_user_id(headers)}/playlists',
+                             json=data, headers=headers)
         self.error_handle('playlist creation', 201, 'POST', response=response)
         playlist = json.loads(response.content.decode('utf-8'))
         if cache_id:
@@ -91,22 +441,34 @@ class API:
         :param data: base64 encoded jpeg image
         :param img_headers: request headers
         """
-        response = requests.put(f'{self.URL_BASE}/playlists/{playlist_id}/images',
-                                headers=img_headers, data=data)
+        response = self.send('PUT', f'{self.URL_BASE}/playlists/{playlist_id}/images',
+                             headers=img_headers, data=data)
         self.error_handle('image upload', 202, 'PUT', response=response)
 
-    def add_to_playlist(self, tracks: list, playlist_id: str, headers: dict):
+    def add_to_playlist(self, tracks: list, playlist_id: str, headers: dict, position=None) -> str:
         """
-        Add tracks to playlist.
+        Add tracks to playlist. The API accepts at most 100 tracks per request, so tracks are
+        added in consecutive chunks, preserving their order.
         :param tracks: list of track URIs
         :param playlist_id: id of playlist
         :param headers: request headers
-        """
-        data = {'uris': tracks}
-        self.LOGGER.debug(f'tracks: {tracks}')
-        response = requests.post(f'{self.URL_BASE}/playlists/{playlist_id}/tracks',
+        :param position: position to insert the tracks at, tracks are appended if not given
+        :return: snapshot id of the playlist after the last chunk was added
+        """
+        # Callers may change the list later, so the record keeps a snapshot
+        self.LOGGER.debug('tracks: %s', tuple(tracks))
+        snapshot_id = None
+        for chunk in chunks(tracks, self.PLAYLIST_CHUNK):
+            data = {'uris': chunk}
+            if position is not None:
+                data['position'] = position
+                position += len(chunk)
+            response = self.send('POST', f'{self.URL_BASE}/playlists/{playlist_id}/tracks',
                                  headers=headers, json=data)
-        self.error_handle('adding tracks', 201, 'POST', response=response)
+            self.error_handle('adding tracks', 201, 'POST', response=response)
+            snapshot_id = json.loads(response.content.decode('utf-8'))['snapshot_id']
+            self.LOGGER.debug(f'snapshot: {snapshot_id}')
+        return snapshot_id
 
     def get_recommendations(self, rec_params: dict, headers: dict) -> json:
         """
@@ -115,8 +477,8 @@ class API:
         :param headers: request headers
         :return: recommendations as json object
         """
-        response = requests.get(f'{self.URL_BASE}/recommendations', params=rec_params,
-                                headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/recommendations', params=rec_params,
+                             headers=headers)
         self.error_handle('recommendations', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
 
@@ -128,28 +490,87 @@ class API:
         :param headers: request headers
         :return: data about artist or track as a json obj
         """
-        response = requests.get(f'{self.URL_BASE}/{data_type}/{uri.split(":")[2]}', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/{data_type}/{uri.split(":")[2]}',
+                             headers=headers)
         self.error_handle(f'single {data_type}', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
 
+    def request_data_batch(self, uris: list, data_type: str, headers: dict) -> list:
+        """
+        Requests data about several artists, tracks or albums, using as few requests as possible.
+        :param uris: list of uris for the artists, tracks or albums
+        :param data_type: the type of data to request; 'artists', 'tracks' or 'albums'
+        :param headers: request headers
+        :return: list of data about each artist, track or album, in the same order as the uris
+        """
+        data = []
+        for chunk in chunks(uris, self.BATCH_LIMITS[data_type]):
+            params = {'ids': ','.join(x.split(':')[2] for x in chunk)}
+            response = self.send('GET', f'{self.URL_BASE}/{data_type}', headers=headers,
+                                 params=params)
+            self.error_handle(f'several {data_type}', 200, 'GET', response=response)
+            data += json.loads(response.content.decode('utf-8'))[data_type]
+        return data
+
+    def request_artist_genres(self, uris: list, headers: dict) -> dict:
+        """
+        Retrieve the genres of several artists. Artists are served from the response cache where
+        possible, and the rest are requested in bulk. Each artist is cached on its own, such that
+        it is reused regardless of which artists it was requested with.
+        :param uris: list of artist uris, possibly containing duplicates
+        :param headers: request headers
+        :return: dict mapping each artist uri to its list of genres
+        """
+        genres = {}
+        missing = []
+        for uri in dict.fromkeys(uris):
+            path = f'/artists/{uri.split(":")[2]}'
+            cached = None if self.CACHE is None else self.CACHE.get(path)
+            if cached is None:
+                missing.append(uri)
+            else:
+                genres[uri] = json.loads(cached.content.decode('utf-8'))['genres']
+        self.LOGGER.debug(f'artist genres cached: {len(genres)}, requesting: {len(missing)}')
+        for uri, data in zip(missing, self.request_data_batch(missing, 'artists', headers)):
+            if data is None:
+                continue
+            genres[uri] = data['genres']
+            if self.CACHE is not None:
+                self.CACHE.store(f'/artists/{data["id"]}', None, json.dumps(data))
+        return genres
+
     def get_genre_seeds(self, headers: dict) -> json:
         """
         Retrieves available genre seeds from Spotify API.
         :param headers: request headers
         :return: genre seeds as a json obj
         """
-        response = requests.get(f'{self.URL_BASE}/recommendations/available-genre-seeds',
-                                headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/recommendations/available-genre-seeds',
+                             headers=headers)
         self.error_handle('genre seeds', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
 
+    def get_genre_seed_registry(self, headers: dict) -> GenreSeeds:
+        """
+        Retrieve the registry of available genre seeds. Genre seeds are only requested once, and
+        the registry is shared by all callers - across runs, the seeds are served from the
+        response cache, if set.
+        :param headers: request headers
+        :return: genre seed registry
+        """
+        with self.GENRE_SEEDS_LOCK:
+            if self.GENRE_SEEDS is None:
+                self.GENRE_SEEDS = GenreSeeds(self.get_genre_seeds(headers)['genres'])
+                self.LOGGER.debug(f'loaded {len(self.GENRE_SEEDS)} genre seeds')
+        return self.GENRE_SEEDS
+
     def get_available_devices(self, headers: dict) -> json:
         """
         Retrieves user's available playback devices
         :param headers: request headers
         :return: devices as json object
         """
-        response = requests.get(f'{self.URL_BASE}/me/player/devices', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/me/player/devices', headers=headers)
         self.error_handle('playback devices', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
 
@@ -162,8 +583,8 @@ class API:
         """
         body = {'context_uri': context_uri}
         params = {'device_id': device_id}
-        response = requests.put(f'{self.URL_BASE}/me/player/play', json=body, headers=headers,
-                                params=params)
+        response = self.send('PUT', f'{self.URL_BASE}/me/player/play', json=body, headers=headers,
+                             params=params)
         self.error_handle('start playback', 204, 'PUT', response=response)
 
     def get_current_track(self, headers: dict) -> str:
@@ -172,7 +593,7 @@ class API:
         :param headers: request headers
         :return: uri of current track if present, else return playing type
         """
-        response = requests.get(f'{self.URL_BASE}/me/player', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/me/player', headers=headers)
         self.error_handle('retrieve current track', 200, 'GET', response=response)
         data = json.loads(response.content.decode('utf-8'))
         try:
@@ -186,7 +607,7 @@ class API:
         :param headers: request headers
         :return: list of artist uris if present, else return playing type
         """
-        response = requests.get(f'{self.URL_BASE}/me/player', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/me/player', headers=headers)
         self.error_handle('retrieve current artists', 200, 'GET', response=response)
         data = json.loads(response.content.decode('utf-8'))
         try:
@@ -204,7 +625,7 @@ class API:
         if uri_check(current_track):
             return
         track = {'ids': current_track.split(':')[2]}
-        response = requests.put(f'{self.URL_BASE}/me/tracks', headers=headers, params=track)
+        response = self.send('PUT', f'{self.URL_BASE}/me/tracks', headers=headers, params=track)
         self.error_handle('like track', 200, 'PUT', response=response)
 
     def unlike_track(self, headers: dict, uri_check):
@@ -217,7 +638,7 @@ class API:
         if uri_check(current_track):
             return
         track = {'ids': current_track.split(':')[2]}
-        response = requests.delete(f'{self.URL_BASE}/me/tracks', headers=headers, params=track)
+        response = self.send('DELETE', f'{self.URL_BASE}/me/tracks', headers=headers, params=track)
         self.error_handle('remove liked track', 200, 'DELETE', response=response)
 
     def update_playlist_details(self, name: str, description: str, playlist_id: str, headers: dict):
@@ -230,22 +651,46 @@ class API:
         :return:
         """
         data = {'name': name, 'description': description}
-        response = requests.put(f'{self.URL_BASE}/playlists/{playlist_id}', headers=headers,
-                                json=data)
+        response = self.send('PUT', f'{self.URL_BASE}/playlists/{playlist_id}', headers=headers,
+                             json=data)
         self.error_handle('update playlist details', 200, 'PUT', response=response)
 
-    def replace_playlist_tracks(self, playlist_id: str, tracks: list, headers: dict):
+    def replace_playlist_tracks(self, playlist_id: str, tracks: list, headers: dict) -> str:
         """
-        Remove the tracks from a playlist
+        Replace the tracks of a playlist. The first 100 tracks replace the current contents, and
+        any remaining tracks are appended in chunks.
         :param tracks: list of track uris
         :param playlist_id: id of the playlist
         :param headers: request headers
-        :return:
+        :return: snapshot id of the playlist after all tracks were written
         """
-        data = {'uris': tracks}
-        response = requests.put(f'{self.URL_BASE}/playlists/{playlist_id}/tracks', headers=headers,
-                                json=data)
+        data = {'uris': tracks[:self.PLAYLIST_CHUNK]}
+        response = self.send('PUT', f'{self.URL_BASE}/playlists/{playlist_id}/tracks',
+                             headers=headers, json=data)
         self.error_handle('remove tracks from playlist', 201, 'PUT', response=response)
+        snapshot_id = json.loads(response.content.decode('utf-8'))['snapshot_id']
+        if len(tracks) > self.PLAYLIST_CHUNK:
+            snapshot_id = self.add_to_playlist(tracks[self.PLAYLIST_CHUNK:], playlist_id, headers)
+        return snapshot_id
+
+    def reorder_playlist_tracks(self, playlist_id: str, range_start: int, insert_before: int,
+                                headers: dict, snapshot_id=None) -> str:
+        """
+        Move a track within a playlist
+        :param playlist_id: id of the playlist
+        :param range_start: position of the track to move
+        :param insert_before: position the track should be moved to, prior to moving it
+        :param headers: request headers
+        :param snapshot_id: snapshot of the playlist the positions refer to, if any
+        :return: snapshot id of the playlist after the move
+        """
+        data = {'range_start': range_start, 'insert_before': insert_before}
+        if snapshot_id:
+            data['snapshot_id'] = snapshot_id
+        response = self.send('PUT', f'{self.URL_BASE}/playlists/{playlist_id}/tracks',
+                             headers=headers, json=data)
+        self.error_handle('reorder playlist tracks', 200, 'PUT', response=response)
+        return json.loads(response.content.decode('utf-8'))['snapshot_id']
 
     def get_playlist(self, headers: dict, playlist_id: str):
         """
@@ -254,22 +699,42 @@ class API:
         :param playlist_id: ID of the playlist
         :return: playlist object
         """
-        response = requests.get(f'{self.URL_BASE}/playlists/{playlist_id}', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/playlists/{playlist_id}', headers=headers)
         self.error_handle('retrieve playlist', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
 
-    def remove_from_playlist(self, tracks: list, playlist_id: str, headers: dict):
+    def iter_playlist_tracks(self, playlist_id: str, headers: dict, prefetch=False):
+        """
+        Lazily iterate over all tracks of a playlist, regardless of its size.
+        :param playlist_id: ID of the playlist
+        :param headers: request headers
+        :param prefetch: whether to request the next page in the background
+        :return: generator of playlist track objects
+        """
+        return self.paginate(f'{self.URL_BASE}/playlists/{playlist_id}/tracks', headers,
+                             params={'limit': 100}, prefetch=prefetch)
+
+    def remove_from_playlist(self, tracks: list, playlist_id: str, headers: dict,
+                             snapshot_id=None) -> str:
         """
-        Remove track(s) from a playlist
+        Remove track(s) from a playlist, in chunks of at most 100 tracks. Each chunk is removed from
+        the snapshot produced by the previous chunk.
         :param tracks: the tracks to remove
         :param playlist_id: identifier of the playlist to remove tracks from
         :param headers: request headers
-        """
-        data = {'tracks': [{'uri': x} for x in tracks]}
-        self.LOGGER.debug(f'tracks: {data["tracks"]}')
-        response = requests.delete(f'{self.URL_BASE}/playlists/{playlist_id}/tracks',
-                                   headers=headers, json=data)
-        self.error_handle('delete track from playlist', 200, 'DELETE', response=response)
+        :param snapshot_id: snapshot of the playlist to remove the first chunk from, if any
+        :return: snapshot id of the playlist after the last chunk was removed
+        """
+        for chunk in chunks(tracks, self.PLAYLIST_CHUNK):
+            data = {'tracks': [{'uri': x} for x in chunk]}
+            if snapshot_id:
+                data['snapshot_id'] = snapshot_id
+            self.LOGGER.debug('tracks: %s', chunk)
+            response = self.send('DELETE', f'{self.URL_BASE}/playlists/{playlist_id}/tracks',
+                                 headers=headers, json=data)
+            self.error_handle('delete track from playlist', 200, 'DELETE', response=response)
+            snapshot_id = json.loads(response.content.decode('utf-8'))['snapshot_id']
+        return snapshot_id
 
     def get_audio_features(self, track_id: str, headers: dict) -> json:
         """
@@ -278,10 +743,26 @@ class API:
         :param headers: request headers
         :return: audio features object
         """
-        response = requests.get(f'{self.URL_BASE}/audio-features/{track_id}', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/audio-features/{track_id}', headers=headers)
         self.error_handle('retrieve audio features', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
 
+    def get_audio_features_batch(self, track_ids: list, headers: dict) -> list:
+        """
+        Get audio features of several tracks, using as few requests as possible
+        :param track_ids: list of track ids
+        :param headers: request headers
+        :return: list of audio features objects, in the same order as the ids
+        """
+        features = []
+        for chunk in chunks(track_ids, self.BATCH_LIMITS['audio-features']):
+            params = {'ids': ','.join(chunk)}
+            response = self.send('GET', f'{self.URL_BASE}/audio-features', headers=headers,
+                                 params=params)
+            self.error_handle('retrieve several audio features', 200, 'GET', response=response)
+            features += json.loads(response.content.decode('utf-8'))['audio_features']
+        return features
+
     def check_if_playlist_exists(self, playlist_id: str, headers: dict) -> bool:
         """
         Checks whether a playlist exists
@@ -289,7 +770,7 @@ class API:
         :param headers: request headers
         :return: bool determining if playlist exists
         """
-        response = requests.get(f'{self.URL_BASE}/playlists/{playlist_id}', headers=headers)
+        response = self.send('GET', f'{self.URL_BASE}/playlists/{playlist_id}', headers=headers)
         self.error_handle('retrieve playlist', 200, 'GET', response=response)
         # If playlist is public, return true (if playlist has been deleted, this value is false)
         if json.loads(response.content.decode('utf-8'))['public']:
@@ -305,7 +786,7 @@ class API:
         :param start_playback: if music should start playing or not
         """
         data = {'device_ids': [device_id], 'play': start_playback}
-        response = requests.put(f'{self.URL_BASE}/me/player', headers=headers, json=data)
+        response = self.send('PUT', f'{self.URL_BASE}/me/player', headers=headers, json=data)
         self.error_handle('transfer playback', 204, 'PUT', response=response)
 
     def get_saved_tracks(self, headers: dict, limit=50) -> json:
@@ -316,6 +797,77 @@ class API:
         :return: json object
         """
         params = {'limit': limit}
-        response = requests.get(f'{self.URL_BASE}/me/tracks', headers=headers, params=params)
+        response = self.send('GET', f'{self.URL_BASE}/me/tracks', headers=headers, params=params)
         self.error_handle('retrieve saved tracks', 200, 'GET', response=response)
         return json.loads(response.content.decode('utf-8'))
+
+    def iter_saved_tracks(self, headers: dict, prefetch=False):
+        """
+        Lazily iterate over all of the user's saved tracks
+        :param headers: request headers
+        :param prefetch: whether to request the next page in the background
+        :return: generator of saved track objects
+        """
+        return self.paginate(f'{self.URL_BASE}/me/tracks', headers, params={'limit': 50},
+                             prefetch=prefetch)
+
+
+class AsyncAPI:
+    """
+    Awaitable counterpart to API. Every method of the wrapped API is exposed as a coroutine that
+    runs the request in a worker thread, such that independent requests can be issued
+    concurrently. Requests share the session and scheduler of the wrapped API.
+    """
+
+    def __init__(self, api: API):
+        self.api = api
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.api, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            try:
+                return attr(*args, **kwargs)
+            except (SystemExit, KeyboardInterrupt) as ex:
+                # Exiting from within a task breaks the event loop, so carry the exit to the caller
+                raise WorkerExit(ex) from ex
+
+        @functools.wraps(attr)
+        async def method(*args, **kwargs):
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(None, functools.partial(call, *args, **kwargs))
+
+        return method
+
+
+class WorkerExit(Exception):
+    """
+    Raised by AsyncAPI in place of a SystemExit or KeyboardInterrupt raised in a worker thread, e.g.
+    by error_handle(). run_concurrently() raises the original exception in the calling thread.
+    """
+
+    def __init__(self, exit_exception: BaseException):
+        super().__init__(exit_exception)
+        self.exit_exception = exit_exception
+
+
+def run_concurrently(*coroutines) -> list:
+    """
+    Run several coroutines, e.g. calls to AsyncAPI, concurrently and wait for all of them. If any
+    coroutine fails, the first failure is raised once all of them are done.
+    :param coroutines: coroutines to run
+    :return: list of results, in the same order as the coroutines
+    """
+
+    async def gather() -> list:
+        return list(await asyncio.gather(*coroutines, return_exceptions=True))
+
+    results = asyncio.run(gather())
+    for x in results:
+        if isinstance(x, WorkerExit):
+            raise x.exit_exception
+        if isinstance(x, BaseException):
+            raise x
+    return results
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+
+
+def normalize_genre(genre: str) -> str:
+    """
+    Normalize a genre to the form of genre seeds, e.g. 'Indie Rock' to 'indie-rock', as genres of
+    artists contain spaces whereas genre seeds contain dashes
+    :param genre: genre name
+    :return: normalized genre name
+    """
+    return genre.strip().lower().replace(' ', '-')
+
+
+def genre_blacklisted(genres: frozenset, artist_genres) -> bool:
+    """
+    Check whether any genre of an artist is blacklisted
+    :param genres: normalized blacklisted genres
+    :param artist_genres: genres of the artist
+    :return: True if blacklisted, False if not
+    """
+    return not genres.isdisjoint(normalize_genre(x) for x in artist_genres)
+
+
+def genre_blacklisted_artists(genres: frozenset, artist_genres: dict) -> set:
+    """
+    Find the artists that have any blacklisted genre
+    :param genres: normalized blacklisted genres
+    :param artist_genres: dict mapping artist uris to their genres
+    :return: set of artist uris
+    """
+    return {uri for uri, x in artist_genres.items() if genre_blacklisted(genres, x)}
+
+
+class BlacklistIndex:
+    """
+    Index of blacklisted tracks, artists, albums and genres, supporting constant time lookups
+    """
+
+    def __init__(self, blacklist: dict):
+        # URIs are interned, as the same artists appear across many entries and responses
+        self.tracks = frozenset(sys.intern(x) for x in blacklist.get('tracks', {}).keys())
+        self.artists = frozenset(sys.intern(x) for x in blacklist.get('artists', {}).keys())
+        self.albums = frozenset(sys.intern(x) for x in blacklist.get('albums', {}).keys())
+        # Genre entries are stored as genre:<name>, whereas artists only carry the name
+        self.genres = frozenset(normalize_genre(x.split(':', 1)[1])
+                                for x in blacklist.get('genres', {}).keys())
+
+    def __len__(self) -> int:
+        return len(self.tracks) + len(self.artists) + len(self.albums) + len(self.genres)
+
+    def is_blacklisted(self, track: json, artist_genres=None) -> bool:
+        """
+        Check whether a track, its album, or any of its artists or their genres, is blacklisted
+        :param track: track as json object
+        :param artist_genres: dict mapping artist uris to their genres, required to check genres
+        :return: True if blacklisted, False if not
+        """
+        if track['uri'] in self.tracks or (self.albums and track['album']['uri'] in self.albums):
+            return True
+        if not self.artists.isdisjoint(x['uri'] for x in track['artists']):
+            return True
+        return bool(self.genres and artist_genres) and any(
+            genre_blacklisted(self.genres, artist_genres.get(x['uri'], ()))
+            for x in track['artists'])
+
+    def filter(self, tracks: list, artist_genres=None) -> list:
+        """
+        Filter blacklisted tracks, and tracks by blacklisted artists, genres or on blacklisted
+        albums, from a list of tracks
+        :param tracks: list of tracks as json objects
+        :param artist_genres: dict mapping artist uris to their genres, required to filter genres
+        :return: list of URIs of eligible tracks, in their original order
+        """
+        blacklisted_tracks, blacklisted_artists = self.tracks, self.artists
+        if self.genres and artist_genres:
+            blacklisted_artists = blacklisted_artists | genre_blacklisted_artists(self.genres,
+                                                                                  artist_genres)
+        if self.albums:
+            tracks = [x for x in tracks if x['album']['uri'] not in self.albums]
+        return [x['uri'] for x in tracks if x['uri'] not in blacklisted_tracks
+                and blacklisted_artists.isdisjoint(y['uri'] for y in x['artists'])]
+
+
+class BloomFilter:
+    """
+    Bloom filter of blacklisted URIs, backed by a memory-mapped file. The file holds a header
+    followed by the bit array - the header records the state of the blacklist the filter was last
+    updated for, such that stale filters can be detected.
+    """
+    MAGIC = b'SRBF'
+    # magic, size of bit array, number of hashes, capacity, number of entries, blacklist state
+    HEADER = struct.Struct('<4sQQQQQQQ')
+    COUNT_OFFSET = 28
+    KEY_OFFSET = 36
+
+    def __init__(self, path: str):
+        self.file = open(path, 'r+b')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0)
+        except ValueError:
+            # Empty files cannot be mapped
+            self.file.close()
+            raise
+        try:
+            magic, self.bits, self.hashes, self.capacity, *_ = self.HEADER.unpack_from(self.map)
+        except struct.error:
+            self.close()
+            raise ValueError('invalid bloom filter')
+        if magic != self.MAGIC or len(self.map) < self.HEADER.size + (self.bits + 7) // 8:
+            self.close()
+            raise ValueError('invalid bloom filter')
+        self.inode = os.fstat(self.file.fileno()).st_ino
+
+    @property
+    def count(self) -> int:
+        # Read from the mapped header, such that updates by other processes are visible
+        return struct.unpack_from('<Q', self.map, self.COUNT_OFFSET)[0]
+
+    @property
+    def key(self) -> tuple:
+        return struct.unpack_from('<QQQ', self.map, self.KEY_OFFSET)
+
+    @classmethod
+    def create(cls, path: str, items: list, capacity: int, error_rate: float, key: tuple):
+        """
+        Create a bloom filter file sized for a capacity and false positive rate, replacing any
+        existing file
+        :param path: path of the filter file
+        :param items: items to add to the filter
+        :param capacity: expected maximum amount of items
+        :param error_rate: false positive rate at capacity
+        :param key: state of the blacklist the filter is created for
+        :return: bloom filter object
+        """
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, bits, hashes, capacity, 0, *key))
+            f.truncate(cls.HEADER.size + (bits + 7) // 8)
+        bloom = cls(tmp)
+        for x in items:
+            bloom.add(x)
+        bloom.flush()
+        os.replace(tmp, path)
+        return bloom
+
+    def positions(self, item: str):
+        """
+        Compute the bit positions of an item, using double hashing
+        :param item: item to hash
+        :return: generator of bit positions
+        """
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, item: str):
+        """
+        Add an item to the filter
+        :param item: item to add
+        """
+        for x in self.positions(item):
+            self.map[self.HEADER.size + x // 8] |= 1 << (x % 8)
+        struct.pack_into('<Q', self.map, self.COUNT_OFFSET, self.count + 1)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.map[self.HEADER.size + x // 8] & (1 << (x % 8))
+                   for x in self.positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+    def set_key(self, key: tuple):
+        """
+        Record the state of the blacklist the filter is up to date with
+        :param key: state of the blacklist
+        """
+        struct.pack_into('<QQQ', self.map, self.KEY_OFFSET, *key)
+
+    def flush(self):
+        """
+        Write modified bits and header to the file
+        """
+        self.map.flush()
+
+    def close(self):
+        """
+        Unmap and close the filter file
+        """
+        if not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+
+class PrefilteredBlacklistIndex:
+    """
+    Blacklist index that rejects tracks which are certainly not blacklisted using a bloom filter,
+    and only loads the exact index if any track may be blacklisted. Blacklisted genres are checked
+    exactly, as they are matched against the genres of artists rather than their URIs.
+    """
+
+    def __init__(self, bloom: BloomFilter, load_index, genres=frozenset()):
+        """
+        :param bloom: bloom filter of blacklisted URIs
+        :param load_index: function returning the exact blacklist index
+        :param genres: blacklisted genre entries, as genre:<name>
+        """
+        self.bloom = bloom
+        self.load_index = load_index
+        self.genres = frozenset(normalize_genre(x.split(':', 1)[1]) for x in genres)
+        self.index = None
+
+    def __len__(self) -> int:
+        return len(self.bloom)
+
+    def get_index(self) -> BlacklistIndex:
+        """
+        Retrieve the exact index, loading it on first use
+        :return: blacklist index
+        """
+        if self.index is None:
+            self.index = self.load_index()
+        return self.index
+
+    def may_be_blacklisted(self, track: json) -> bool:
+        """
+        Check whether a track, its album, or any of its artists, may be blacklisted
+        :param track: track as json object
+        :return: False if certainly not blacklisted, True otherwise
+        """
+        bloom = self.bloom
+        return track['uri'] in bloom or track['album']['uri'] in bloom \
+            or any(x['uri'] in bloom for x in track['artists'])
+
+    def is_blacklisted(self, track: json, artist_genres=None) -> bool:
+        """
+        Check whether a track, its album, or any of its artists or their genres, is blacklisted
+        :param track: track as json object
+        :param artist_genres: dict mapping artist uris to their genres, required to check genres
+        :return: True if blacklisted, False if not
+        """
+        if self.genres and artist_genres and any(
+                genre_blacklisted(self.genres, artist_genres.get(x['uri'], ()))
+                for x in track['artists']):
+            return True
+        return self.may_be_blacklisted(track) and self.get_index().is_blacklisted(track)
+
+    def filter(self, tracks: list, artist_genres=None) -> list:
+        """
+        Filter blacklisted tracks, and tracks by blacklisted artists, genres or on blacklisted
+        albums, from a list of tracks
+        :param tracks: list of tracks as json objects
+        :param artist_genres: dict mapping artist uris to their genres, required to filter genres
+        :return: list of URIs of eligible tracks, in their original order
+        """
+        if self.genres and artist_genres:
+            excluded = genre_blacklisted_artists(self.genres, artist_genres)
+            tracks = [x for x in tracks if excluded.isdisjoint(y['uri'] for y in x['artists'])]
+        if not any(self.may_be_blacklisted(x) for x in tracks):
+            return [x['uri'] for x in tracks]
+        return self.get_index().filter(tracks)
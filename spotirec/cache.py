@@ -0,0 +1,242 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from . import log
+from pathlib import Path
+from urllib import parse
+
+
+class CachedResponse:
+    """
+    Response served from the cache, exposing the same attributes as a response object
+    """
+    def __init__(self, entry: dict):
+        self.status_code = entry['status_code']
+        self.reason = 'OK (cached)'
+        self.request = 'GET'
+        self.headers = entry['headers']
+        self.url = entry['url']
+        self.content = entry['content'].encode('utf-8')
+
+
+class ResponseCache:
+    CACHE_DIR = f'{Path.home()}/.config/spotirec/cache'
+    MAX_SIZE = 32 * 1024 * 1024
+    # Time to live in seconds of endpoints whose responses are cached, matched against the url
+    # relative to the API base url - endpoints not listed here are never cached. Endpoints with a
+    # time to live of zero are only stored if the response carries an ETag, and are revalidated
+    # with a conditional request every time they are used.
+    TTLS = [(re.compile(r'^/recommendations/available-genre-seeds$'), 24 * 60 * 60),
+            (re.compile(r'^/(artists|tracks)(/[a-zA-Z0-9]+)?$'), 7 * 24 * 60 * 60),
+            (re.compile(r'^/audio-features(/[a-zA-Z0-9]+)?$'), math.inf),
+            (re.compile(r'^/playlists/[a-zA-Z0-9]+(/tracks)?(\?.*)?$'), 0),
+            (re.compile(r'^/me/top/(artists|tracks)(\?.*)?$'), 0)]
+    LOGGER = None
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.size = None
+
+    def set_logger(self, logger: log.Log):
+        self.LOGGER = logger
+
+    def get_ttl(self, path: str):
+        """
+        Retrieve the time to live of responses from an endpoint
+        :param path: request url relative to the API base url
+        :return: time to live in seconds, or None if the endpoint is not cached
+        """
+        for pattern, ttl in self.TTLS:
+            if pattern.match(path):
+                return ttl
+        return None
+
+    def key(self, path: str, params=None) -> str:
+        """
+        Create the cache key of a request from its url and parameters
+        :param path: request url relative to the API base url
+        :param params: request parameters
+        :return: cache key as a string
+        """
+        query = parse.urlencode(sorted(params.items())) if params else ''
+        return hashlib.sha256(f'{path}?{query}'.encode('utf-8')).hexdigest()
+
+    def read_entry(self, file: str):
+        """
+        Read a single entry from the cache
+        :param file: path of the entry
+        :return: entry as dict, or None if it does not exist
+        """
+        try:
+            with open(file, 'r') as f:
+                return json.loads(f.read())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def write_entry(self, file: str, entry: dict):
+        """
+        Write a single entry to the cache. The least recently used entries are evicted if the
+        cache grows beyond its maximum size.
+        :param file: path of the entry
+        :param entry: entry as dict
+        """
+        os.makedirs(self.CACHE_DIR, exist_ok=True)
+        data = json.dumps(entry)
+        self.remove(file)
+        # Write to a temporary file first, such that concurrent readers never see partial entries.
+        # Thread ids are only unique within a process, so the name also includes the process id.
+        tmp = f'{file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(data)
+        os.replace(tmp, file)
+        self.size = self.get_size() if self.size is None else self.size + len(data)
+        if self.size > self.MAX_SIZE:
+            self.evict()
+
+    def get(self, path: str, params=None):
+        """
+        Retrieve a cached response that has not expired. Expired entries are removed, unless they
+        can be revalidated with their ETag.
+        :param path: request url relative to the API base url
+        :param params: request parameters
+        :return: cached response, or None if the request is not cached or has expired
+        """
+        if self.get_ttl(path) is None:
+            return None
+        file = f'{self.CACHE_DIR}/{self.key(path, params)}'
+        entry = self.read_entry(file)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry['expires'] is not None and entry['expires'] <= time.time():
+            self.LOGGER.debug(f'cache entry for {path} expired')
+            if 'ETag' not in entry['headers']:
+                self.remove(file)
+            self.misses += 1
+            return None
+        # Bump modification time, such that recently used entries are evicted last
+        os.utime(file)
+        self.hits += 1
+        self.LOGGER.debug(f'cache hit: {path}')
+        return CachedResponse(entry)
+
+    def get_etag(self, path: str, params=None):
+        """
+        Retrieve the ETag of a cached response, regardless of whether it has expired
+        :param path: request url relative to the API base url
+        :param params: request parameters
+        :return: ETag as a string, or None if the response is not cached or had no ETag
+        """
+        if self.get_ttl(path) is None:
+            return None
+        entry = self.read_entry(f'{self.CACHE_DIR}/{self.key(path, params)}')
+        return entry['headers'].get('ETag') if entry else None
+
+    def revalidate(self, path: str, params=None):
+        """
+        Renew a cached response after the API responded that it has not been modified
+        :param path: request url relative to the API base url
+        :param params: request parameters
+        :return: cached response, or None if the entry was evicted in the meantime
+        """
+        file = f'{self.CACHE_DIR}/{self.key(path, params)}'
+        entry = self.read_entry(file)
+        if entry is None:
+            return None
+        ttl = self.get_ttl(path)
+        entry['expires'] = None if ttl == math.inf else time.time() + ttl
+        self.write_entry(file, entry)
+        self.revalidated += 1
+        self.LOGGER.debug(f'cache revalidated: {path}')
+        return CachedResponse(entry)
+
+    def put(self, path: str, params, response):
+        """
+        Store a successful response, if its endpoint is cached.
+        :param path: request url relative to the API base url
+        :param params: request parameters
+        :param response: response object
+        """
+        if response.status_code != 200:
+            return
+        headers = {'ETag': response.headers['ETag']} if 'ETag' in response.headers else {}
+        self.store(path, params, response.content.decode('utf-8'), headers)
+
+    def store(self, path: str, params, content: str, headers=None):
+        """
+        Store content as the successful response of a request, if its endpoint is cached.
+        :param path: request url relative to the API base url
+        :param params: request parameters
+        :param content: response body
+        :param headers: response headers to keep
+        """
+        ttl = self.get_ttl(path)
+        headers = headers or {}
+        if ttl is None or (ttl == 0 and not headers):
+            return
+        entry = {'url': path, 'status_code': 200, 'headers': headers, 'content': content,
+                 'expires': None if ttl == math.inf else time.time() + ttl}
+        self.write_entry(f'{self.CACHE_DIR}/{self.key(path, params)}', entry)
+
+    def remove(self, file: str):
+        """
+        Remove a single entry from the cache
+        :param file: path of the entry
+        """
+        try:
+            size = os.path.getsize(file)
+            os.remove(file)
+            if self.size is not None:
+                self.size -= size
+        except FileNotFoundError:
+            pass
+
+    def get_size(self) -> int:
+        """
+        Compute the size of all entries in the cache
+        :return: size in bytes
+        """
+        try:
+            return sum(x.stat().st_size for x in os.scandir(self.CACHE_DIR) if x.is_file())
+        except FileNotFoundError:
+            return 0
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache is at most three quarters of its
+        maximum size.
+        """
+        entries = sorted((x for x in os.scandir(self.CACHE_DIR) if x.is_file()),
+                         key=lambda x: x.stat().st_mtime)
+        self.size = sum(x.stat().st_size for x in entries)
+        self.LOGGER.verbose('evicting cache entries')
+        for entry in entries:
+            if self.size <= self.MAX_SIZE * 3 // 4:
+                break
+            self.remove(entry.path)
+
+    def clear(self):
+        """
+        Remove all entries from the cache
+        """
+        self.LOGGER.verbose('clearing cache')
+        try:
+            for entry in os.scandir(self.CACHE_DIR):
+                if entry.is_file():
+                    os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        self.size = 0
+
+    def stats(self) -> dict:
+        """
+        Retrieve statistics of cache usage
+        :return: dict of hits, misses, and misses that were revalidated without a response body
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated}
@@ -2,31 +2,157 @@ import json
 import re
 import configparser
 import ast
-from . import log
+import contextlib
+import copy
+import os
+import sqlite3
+import threading
+try:
+    import fcntl
+except ImportError:
+    # Advisory locking is unavailable on Windows
+    fcntl = None
+from . import blacklist as sp_blacklist, log
 from pathlib import Path
 
 
+def encode(value) -> str:
+    """
+    Encode a config value as compact JSON
+    :param value: value to encode
+    :return: encoded value
+    """
+    return json.dumps(value, separators=(',', ':'))
+
+
+def decode_keys(pairs: list) -> dict:
+    """
+    Create a dict from decoded JSON object pairs. JSON object keys are always strings, so integer
+    keys, such as those of seed info, are restored.
+    :param pairs: list of key-value pairs
+    :return: pairs as dict
+    """
+    return {int(k) if k.isdigit() else k: v for k, v in pairs}
+
+
+def decode(value: str):
+    """
+    Decode a config value. Values written by older versions are Python literals rather than JSON,
+    and are still read as such.
+    :param value: encoded value
+    :return: decoded value
+    """
+    try:
+        return json.loads(value, object_pairs_hook=decode_keys)
+    except json.JSONDecodeError:
+        return ast.literal_eval(value)
+
+
+def snapshot(c: configparser.ConfigParser) -> dict:
+    """
+    Copy the raw values of each section of a config
+    :param c: config object
+    :return: dict of sections, each a dict of raw values
+    """
+    return {x: dict(c.items(x, raw=True)) for x in c.sections()}
+
+
+def merge_values(base: str, ours: str, theirs: str) -> str:
+    """
+    Merge two changes of the same encoded value. If all versions are dicts, keys changed by this
+    process are applied to the other version, otherwise this process' version wins.
+    :param base: value before either change
+    :param ours: value changed by this process
+    :param theirs: value changed by another process
+    :return: merged encoded value
+    """
+    try:
+        decoded = [decode(x) for x in (base, ours, theirs)]
+    except (ValueError, SyntaxError):
+        return ours
+    if not all(isinstance(x, dict) for x in decoded):
+        return ours
+    base_dict, ours_dict, merged = decoded
+    for key in set(base_dict.keys()) | set(ours_dict.keys()):
+        if key not in ours_dict:
+            merged.pop(key, None)
+        elif ours_dict[key] != base_dict.get(key):
+            merged[key] = ours_dict[key]
+    return encode(merged)
+
+
+def get_uri_type(uri: str) -> str:
+    """
+    Retrieve the type of a blacklist entry
+    :param uri: URI of the entry, or genre:<name> for genres
+    :return: type of the entry, e.g. 'track' or 'genre'
+    """
+    return 'genre' if uri.startswith('genre:') else uri.split(':')[1]
+
+
 class Config:
     CONFIG_DIR = f'{Path.home()}/.config/spotirec'
     CONFIG_FILE = 'spotirec.conf'
-    URI_RE = r'spotify:(artist|track|show|episode):[a-zA-Z0-9]'
+    DATABASE_FILE = 'spotirec.db'
+    BLOOM_FILE = 'blacklist.bloom'
+    # Bloom filters are only maintained for blacklists of at least this many entries
+    BLOOM_THRESHOLD = 10000
+    BLOOM_ERROR_RATE = 0.001
+    # Genres have no URIs, and are stored as genre:<name>
+    URI_RE = r'spotify:(artist|track|album|show|episode):[a-zA-Z0-9]|genre:.'
     LOGGER = None
 
+    def __init__(self):
+        # Parsed config and decoded sections, valid while the config file is unchanged
+        self.cache_key = None
+        self.parsed = None
+        self.sections = {}
+        # Decoded sections modified in memory, which must be encoded before writing
+        self.modified = set()
+        self.batch_depth = 0
+        self.dirty = False
+        # Raw sections as last read from or written to the config file, used to merge changes
+        self.base = None
+        self.lock_depth = 0
+        self.lock_fd = None
+        # Bloom filter of the blacklist, and entries to add to it once the config is written
+        self.bloom = None
+        self.bloom_pending = []
+
     def set_logger(self, logger: log.Log):
         self.LOGGER = logger
 
+    def get_cache_key(self) -> tuple:
+        """
+        Identify the current state of the config file by its path, inode, modification time, and
+        size
+        :return: cache key as a tuple
+        """
+        path = f'{self.CONFIG_DIR}/{self.CONFIG_FILE}'
+        stat = os.stat(path)
+        return path, stat.st_ino, stat.st_mtime_ns, stat.st_size
+
     def open_config(self) -> configparser.ConfigParser:
         """
-        Open configuration file as object
+        Open configuration file as object. The file is only parsed again if it has changed since
+        it was last parsed or written.
         :return: config object
         """
+        if self.batch_depth and self.parsed is not None:
+            # Pending changes of a batch are only held in memory
+            return self.parsed
         try:
             # Read config and assert size
             self.LOGGER.verbose('getting config')
+            cache_key = self.get_cache_key()
+            if cache_key == self.cache_key:
+                return self.parsed
             c = configparser.ConfigParser()
             with open(f'{self.CONFIG_DIR}/{self.CONFIG_FILE}', 'r') as f:
                 c.read_file(f)
             assert len(c.keys()) > 0
+            self.cache_key, self.parsed, self.sections = cache_key, c, {}
+            self.base = snapshot(c)
             return c
         except (FileNotFoundError, AssertionError):
             self.LOGGER.info('config file not found, generating...')
@@ -36,12 +162,244 @@ class Config:
 
     def save_config(self, c: configparser.ConfigParser):
         """
-        Write config to file
+        Write config to file. During a batch, the config is only written once the batch ends.
+        If the file was changed by another process since it was read, the changes of both are
+        merged. The file is replaced atomically, such that it is never left partially written.
         :param c: config object
         """
+        if c is not self.parsed:
+            self.sections = {}
+            self.modified.clear()
+        if self.batch_depth:
+            # Modified sections are encoded once, when the batch is written
+            self.parsed, self.dirty = c, True
+            return
+        for section in self.modified:
+            for key, value in self.sections[section].items():
+                c.set(section, key, encode(value))
+        self.modified.clear()
         self.LOGGER.verbose('writing config')
-        with open(f'{self.CONFIG_DIR}/{self.CONFIG_FILE}', 'w') as f:
-            c.write(f)
+        with self.lock():
+            try:
+                old_key = self.get_cache_key()
+            except FileNotFoundError:
+                old_key = None
+            if c is self.parsed and self.base is not None and old_key is not None \
+                    and old_key != self.cache_key:
+                self.LOGGER.verbose('config changed by another process, merging')
+                c = self.merge(c)
+            self.write_config(c)
+            self.cache_key, self.parsed, self.sections = self.get_cache_key(), c, {}
+            self.base = snapshot(c)
+            self.update_filter(old_key, self.cache_key)
+
+    def write_config(self, c: configparser.ConfigParser):
+        """
+        Write config to a temporary file, and atomically replace the config file with it
+        :param c: config object
+        """
+        path = f'{self.CONFIG_DIR}/{self.CONFIG_FILE}'
+        tmp = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                c.write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+            raise
+
+    @contextlib.contextmanager
+    def lock(self):
+        """
+        Hold an exclusive advisory lock on the config directory, shared with other processes. The
+        lock is reentrant within a process.
+        :return: context manager
+        """
+        if self.lock_depth == 0 and fcntl is not None:
+            # Lock the config directory, rather than a separate lock file that would be left behind
+            self.lock_fd = os.open(self.CONFIG_DIR, os.O_RDONLY)
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+        self.lock_depth += 1
+        try:
+            yield
+        finally:
+            self.lock_depth -= 1
+            if self.lock_depth == 0 and self.lock_fd is not None:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+                os.close(self.lock_fd)
+                self.lock_fd = None
+
+    def merge(self, c: configparser.ConfigParser) -> configparser.ConfigParser:
+        """
+        Apply the changes made to a config since it was read to the current config file, keeping
+        changes made by other processes in the meantime. Entries changed on both sides are merged
+        by key if they are dicts, otherwise this process' change wins.
+        :param c: config object
+        :return: merged config object
+        """
+        merged = configparser.ConfigParser()
+        with open(f'{self.CONFIG_DIR}/{self.CONFIG_FILE}', 'r') as f:
+            merged.read_file(f)
+        ours = snapshot(c)
+        for section in set(self.base.keys()) | set(ours.keys()):
+            if section not in ours:
+                merged.remove_section(section)
+                continue
+            if not merged.has_section(section):
+                merged.add_section(section)
+            base = self.base.get(section, {})
+            for option in set(base.keys()) | set(ours[section].keys()):
+                value = ours[section].get(option)
+                if value == base.get(option):
+                    continue
+                if value is None:
+                    merged.remove_option(section, option)
+                    continue
+                theirs = merged.get(section, option, raw=True, fallback=None)
+                if theirs is not None and option in base and theirs != base[option]:
+                    value = merge_values(base[option], value, theirs)
+                merged.set(section, option, value)
+        return merged
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Apply several changes to the config in memory, and write them at once when the outermost
+        batch ends. If the batch is left by an exception, its changes are discarded.
+        :return: context manager yielding the config handler
+        """
+        self.batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.LOGGER.verbose('discarding config changes')
+                self.discard()
+            raise
+        self.batch_depth -= 1
+        if not self.batch_depth:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the changes of a batch
+        """
+        if self.dirty:
+            self.dirty = False
+            self.save_config(self.parsed)
+
+    def discard(self):
+        """
+        Discard the changes of a batch, such that the config file is parsed again on next use
+        """
+        self.cache_key, self.parsed, self.sections, self.base = None, None, {}, None
+        self.modified.clear()
+        self.bloom_pending.clear()
+        self.dirty = False
+
+    def open_filter(self):
+        """
+        Open the bloom filter file of the blacklist, if it exists. A filter that was replaced by
+        another process is opened again.
+        :return: bloom filter, or None if there is no valid filter file
+        """
+        path = f'{self.CONFIG_DIR}/{self.BLOOM_FILE}'
+        try:
+            inode = os.stat(path).st_ino
+            if self.bloom is not None and self.bloom.inode == inode:
+                return self.bloom
+            self.close_filter()
+            self.bloom = sp_blacklist.BloomFilter(path)
+        except (FileNotFoundError, ValueError):
+            self.close_filter()
+        return self.bloom
+
+    def close_filter(self):
+        """
+        Close the bloom filter of the blacklist, if it is open
+        """
+        if self.bloom is not None:
+            self.bloom.close()
+            self.bloom = None
+
+    def update_filter(self, old_key, new_key: tuple):
+        """
+        Add pending blacklist entries to the bloom filter after the config file was written, and
+        mark the filter as up to date with the written file. Filters that were already out of date
+        are left untouched, and rebuilt when next used. Removed entries are kept in the filter, as
+        they only cause false positives.
+        :param old_key: cache key of the config file before it was written
+        :param new_key: cache key of the written config file
+        """
+        pending, self.bloom_pending = self.bloom_pending, []
+        bloom = self.open_filter()
+        if bloom is None or old_key is None or bloom.key != old_key[1:]:
+            return
+        for uri in pending:
+            bloom.add(uri)
+        bloom.set_key(new_key[1:])
+        bloom.flush()
+
+    def get_blacklist_filter(self):
+        """
+        Retrieve the bloom filter of the blacklist, such that entries that are certainly not
+        blacklisted can be rejected without decoding the blacklist. The filter is rebuilt if it is
+        missing, out of date with the config file, or filled beyond its capacity.
+        :return: bloom filter, or None if the blacklist is too small to benefit from one
+        """
+        c = self.open_config()
+        if self.batch_depth:
+            # Changes of a batch are not added to the filter until the batch is written
+            return None
+        bloom = self.open_filter()
+        if bloom is not None and bloom.key == self.cache_key[1:] and len(bloom) <= bloom.capacity:
+            return bloom
+        try:
+            uris = [x for entries in self.decode_section(c, 'blacklist').values() for x in entries]
+        except KeyError:
+            uris = []
+        path = f'{self.CONFIG_DIR}/{self.BLOOM_FILE}'
+        if len(uris) < self.BLOOM_THRESHOLD:
+            if bloom is not None:
+                with self.lock():
+                    self.close_filter()
+                    os.remove(path)
+            return None
+        with self.lock():
+            self.close_filter()
+            self.LOGGER.verbose('building blacklist filter')
+            self.bloom = sp_blacklist.BloomFilter.create(path, uris, 2 * len(uris),
+                                                         self.BLOOM_ERROR_RATE,
+                                                         self.cache_key[1:])
+        return self.bloom
+
+    def decode_section(self, c: configparser.ConfigParser, section: str) -> dict:
+        """
+        Parse each entry of a section as a dict. Parsed sections are reused until the config file
+        changes - callers must not modify the result, unless they add the section to modified.
+        :param c: config object
+        :param section: name of the section
+        :return: section as dict
+        """
+        if c is not self.parsed:
+            return {x[0]: decode(x[1]) for x in c[section].items()}
+        if section not in self.sections:
+            self.sections[section] = {x[0]: decode(x[1]) for x in c[section].items()}
+        return self.sections[section]
+
+    def get_section(self, c: configparser.ConfigParser, section: str) -> dict:
+        """
+        Parse each entry of a section as a dict. A copy is returned such that callers may modify it
+        freely.
+        :param c: config object
+        :param section: name of the section
+        :return: section as dict
+        """
+        return copy.deepcopy(self.decode_section(c, section))
 
     def convert_or_create_config(self):
         """
@@ -57,12 +415,12 @@ class Config:
                 with open(f'{self.CONFIG_DIR}/{x}', 'r') as f:
                     # Set each configuration to section
                     for y in json.loads(f.read()).items():
-                        c.set(x, y[0], str(y[1]))
+                        c.set(x, y[0], str(y[1]) if x == 'spotirecoauth' else encode(y[1]))
             except (FileNotFoundError, json.JSONDecodeError):
                 # If file isn't found or is empty, pass and leave section empty
                 if x == 'blacklist':
-                    c.set(x, 'tracks', str({}))
-                    c.set(x, 'artists', str({}))
+                    c.set(x, 'tracks', encode({}))
+                    c.set(x, 'artists', encode({}))
                 pass
         self.LOGGER.info('done')
         self.LOGGER.info('if you have the old style config files you may safely delete these, '
@@ -92,19 +450,15 @@ class Config:
         c = self.open_config()
         try:
             self.LOGGER.verbose('getting blacklist')
-            blacklist = {}
-            for x in c['blacklist'].items():
-                # Parse each blacklist entry as dict
-                blacklist[x[0]] = ast.literal_eval(x[1])
-            return blacklist
+            return self.get_section(c, 'blacklist')
         except KeyError:
             self.LOGGER.verbose('blacklist not found, creating empty')
             c.add_section('blacklist')
-            c.set('blacklist', 'tracks', str({}))
-            c.set('blacklist', 'artists', str({}))
+            c.set('blacklist', 'tracks', encode({}))
+            c.set('blacklist', 'artists', encode({}))
             self.save_config(c)
-            return {'tracks': ast.literal_eval(c.get('blacklist', 'tracks')),
-                    'artists': ast.literal_eval(c.get('blacklist', 'artists'))}
+            return {'tracks': decode(c.get('blacklist', 'tracks')),
+                    'artists': decode(c.get('blacklist', 'artists'))}
 
     def check_item_in_blacklist(self, uri):
         """
@@ -112,7 +466,25 @@ class Config:
         :param uri: uri of track or artist
         :return: bool: true if uri is blacklisted, false if not
         """
-        return uri in self.get_blacklist()[f'{uri.split(":")[1]}s'].keys()
+        bloom = self.get_blacklist_filter()
+        if bloom is not None and uri not in bloom:
+            return False
+        try:
+            blacklist = self.decode_section(self.open_config(), 'blacklist')
+        except KeyError:
+            blacklist = self.get_blacklist()
+        return uri in blacklist.get(f'{get_uri_type(uri)}s', {}).keys()
+
+    def get_blacklist_entries(self, entry_type: str) -> dict:
+        """
+        Retrieve the blacklist entries of a single type, without decoding the others
+        :param entry_type: type of entries; 'tracks', 'artists', 'albums' or 'genres'
+        :return: entries as dict
+        """
+        c = self.open_config()
+        if c is self.parsed and 'blacklist' in self.sections:
+            return copy.deepcopy(self.sections['blacklist'].get(entry_type, {}))
+        return decode(c.get('blacklist', entry_type, fallback=encode({})))
 
     def add_to_blacklist(self, uri_data: json, uri: str):
         """
@@ -125,7 +497,7 @@ class Config:
         if not re.match(self.URI_RE, uri):
             self.LOGGER.warning(f'uri {uri} is not a valid uri')
             return
-        uri_type = uri.split(':')[1]
+        uri_type = get_uri_type(uri)
         # Convert entry to dict
         data = {'name': uri_data['name'], 'uri': uri}
         try:
@@ -134,10 +506,12 @@ class Config:
             pass
         c = self.open_config()
         self.LOGGER.info(f'adding {uri_type} {data["name"]} to blacklist')
-        # Get the blacklist type entry from config and parse as dict, and add entry
-        blacklist = ast.literal_eval(c.get('blacklist', f'{uri_type}s'))
-        blacklist[uri] = data
-        c.set('blacklist', f'{uri_type}s', str(blacklist))
+        # Get the parsed blacklist type entry from config and add entry
+        blacklist = self.decode_section(c, 'blacklist')
+        # Albums and genres are missing from blacklists created before they could be blacklisted
+        blacklist.setdefault(f'{uri_type}s', {})[uri] = data
+        self.modified.add('blacklist')
+        self.bloom_pending.append(uri)
         self.save_config(c)
 
     def remove_from_blacklist(self, uri: str):
@@ -151,13 +525,13 @@ class Config:
             self.LOGGER.warning(f'uri {uri} is not a valid uri')
             return
         c = self.open_config()
-        uri_type = uri.split(':')[1]
+        uri_type = get_uri_type(uri)
         # Ensure entry exists and delete if so
         try:
-            blacklist = ast.literal_eval(c.get('blacklist', f'{uri_type}s'))
+            blacklist = self.decode_section(c, 'blacklist')[f'{uri_type}s']
             self.LOGGER.info(f'removing {uri_type} {blacklist[uri]["name"]} from blacklist')
             del blacklist[uri]
-            c.set('blacklist', f'{uri_type}s', str(blacklist))
+            self.modified.add('blacklist')
         except KeyError:
             self.LOGGER.error(f'{uri_type} {uri} does not exist in blacklist')
         self.save_config(c)
@@ -170,10 +544,7 @@ class Config:
         c = self.open_config()
         try:
             self.LOGGER.verbose('getting presets')
-            presets = {}
-            for x in c['presets'].items():
-                presets[x[0]] = ast.literal_eval(x[1])
-            return presets
+            return self.get_section(c, 'presets')
         except KeyError:
             self.LOGGER.verbose('presets not found, creating empty')
             c.add_section('presets')
@@ -191,7 +562,8 @@ class Config:
             c['presets']
         except KeyError:
             c.add_section('presets')
-        c.set('presets', preset_id, str(preset))
+        c.set('presets', preset_id, encode(preset))
+        self.sections.pop('presets', None)
         self.LOGGER.info(f'added preset {preset_id} to config')
         self.save_config(c)
 
@@ -203,6 +575,7 @@ class Config:
         """
         c = self.open_config()
         if c.remove_option('presets', iden):
+            self.sections.pop('presets', None)
             self.LOGGER.info(f'deleted preset {iden} from config')
             self.save_config(c)
         else:
@@ -216,11 +589,7 @@ class Config:
         c = self.open_config()
         try:
             self.LOGGER.verbose('getting devices')
-            devices = {}
-            for x in c['devices'].items():
-                # Parse each preset entry as dict
-                devices[x[0]] = ast.literal_eval(x[1])
-            return devices
+            return self.get_section(c, 'devices')
         except KeyError:
             self.LOGGER.verbose('devices not found, creating empty')
             c.add_section('devices')
@@ -239,7 +608,8 @@ class Config:
             c['devices']
         except KeyError:
             c.add_section('devices')
-        c.set('devices', device_id, str(device))
+        c.set('devices', device_id, encode(device))
+        self.sections.pop('devices', None)
         self.LOGGER.info(f'added device {device_id} to config')
         self.save_config(c)
 
@@ -251,6 +621,7 @@ class Config:
         """
         c = self.open_config()
         if c.remove_option('devices', iden):
+            self.sections.pop('devices', None)
             self.LOGGER.info(f'deleted device {iden} from config')
             self.save_config(c)
         else:
@@ -264,11 +635,7 @@ class Config:
         c = self.open_config()
         try:
             self.LOGGER.verbose('getting playlists')
-            playlists = {}
-            for x in c['playlists'].items():
-                # Parse each playlist entry as dict
-                playlists[x[0]] = ast.literal_eval(x[1])
-            return playlists
+            return self.get_section(c, 'playlists')
         except KeyError:
             self.LOGGER.verbose('playlists not found, creating empty')
             c.add_section('playlists')
@@ -287,7 +654,8 @@ class Config:
             c['playlists']
         except KeyError:
             c.add_section('playlists')
-        c.set('playlists', playlist_id, str(playlist))
+        c.set('playlists', playlist_id, encode(playlist))
+        self.sections.pop('playlists', None)
         self.LOGGER.info(f'added playlist {playlist_id} to config')
         self.save_config(c)
 
@@ -299,7 +667,261 @@ class Config:
         """
         c = self.open_config()
         if c.remove_option('playlists', iden):
+            self.sections.pop('playlists', None)
             self.LOGGER.info(f'deleted playlist {iden} from config')
             self.save_config(c)
         else:
             self.LOGGER.error(f'playlist {iden} does not exist in config')
+
+
+class SQLiteConfig(Config):
+    """
+    Config handler storing the blacklist, presets, devices and playlists in an SQLite database,
+    rather than as single values in the config file. OAuth credentials remain in the config file.
+    """
+    SCHEMA_VERSION = 1
+    TABLES = ['presets', 'devices', 'playlists']
+
+    def __init__(self):
+        super().__init__()
+        self.connection = None
+        self.db_lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Open the database, creating it on first use. A new database is populated with the entries
+        of the config file.
+        :return: database connection
+        """
+        if self.connection is None:
+            self.LOGGER.verbose('opening database')
+            self.connection = sqlite3.connect(f'{self.CONFIG_DIR}/{self.DATABASE_FILE}',
+                                              check_same_thread=False)
+            version = self.connection.execute('PRAGMA user_version').fetchone()[0]
+            if version < self.SCHEMA_VERSION:
+                self.create_schema()
+                self.migrate()
+        return self.connection
+
+    def close(self):
+        """
+        Close the database connection, if it is open
+        """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Run statements in a transaction, which is committed on success unless a batch is active,
+        and rolled back on failure.
+        :return: context manager yielding the database connection
+        """
+        with self.db_lock:
+            connection = self.connect()
+            try:
+                yield connection
+            except BaseException:
+                connection.rollback()
+                raise
+            if not self.batch_depth:
+                connection.commit()
+
+    def flush(self):
+        """
+        Commit the changes of a batch, along with any changes to the config file
+        """
+        super().flush()
+        with self.db_lock:
+            if self.connection is not None:
+                self.connection.commit()
+
+    def discard(self):
+        """
+        Roll back the changes of a batch, along with any changes to the config file
+        """
+        super().discard()
+        with self.db_lock:
+            if self.connection is not None:
+                self.connection.rollback()
+
+    def create_schema(self):
+        """
+        Create tables of the database
+        """
+        self.LOGGER.verbose('creating database tables')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS blacklist (uri TEXT PRIMARY KEY, '
+                                    'type TEXT NOT NULL, data TEXT NOT NULL)')
+            self.connection.execute('CREATE INDEX IF NOT EXISTS blacklist_type ON blacklist (type)')
+            for table in self.TABLES:
+                self.connection.execute(f'CREATE TABLE IF NOT EXISTS {table} '
+                                        f'(id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+
+    def migrate(self):
+        """
+        Copy the blacklist, presets, devices and playlists of the config file to the database
+        """
+        self.LOGGER.info('migrating config to database...')
+        blacklist = super().get_blacklist()
+        entries = {'presets': super().get_presets(), 'devices': super().get_devices(),
+                   'playlists': super().get_playlists()}
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO blacklist VALUES (?, ?, ?)',
+                [(uri, get_uri_type(uri), encode(data)) for x in blacklist.values()
+                 for uri, data in x.items()])
+            for table, items in entries.items():
+                self.connection.executemany(f'INSERT OR REPLACE INTO {table} VALUES (?, ?)',
+                                            [(x[0], encode(x[1])) for x in items.items()])
+            self.connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+        self.LOGGER.info('done')
+        self.LOGGER.info(f'the blacklist, presets, devices and playlists in {self.CONFIG_FILE} '
+                         f'are no longer used, but may be kept as backup')
+
+    def get_blacklist(self) -> dict:
+        """
+        Retrieve blacklist from database
+        :return: blacklist as dict
+        """
+        self.LOGGER.verbose('getting blacklist')
+        blacklist = {'tracks': {}, 'artists': {}}
+        with self.db_lock:
+            rows = self.connect().execute('SELECT uri, type, data FROM blacklist ORDER BY rowid')
+            for uri, uri_type, data in rows:
+                blacklist.setdefault(f'{uri_type}s', {})[uri] = decode(data)
+        return blacklist
+
+    def get_blacklist_filter(self):
+        """
+        Blacklist lookups are indexed by the database, such that no bloom filter is needed
+        :return: None
+        """
+        return None
+
+    def get_blacklist_entries(self, entry_type: str) -> dict:
+        """
+        Retrieve the blacklist entries of a single type
+        :param entry_type: type of entries; 'tracks', 'artists', 'albums' or 'genres'
+        :return: entries as dict
+        """
+        with self.db_lock:
+            rows = self.connect().execute(
+                'SELECT uri, data FROM blacklist WHERE type = ? ORDER BY rowid',
+                (entry_type[:-1],))
+            return {uri: decode(data) for uri, data in rows}
+
+    def check_item_in_blacklist(self, uri):
+        """
+        Checks whether or not a track or artist is blacklisted
+        :param uri: uri of track or artist
+        :return: bool: true if uri is blacklisted, false if not
+        """
+        with self.db_lock:
+            return self.connect().execute('SELECT 1 FROM blacklist WHERE uri = ?',
+                                          (uri,)).fetchone() is not None
+
+    def add_to_blacklist(self, uri_data: json, uri: str):
+        """
+        Add entry to blacklist
+        :param uri_data: data regarding blacklist entry retrieved from API
+        :param uri: URI of blacklist entry
+        """
+        # Ensure input is valid
+        if not re.match(self.URI_RE, uri):
+            self.LOGGER.warning(f'uri {uri} is not a valid uri')
+            return
+        uri_type = get_uri_type(uri)
+        # Convert entry to dict
+        data = {'name': uri_data['name'], 'uri': uri}
+        try:
+            data['artists'] = [x['name'] for x in uri_data['artists']]
+        except KeyError:
+            pass
+        self.LOGGER.info(f'adding {uri_type} {data["name"]} to blacklist')
+        with self.transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO blacklist VALUES (?, ?, ?)',
+                               (uri, uri_type, encode(data)))
+
+    def remove_from_blacklist(self, uri: str):
+        """
+        Remove entry from blacklist
+        :param uri: URI of blacklist entry
+        """
+        # Ensure input is valid
+        if not re.match(self.URI_RE, uri):
+            self.LOGGER.warning(f'uri {uri} is not a valid uri')
+            return
+        uri_type = get_uri_type(uri)
+        with self.transaction() as connection:
+            row = connection.execute('SELECT data FROM blacklist WHERE uri = ?',
+                                     (uri,)).fetchone()
+            if row is None:
+                self.LOGGER.error(f'{uri_type} {uri} does not exist in blacklist')
+                return
+            self.LOGGER.info(f'removing {uri_type} {decode(row[0])["name"]} from blacklist')
+            connection.execute('DELETE FROM blacklist WHERE uri = ?', (uri,))
+
+    def get_entries(self, table: str) -> dict:
+        """
+        Retrieve all entries of a table
+        :param table: name of the table; 'presets', 'devices' or 'playlists'
+        :return: entries as dict
+        """
+        self.LOGGER.verbose(f'getting {table}')
+        with self.db_lock:
+            rows = self.connect().execute(f'SELECT id, data FROM {table} ORDER BY rowid')
+            return {iden: decode(data) for iden, data in rows}
+
+    def save_entry(self, table: str, entry: dict, iden: str):
+        """
+        Add entry to a table, replacing any entry with the same identifier
+        :param table: name of the table; 'presets', 'devices' or 'playlists'
+        :param entry: entry data
+        :param iden: identifier of the entry
+        """
+        with self.transaction() as connection:
+            connection.execute(f'INSERT OR REPLACE INTO {table} VALUES (?, ?)',
+                               (iden, encode(entry)))
+        self.LOGGER.info(f'added {table[:-1]} {iden} to config')
+
+    def remove_entry(self, table: str, iden: str):
+        """
+        Remove entry from a table
+        :param table: name of the table; 'presets', 'devices' or 'playlists'
+        :param iden: identifier of the entry
+        """
+        with self.transaction() as connection:
+            removed = connection.execute(f'DELETE FROM {table} WHERE id = ?', (iden,)).rowcount
+        if removed:
+            self.LOGGER.info(f'deleted {table[:-1]} {iden} from config')
+        else:
+            self.LOGGER.error(f'{table[:-1]} {iden} does not exist in config')
+
+    def get_presets(self) -> dict:
+        return self.get_entries('presets')
+
+    def save_preset(self, preset: dict, preset_id: str):
+        self.save_entry('presets', preset, preset_id)
+
+    def remove_preset(self, iden: str):
+        self.remove_entry('presets', iden)
+
+    def get_devices(self) -> dict:
+        return self.get_entries('devices')
+
+    def save_device(self, device: dict, device_id: str):
+        self.save_entry('devices', device, device_id)
+
+    def remove_device(self, iden: str):
+        self.remove_entry('devices', iden)
+
+    def get_playlists(self) -> dict:
+        return self.get_entries('playlists')
+
+    def save_playlist(self, playlist: dict, playlist_id: str):
+        self.save_entry('playlists', playlist, playlist_id)
+
+    def remove_playlist(self, iden: str):
+        self.remove_entry('playlists', iden)
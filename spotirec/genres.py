@@ -0,0 +1,69 @@
+import collections
+import heapq
+import math
+from operator import itemgetter
+
+
+def top_genres(counts: dict, k: int) -> list:
+    """
+    Select the genres with the highest counts, without sorting all genres. Genres with equal
+    counts keep their original order.
+    :param counts: dict mapping genres to their counts
+    :param k: amount of genres to select
+    :return: list of at most k genres, highest count first
+    """
+    return [x[0] for x in heapq.nlargest(k, counts.items(), key=itemgetter(1))]
+
+
+class GenreAggregator:
+    """
+    Aggregates the genres of ranked artists into weighted counts of genre seeds. Artists are
+    weighted by their rank, discounted logarithmically such that top artists count the most.
+    """
+
+    def __init__(self, genre_seeds):
+        """
+        :param genre_seeds: genre seeds to count, supporting constant time membership tests
+        """
+        self.genre_seeds = genre_seeds
+        self.counts = collections.Counter()
+        # Genres of artists mapped to genre seeds, as the same genres occur for many artists
+        self.seeds = {}
+
+    def to_seed(self, genre: str):
+        """
+        Map a genre of an artist to a genre seed
+        :param genre: genre of an artist
+        :return: genre seed, or None if the genre is not a seed
+        """
+        try:
+            return self.seeds[genre]
+        except KeyError:
+            seed = genre.replace(' ', '-')
+            self.seeds[genre] = seed if seed in self.genre_seeds else None
+            return self.seeds[genre]
+
+    def add(self, artists, weight=1.0):
+        """
+        Count the genre seeds of artists in a single pass
+        :param artists: iterable of artists as json objects, highest ranked first
+        :param weight: weight of the highest ranked artist
+        """
+        counts = self.counts
+        for rank, artist in enumerate(artists):
+            artist_weight = weight / math.log2(rank + 2)
+            # Genres mapping to the same seed are only counted once per artist
+            for seed in dict.fromkeys(self.to_seed(x) for x in artist['genres']):
+                if seed is not None:
+                    counts[seed] += artist_weight
+
+    def top(self, k: int) -> list:
+        """
+        Select the genre seeds with the highest weighted counts
+        :param k: amount of genre seeds to select
+        :return: list of at most k genre seeds, highest count first
+        """
+        return top_genres(self.counts, k)
+
+    def __len__(self) -> int:
+        return len(self.counts)
@@ -0,0 +1,33 @@
+import importlib
+import threading
+
+
+class LazyImport:
+    """
+    Stand-in for a module, or an attribute of a module, that is only imported once it is used.
+    Commands that never need a heavy dependency, e.g. Pillow or bottle, thus never pay for
+    importing it at startup.
+    """
+    def __init__(self, module: str, attr=None):
+        self.module = module
+        self.attr = attr
+        self.obj = None
+        self.lock = threading.Lock()
+
+    def resolve(self):
+        """
+        Import the module, if it has not been imported yet
+        :return: module, or attribute of the module
+        """
+        if self.obj is None:
+            with self.lock:
+                if self.obj is None:
+                    obj = importlib.import_module(self.module)
+                    self.obj = getattr(obj, self.attr) if self.attr else obj
+        return self.obj
+
+    def __getattr__(self, name: str):
+        return getattr(self.resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
@@ -1,5 +1,12 @@
 from pathlib import Path
+import atexit
+import collections
+import datetime
+import json
 import os
+import queue
+import sys
+import threading
 import time
 
 NOTSET = 0
@@ -11,11 +18,97 @@ DEBUG = 50
 LOG_LEVELS = {0: 'NOTSET', 10: 'ERROR', 20: 'WARNING', 30: 'INFO', 40: 'VERBOSE', 50: 'DEBUG'}
 
 
+class FileWriter:
+    """
+    Writes records to file from a background thread, such that logging never waits on disk. Files
+    are rotated daily and named after the process, such that concurrent runs never write to the
+    same file.
+    """
+    # Maximum amount of records written between flushes
+    BUFFER = 256
+
+    def __init__(self, log_path: str, format_record, extension: str):
+        self.log_path = log_path
+        self.format_record = format_record
+        self.extension = extension
+        self.queue = queue.Queue()
+        self.file_name = self.get_file_name(time.time())
+        self.file = open(f'{self.log_path}/{self.file_name}', 'a')
+        self.thread = threading.Thread(target=self.run, name='spotirec-log', daemon=True)
+        self.thread.start()
+
+    def get_file_name(self, created: float) -> str:
+        t = time.localtime(created)
+        return f'spotirec_{t.tm_mday}-{t.tm_mon}-{t.tm_year}.{os.getpid()}.{self.extension}'
+
+    def write(self, record: tuple):
+        self.queue.put(record)
+
+    def flush(self):
+        """
+        Wait until all records written so far are on file
+        """
+        self.queue.join()
+
+    def close(self):
+        """
+        Write all remaining records, then stop the writer thread and close the file
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+    def rotate(self, created: float):
+        """
+        Switch to the file of the day a record was created on, if it is not the current file
+        :param created: time the record was created
+        """
+        file_name = self.get_file_name(created)
+        if file_name != self.file_name:
+            self.file.close()
+            self.file_name = file_name
+            self.file = open(f'{self.log_path}/{self.file_name}', 'a')
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.BUFFER:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for record in batch:
+                    if record is None:
+                        self.file.close()
+                        return
+                    self.rotate(record[0])
+                    self.file.write(self.format_record(record))
+                self.file.flush()
+            except Exception as e:
+                # The writer thread must outlive failed records, or flush() would wait forever
+                print(f'failed to write log: {e}', file=sys.stderr)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+
 class Log:
     LEVEL = INFO
     SUPPRESS_WARNINGS = False
+    STRUCTURED = False
     LOG_PATH = f'{Path.home()}/.config/spotirec/logs'
-    LOG = ''
+    # Maximum amount of records kept in memory - the oldest records are dropped first
+    CAPACITY = 10000
+
+    def __init__(self):
+        # Messages are either strings, %-style format strings with args, or callables returning
+        # the message. Records are kept unrendered, and messages are only rendered once they are
+        # printed or written to file, such that expensive messages cost nothing at lower levels.
+        # Format args and callables must therefore not change after they are logged - callers
+        # pass snapshots of data that may change later.
+        self.records = collections.deque(maxlen=self.CAPACITY)
+        self.stream = None
+        self.writer = None
 
     def set_level(self, level: int):
         self.LEVEL = level
@@ -23,39 +116,147 @@ class Log:
     def suppress_warnings(self, suppress: bool):
         self.SUPPRESS_WARNINGS = suppress
 
-    def log_file(self, crash=False):
-        if not os.path.isdir(self.LOG_PATH):
-            os.makedirs(self.LOG_PATH)
+    def set_structured(self, structured: bool):
+        self.STRUCTURED = structured
+
+    def set_capacity(self, capacity: int):
+        self.CAPACITY = capacity
+        self.records = collections.deque(self.records, maxlen=capacity)
+
+    def enabled_for(self, level: int) -> bool:
+        """
+        Check whether messages at a log level are rendered as soon as they are logged
+        :param level: log level
+        :return: true if messages are printed or streamed to file, otherwise false
+        """
+        return self.LEVEL >= level or self.stream is not None or self.writer is not None
+
+    def render(self, msg, args=()) -> str:
+        """
+        Render a message
+        :param msg: message, format string, or callable returning the message
+        :param args: %-style format args
+        :return: message as a string
+        """
+        msg = msg() if callable(msg) else str(msg)
+        return msg % args if args else msg
+
+    def format_record(self, record: tuple) -> str:
+        """
+        Render a record as a line of the log
+        :param record: record as a tuple of time, level name, message, format args, and fields
+        :return: record as a string
+        """
+        created, level_name, msg, args, _ = record
+        return f'[{time.ctime(created)}][{level_name}]: {self.render(msg, args)}\n'
+
+    def format_json(self, record: tuple) -> str:
+        """
+        Render a record as a JSON line
+        :param record: record as a tuple of time, level name, message, format args, and fields
+        :return: record as a JSON string
+        """
+        created, level_name, msg, args, fields = record
+        timestamp = datetime.datetime.fromtimestamp(created).astimezone()
+        entry = {'timestamp': timestamp.isoformat(timespec='milliseconds'), 'level': level_name,
+                 'event': self.render(msg, args), 'request_id': None, 'duration': None, **fields}
+        return json.dumps(entry, default=str) + '\n'
+
+    def get_log(self) -> str:
+        """
+        Retrieve the records kept in memory
+        :return: records as a string
+        """
+        return ''.join(self.format_record(x) for x in self.records)
+
+    def get_file_name(self, crash=False) -> str:
         t = time.localtime()
-        file_name = f'spotirec_{t.tm_mday}-{t.tm_mon}-{t.tm_year}.{"crash." if crash else ""}log'
-        with open(f'{self.LOG_PATH}/{file_name}', 'w') as file:
-            file.write(self.LOG)
+        return f'spotirec_{t.tm_mday}-{t.tm_mon}-{t.tm_year}.{"crash." if crash else ""}log'
+
+    def stream_to_file(self):
+        """
+        Write records to the log file as they are logged, starting with the records kept in memory,
+        rather than only once log_file() is called. Structured logs are written as JSON lines by a
+        background thread.
+        """
+        os.makedirs(self.LOG_PATH, exist_ok=True)
+        # Most commands exit without calling log_file(), so close the file on every exit
+        atexit.register(self.close)
+        if self.STRUCTURED:
+            self.writer = FileWriter(self.LOG_PATH, self.format_json, 'jsonl')
+            for record in self.records:
+                self.writer.write(record)
+            return
+        self.stream = open(f'{self.LOG_PATH}/{self.get_file_name()}', 'w')
+        self.stream.writelines(self.format_record(x) for x in self.records)
+
+    def log_file(self, crash=False):
+        """
+        Save the log to file. If records are streamed to file, the stream is closed - crash logs
+        always contain the records kept in memory.
+        :param crash: whether the log is saved because of a crash
+        """
+        os.makedirs(self.LOG_PATH, exist_ok=True)
+        file_name = self.get_file_name(crash)
+        if crash or (self.stream is None and self.writer is None):
+            if self.stream is not None:
+                self.stream.flush()
+            if self.writer is not None:
+                self.writer.flush()
+            with open(f'{self.LOG_PATH}/{file_name}', 'w') as file:
+                file.writelines(self.format_record(x) for x in self.records)
+        else:
+            if self.writer is not None:
+                file_name = self.writer.file_name
+            self.close()
         self.info(f'saved{" crash" if crash else ""} log to {self.LOG_PATH}/{file_name}')
 
-    def error(self, msg):
+    def close(self):
+        """
+        Stop streaming records to file, writing any records that are not on file yet
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def error(self, msg, *args, **fields):
         if self.LEVEL >= ERROR:
-            print('\033[91m' + 'ERROR: ' + '\033[0m' + str(msg))
-        self.append_log('ERROR', msg)
+            msg, args = self.render(msg, args), ()
+            print('\033[91m' + 'ERROR: ' + '\033[0m' + msg)
+        self.append_log('ERROR', msg, *args, **fields)
 
-    def warning(self, msg):
+    def warning(self, msg, *args, **fields):
         if self.LEVEL >= WARNING and not self.SUPPRESS_WARNINGS:
-            print('\033[93m' + 'WARNING: ' + '\033[0m' + str(msg))
-        self.append_log('WARNING', msg)
+            msg, args = self.render(msg, args), ()
+            print('\033[93m' + 'WARNING: ' + '\033[0m' + msg)
+        self.append_log('WARNING', msg, *args, **fields)
 
-    def info(self, msg):
+    def info(self, msg, *args, **fields):
         if self.LEVEL >= INFO:
-            print('\033[96m' + 'INFO: ' + '\033[0m' + str(msg))
-        self.append_log('INFO', msg)
+            msg, args = self.render(msg, args), ()
+            print('\033[96m' + 'INFO: ' + '\033[0m' + msg)
+        self.append_log('INFO', msg, *args, **fields)
 
-    def verbose(self, msg):
+    def verbose(self, msg, *args, **fields):
         if self.LEVEL >= VERBOSE:
-            print('\033[96m' + 'INFO: ' + '\033[0m' + str(msg))
-        self.append_log('INFO', msg)
+            msg, args = self.render(msg, args), ()
+            print('\033[96m' + 'INFO: ' + '\033[0m' + msg)
+        self.append_log('INFO', msg, *args, **fields)
 
-    def debug(self, msg):
+    def debug(self, msg, *args, **fields):
         if self.LEVEL >= DEBUG:
-            print('\033[94m' + 'DEBUG: ' + '\033[0m' + str(msg))
-        self.append_log('DEBUG', msg)
+            msg, args = self.render(msg, args), ()
+            print('\033[94m' + 'DEBUG: ' + '\033[0m' + msg)
+        self.append_log('DEBUG', msg, *args, **fields)
 
-    def append_log(self, level_name, msg):
-        self.LOG += f'[{time.ctime(time.time())}][{level_name}]: {str(msg)}\n'
+    def append_log(self, level_name, msg, *args, **fields):
+        # Fields such as request_id and duration are only kept in structured logs
+        record = (time.time(), level_name, msg, args, fields)
+        self.records.append(record)
+        if self.stream is not None:
+            self.stream.write(self.format_record(record))
+        if self.writer is not None:
+            self.writer.write(record)
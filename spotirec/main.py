@@ -8,5 +8,8 @@ def run():
     setup_config_dir()
     init()
     recommend()
-    if spotirec.args.log:
+    spotirec.logger.debug('request stats: %s', spotirec.api.get_scheduler().stats())
+    spotirec.logger.debug('cache stats: %s', spotirec.response_cache.stats())
+    spotirec.api.close_session()
+    if spotirec.args.log or spotirec.args.log_json:
         spotirec.logger.log_file()
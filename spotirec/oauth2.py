@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 import json
 import time
-import requests
 import base64
 from . import api as sp_api, conf as sp_conf, log
 from urllib import parse
@@ -59,7 +58,8 @@ class SpotifyOAuth:
         self.LOGGER.verbose('refreshing token')
         body = {'grant_type': 'refresh_token',
                 'refresh_token': refresh_token}
-        response = requests.post(self.OAUTH_TOKEN_URL, data=body, headers=self.encode_header())
+        response = self.API.send('POST', self.OAUTH_TOKEN_URL, data=body,
+                                 headers=self.encode_header())
         self.API.error_handle('token refresh', 200, 'POST', response=response)
         token = json.loads(response.content.decode('utf-8'))
         try:
@@ -90,7 +90,8 @@ class SpotifyOAuth:
         body = {'grant_type': 'authorization_code',
                 'code': code,
                 'redirect_uri': f'{self.redirect}:{self.PORT}'}
-        response = requests.post(self.OAUTH_TOKEN_URL, data=body, headers=self.encode_header())
+        response = self.API.send('POST', self.OAUTH_TOKEN_URL, data=body,
+                                 headers=self.encode_header())
         self.API.error_handle('token retrieve', 200, 'POST', response=response)
         token = json.loads(response.content.decode('utf-8'))
         self.LOGGER.debug(f'token: {token}')
@@ -1,5 +1,4 @@
 #!/usr/bin/env python
-import webbrowser
 import json
 import argparse
 import os
@@ -7,13 +6,21 @@ import hashlib
 import re
 import math
 import base64
-from . import oauth2, api as sp_api, conf as sp_conf, log, recommendation
+import bisect
+from . import oauth2, api as sp_api, blacklist as sp_blacklist, cache as sp_cache, \
+    conf as sp_conf, genres as sp_genres, lazy, log, recommendation
 import sys
 from io import BytesIO
-from PIL import Image
-from bottle import route, run, request
 from pathlib import Path
 
+# Only imported by the commands that need them - Pillow for playlist covers, and the browser and
+# bottle for authorization
+webbrowser = lazy.LazyImport('webbrowser')
+Image = lazy.LazyImport('PIL.Image')
+route = lazy.LazyImport('bottle', 'route')
+run = lazy.LazyImport('bottle', 'run')
+request = lazy.LazyImport('bottle', 'request')
+
 __version__ = '1.3.1'
 
 PORTS = [8000, 8001, 8002, 8003, 8004, 8005, 8006, 8007, 8008, 8009]
@@ -39,16 +46,27 @@ TUNE_ATTR = {'int': {'duration_ms': {'min': 0, 'max': sys.maxsize * 2 + 1, 'rec_
 URI_RE = r'spotify:(artist|track):[a-zA-Z0-9]+'
 PLAYLIST_URI_RE = r'spotify:playlist:[a-zA-Z0-9]+'
 TRACK_URI_RE = r'spotify:track:[a-zA-Z0-9]+'
+BLACKLIST_URI_RE = r'spotify:(artist|track|album):[a-zA-Z0-9]+|genre:.+'
 TUNE_RE = r'\w+_\w+=\d+(.\d+)?'
 SHOW_EPI_RE = r'spotify:(show|episode):[a-zA-Z0-9]+'
+TIME_RANGES = ['short_term', 'medium_term', 'long_term']
+# Bounds of gathering recommendations - over-fetching assumes at least REC_MIN_RATE of received
+# tracks are eligible
+REC_ROUNDS = 4
+REC_CONCURRENCY = 4
+REC_MIN_RATE = 0.1
+# Popularity targets of variant requests when there are too few seeds to vary
+REC_POPULARITY_TARGETS = [20, 40, 60, 80]
 
 logger = log.Log()
 conf = sp_conf.Config()
 api = sp_api.API()
+response_cache = sp_cache.ResponseCache()
 sp_oauth = oauth2.SpotifyOAuth()
 rec = recommendation.Recommendation()
 headers = {}
 args = None
+blacklist_index = None
 
 
 def create_parser() -> argparse.ArgumentParser:
@@ -76,6 +94,8 @@ spotirec is released under GPL-3.0 and comes with ABSOLUTELY NO WARRANTY, for de
     verbosity_group.add_argument('--log', action='store_true',
                                  help='log all output, including those above logging level, to '
                                       'file')
+    verbosity_group.add_argument('--log-json', action='store_true',
+                                 help='log all output to file as JSON lines, one file per process')
 
     # Recommendation schemes
     rec_scheme_group = arg_parser.add_argument_group(title='Recommendation schemes')
@@ -101,6 +121,12 @@ spotirec is released under GPL-3.0 and comes with ABSOLUTELY NO WARRANTY, for de
                              help='base recommendations on a custom seed')
     rec_scheme_group.add_argument('--preserve', action='store_true',
                                   help='preserve previous playlist and create new')
+    rec_scheme_group.add_argument('--diff', action='store_true',
+                                  help='update previous playlist with minimal changes rather than '
+                                       'replacing it')
+    rec_scheme_group.add_argument('--all-time-ranges', action='store_true',
+                                  help='base top genres on all top artists of every time range '
+                                       'rather than top 50')
 
     # Saving arguments
     save_group = arg_parser.add_argument_group(title='Saving arguments')
@@ -141,9 +167,11 @@ spotirec is released under GPL-3.0 and comes with ABSOLUTELY NO WARRANTY, for de
     # Blacklisting
     blacklist_group = arg_parser.add_argument_group(title='Blacklisting')
     blacklist_group.add_argument('-b', '--blacklist-add', metavar='URI', nargs='+', type=str,
-                                 help='blacklist track(s) and/or artist(s)')
+                                 help='blacklist track(s), artist(s), album(s) and/or genre(s) - '
+                                      'genres are given as genre:<name>')
     blacklist_group.add_argument('-br', '--blacklist-remove', metavar='URI', nargs='+', type=str,
-                                 help='remove track(s) and/or artists(s) from blacklist')
+                                 help='remove track(s), artists(s), album(s) and/or genre(s) from '
+                                      'blacklist')
 
     # Playback
     playback_group = arg_parser.add_argument_group(title='Playback')
@@ -159,13 +187,19 @@ spotirec is released under GPL-3.0 and comes with ABSOLUTELY NO WARRANTY, for de
                                   'genres, where TYPE=[artists|tracks|genres|genre-seeds|devices|'
                                   'blacklist|presets|playlists|tuning]')
     print_group.add_argument('--version', action='version', version=f'%(prog)s v{__version__}')
-    print_group.add_argument('--track-features', metavar='[URI | current]', nargs=1, type=str,
-                             help='print track features of URI or currently playing track')
+    print_group.add_argument('--track-features', metavar='[URI | current]', nargs='+', type=str,
+                             help='print track features of URI(s) or currently playing track')
 
     # Misc
     misc_group = arg_parser.add_argument_group(title='Misc')
     misc_group.add_argument('--auth', action='store_true',
                             help='force re-authorization of OAuth token')
+    misc_group.add_argument('--no-cache', action='store_true',
+                            help='bypass the response cache and request all data from the API')
+    misc_group.add_argument('--sqlite', action='store_true',
+                            help='store blacklist, presets, devices and playlists in a database - '
+                                 'existing entries are migrated, and the database is used from '
+                                 'then on')
 
     return arg_parser
 
@@ -197,6 +231,7 @@ def authorize(port=PORTS[0]):
     """
     logger.verbose('hosting localhost server')
     sp_oauth.PORT = port
+    route('/')(index)
     webbrowser.open(f'{sp_oauth.redirect}:{port}')
     try:
         logger.info(f'running authorization on {sp_oauth.redirect}:{port}')
@@ -212,10 +247,9 @@ def authorize(port=PORTS[0]):
             authorize(port=PORTS[next_port])
 
 
-@route('/')
 def index() -> str:
     """
-    This function is routed to http server hosted on localhost.
+    This function is routed to http server hosted on localhost by authorize().
     Retrieve code from redirect URL once authorization is complete and retrieve token from API.
     :return: success confirmation if access token is found
     :return: link to authorization if access token wasn't found
@@ -269,34 +303,50 @@ def format_identifier(identifier: str) -> str:
     return identifier.translate({ord(c): '_' for c in '½§"¾¤£€±`^*µ!@#$%^&*()[]{};:,./<>?\\|`~=+ '})
 
 
-def get_user_top_genres() -> dict:
+def aggregate_user_top_genres(all_time_ranges=False) -> sp_genres.GenreAggregator:
     """
-    Extract genres from user's top 50 artists and map them to their amount of occurrences
-    :return: dict of genres and their count of occurrences
+    Count the genre seeds of user's top 50 artists, weighted by the rank of each artist
+    :param all_time_ranges: count genres of all of user's top artists of every time range instead
+    :return: genre aggregator holding the weighted counts
     """
     logger.verbose('getting top genres')
-    data = api.get_top_list('artists', 50, headers)
-    logger.debug(f'got {len(data["items"])} artists for genres')
-    genre_seeds = api.get_genre_seeds(headers)
-    # Get all genres of each artist
-    artist_genres = [genre.replace(' ', '-') for x in data['items']
-                     for genre in x['genres'] if genre.replace(' ', '-') in genre_seeds['genres']]
-    # Map each genre to its count
-    genres = {genre: artist_genres.count(genre) for genre in artist_genres}
-    logger.debug(f'extracted {len(genres)} genre seeds from artists')
-    logger.debug(f'genre seeds: {genres}')
-    return genres
+    async_api = sp_api.AsyncAPI(api)
+    if all_time_ranges:
+        *top_lists, genre_seeds = sp_api.run_concurrently(
+            *(async_api.get_full_top_list('artists', headers, time_range=x) for x in TIME_RANGES),
+            async_api.get_genre_seed_registry(headers))
+    else:
+        data, genre_seeds = sp_api.run_concurrently(
+            async_api.get_top_list('artists', 50, headers),
+            async_api.get_genre_seed_registry(headers))
+        top_lists = [data['items']]
+    logger.debug(f'got {sum(len(x) for x in top_lists)} artists for genres')
+    aggregator = sp_genres.GenreAggregator(genre_seeds)
+    for artists in top_lists:
+        aggregator.add(artists)
+    logger.debug(f'extracted {len(aggregator)} genre seeds from artists')
+    logger.debug('genre seeds: %s', aggregator.counts)
+    return aggregator
+
+
+def get_user_top_genres(all_time_ranges=False) -> dict:
+    """
+    Extract genre seeds from user's top artists and map them to their weighted count of
+    occurrences
+    :param all_time_ranges: use all of user's top artists of every time range, rather than top 50
+    :return: dict of genres and their weighted count of occurrences
+    """
+    return dict(aggregate_user_top_genres(all_time_ranges).counts)
 
 
-def add_top_genres_seed(seed_count: int):
+def add_top_genres_seed(seed_count: int, all_time_ranges=False):
     """
-    Add top 5 genres to recommendation object seed info.
+    Add top genres to recommendation object seed info.
+    :param seed_count: amount of genres to add
+    :param all_time_ranges: use all of user's top artists of every time range, rather than top 50
     """
     logger.verbose(f'adding top {seed_count} genres to seeds')
-    sort = sorted(get_user_top_genres().items(), key=lambda kv: kv[1], reverse=True)
-    if seed_count > len(sort):
-        seed_count = len(sort)
-    parse_seed_info([sort[x][0] for x in range(0, seed_count)])
+    parse_seed_info(aggregate_user_top_genres(all_time_ranges).top(seed_count))
 
 
 def print_choices(data=None, prompt=True, sort=False) -> str:
@@ -392,7 +442,7 @@ def check_if_valid_genre(genre: str) -> bool:
     :param genre: user input genre
     :return: True if genre exists, False if not
     """
-    if any(g == genre for g in api.get_genre_seeds(headers)['genres']):
+    if genre in api.get_genre_seed_registry(headers):
         return True
     logger.debug(f'genre {genre} is invalid')
     return False
@@ -453,20 +503,29 @@ def check_tune_validity(tune: str):
 
 def filter_list_duplicates(li: list) -> list:
     """
-    Removes duplicates from a list
+    Removes duplicates from a list in linear time, keeping the first occurrence of each element in
+    its original position. Dicts are compared by their uri.
     :param li: original list of strings or dicts
     :return: list without duplicates
     """
-    # extract uris if elements are dicts
-    new_li = [x['uri'] if type(x) is dict else x for x in li]
-    # filter duplicates
-    new_li = sorted(list(set(new_li)), key=new_li.index)
+    unique = {}
     for x in li:
-        if type(x) is dict and x['uri'] in new_li:
-            new_li[new_li.index(x['uri'])] = x
-        elif x in new_li:
-            new_li[new_li.index(x)] = x
-    return new_li
+        unique.setdefault(x['uri'] if type(x) is dict else x, x)
+    return list(unique.values())
+
+
+def request_uri_data(uris: list) -> dict:
+    """
+    Retrieve data about several artists, tracks and/or albums, using as few requests as possible
+    :param uris: list of artist, track and/or album uris
+    :return: dict mapping each uri to its data
+    """
+    uri_data = {}
+    for data_type in ['artists', 'tracks', 'albums']:
+        uris_of_type = [x for x in uris if x.split(':')[1] == data_type[:-1]]
+        uri_data.update(zip(uris_of_type,
+                            api.request_data_batch(uris_of_type, data_type, headers)))
+    return uri_data
 
 
 def parse_seed_info(seeds):
@@ -480,19 +539,29 @@ def parse_seed_info(seeds):
         logger.error('please enter at most 5 seeds')
         logger.log_file(crash=True)
         sys.exit(1)
+    if rec.seed_type == 'custom':
+        # Look up all artist and track seeds at once, rather than one request per seed
+        genres = {x: check_if_valid_genre(x) for x in seeds}
+        uri_data = request_uri_data([x for x in seeds if not genres[x] and re.match(URI_RE, x)])
     # Parse each seed in input and add to seed string depending on type
     for x in seeds:
         logger.debug(f'seed: {x}')
         if rec.seed_type == 'genres':
             rec.add_seed_info(data_string=x)
         elif rec.seed_type == 'custom':
-            if check_if_valid_genre(x):
+            if genres[x]:
                 rec.add_seed_info(data_string=x)
-            elif re.match(URI_RE, x):
-                rec.add_seed_info(data_dict=api.request_data(x, f'{x.split(":")[1]}s', headers))
+            elif x in uri_data:
+                if uri_data[x] is None:
+                    logger.warning(f'could not find {x}, skipping...')
+                    continue
+                rec.add_seed_info(data_dict=uri_data[x])
             else:
                 logger.warning(f'input \"{x}\" does not match a genre or a valid URI syntax, '
                                f'skipping...')
+                completions = api.get_genre_seed_registry(headers).complete(x)
+                if completions:
+                    logger.info(f'did you mean: {", ".join(completions)}')
         else:
             rec.add_seed_info(data_dict=x)
 
@@ -512,19 +581,46 @@ def set_blacklist_current(entries: list) -> list:
     return entries
 
 
+def format_genre_entry(entry: str) -> str:
+    """
+    Normalize genre blacklist entries to the form of genre seeds, e.g. genre:indie-rock
+    :param entry: blacklist entry
+    :return: normalized entry, or the entry itself if it is not a genre
+    """
+    if not entry.startswith('genre:'):
+        return entry
+    return f'genre:{sp_blacklist.normalize_genre(entry.split(":", 1)[1])}'
+
+
 def add_to_blacklist(entries: list):
     """
     Add input uris to blacklist and exit
     :param entries: list of input uris
     """
+    global blacklist_index
     logger.verbose('adding blacklist entries')
+    new_entries = []
     for x in entries:
         if check_if_show_or_episode(x):
             continue
+        x = format_genre_entry(x)
         logger.debug(f'entry: {x}')
-        if not conf.check_item_in_blacklist(x):
-            uri_data = api.request_data(x, f'{x.split(":")[1]}s', headers)
-            conf.add_to_blacklist(uri_data, x)
+        if not re.match(BLACKLIST_URI_RE, x):
+            logger.warning(f'uri {x} is not a valid uri')
+        elif not conf.check_item_in_blacklist(x):
+            new_entries.append(x)
+    # Look up all new entries at once, rather than one request per entry - genres are only names
+    uri_data = request_uri_data([x for x in new_entries if x.startswith('spotify:')])
+    uri_data.update({x: {'name': x.split(':', 1)[1]} for x in new_entries
+                     if x.startswith('genre:')})
+    blacklist_index = None
+    # Write the config once, rather than once per entry
+    with conf.batch():
+        for uri, data in uri_data.items():
+            if data is None:
+                logger.warning(f'could not find {uri}, skipping...')
+                continue
+            conf.add_to_blacklist(data, uri)
 
 
 def remove_from_blacklist(entries: list):
@@ -532,12 +628,16 @@ def remove_from_blacklist(entries: list):
     Remove track(s) and/or artist(s) from blacklist.
     :param entries: list of uris
     """
+    global blacklist_index
     logger.verbose('removing blacklist entries')
-    for x in entries:
-        if check_if_show_or_episode(x):
-            continue
-        logger.debug(f'entry: {x}')
-        conf.remove_from_blacklist(x)
+    blacklist_index = None
+    with conf.batch():
+        for x in entries:
+            if check_if_show_or_episode(x):
+                continue
+            x = format_genre_entry(x)
+            logger.debug(f'entry: {x}')
+            conf.remove_from_blacklist(x)
 
 
 def print_blacklist():
@@ -551,6 +651,23 @@ def print_blacklist():
     print('\n' + '\033[1m' + 'Artists' + '\033[0m')
     for x in blacklist.get('artists').values():
         print(f'{x["name"]} - {x["uri"]}')
+    if blacklist.get('albums'):
+        print('\n' + '\033[1m' + 'Albums' + '\033[0m')
+        for x in blacklist.get('albums').values():
+            print(f'{x["name"]} by {", ".join(x["artists"])} - {x["uri"]}')
+    if blacklist.get('genres'):
+        print('\n' + '\033[1m' + 'Genres' + '\033[0m')
+        for x in blacklist.get('genres').values():
+            print(x['name'])
+
+
+def hash_tracks(tracks: list) -> str:
+    """
+    Hash a list of tracks to a playlist-unique string
+    :param tracks: list of track uris
+    :return: sha256 hex digest
+    """
+    return hashlib.sha256(''.join(str(x) for x in tracks).encode('utf-8')).hexdigest()
 
 
 def generate_img(tracks: list) -> Image:
@@ -562,7 +679,7 @@ def generate_img(tracks: list) -> Image:
     """
     logger.verbose('generating image')
     # Hash tracks to a playlist-unique string
-    track_hash = hashlib.sha256(''.join(str(x) for x in tracks).encode('utf-8')).hexdigest()
+    track_hash = hash_tracks(tracks)
     logger.debug(f'hash: {track_hash}')
     # Use the first six chars of the hash to generate a color
     # The hex value of three pairs of chars are converted to integers, yielding a list on the
@@ -576,7 +693,7 @@ def generate_img(tracks: list) -> Image:
     # each letter to light gray
     pixel_map = [color if re.match(r'[0-9]', x) else [200, 200, 200] for x in track_hash]
     # Add the pixel map to the image object and return as a size suited for the Spotify API
-    logger.debug(f'pixel map: {pixel_map}')
+    logger.debug('pixel map: %s', pixel_map)
     img.putdata([tuple(x) for x in pixel_map])
     return img.resize((320, 320), Image.AFFINE)
 
@@ -641,9 +758,10 @@ def remove_presets(presets: list):
     :param presets: list of devices
     """
     logger.verbose('removing presets')
-    for x in presets:
-        logger.debug(f'preset: {x}')
-        conf.remove_preset(x)
+    with conf.batch():
+        for x in presets:
+            logger.debug(f'preset: {x}')
+            conf.remove_preset(x)
 
 
 def print_presets():
@@ -735,9 +853,10 @@ def remove_devices(devices: list):
     :param devices: list of device(s)
     """
     logger.verbose('removing devices')
-    for x in devices:
-        logger.debug(f'device: {x}')
-        conf.remove_device(x)
+    with conf.batch():
+        for x in devices:
+            logger.debug(f'device: {x}')
+            conf.remove_device(x)
 
 
 def print_saved_devices():
@@ -808,9 +927,10 @@ def remove_playlists(playlists: list):
     :param playlists: list of playlist(s)
     """
     logger.verbose('removing playlists')
-    for x in playlists:
-        logger.debug(f'playlist: {x}')
-        conf.remove_playlist(x)
+    with conf.batch():
+        for x in playlists:
+            logger.debug(f'playlist: {x}')
+            conf.remove_playlist(x)
 
 
 def add_current_track(playlist: str):
@@ -834,8 +954,9 @@ def add_current_track(playlist: str):
     current_track = api.get_current_track(headers)
     if check_if_show_or_episode(current_track):
         return
-    playlist_tracks = [x['track']['uri']
-                       for x in api.get_playlist(headers, playlist_id)['tracks']['items']]
+    # Membership is checked lazily, so pages past the current track are never requested
+    playlist_tracks = (x['track']['uri'] for x in
+                       api.iter_playlist_tracks(playlist_id, headers, prefetch=True) if x['track'])
     if current_track in playlist_tracks:
         logger.warning(f'track {current_track} already exists in playlist, skipping...')
         return
@@ -862,25 +983,31 @@ def remove_current_track(playlist: str):
     current_track = api.get_current_track(headers)
     if check_if_show_or_episode(current_track):
         return
-    playlist_tracks = [x['track']['uri']
-                       for x in api.get_playlist(headers, playlist_id)['tracks']['items']]
+    # Membership is checked lazily, so pages past the current track are never requested
+    playlist_tracks = (x['track']['uri'] for x in
+                       api.iter_playlist_tracks(playlist_id, headers, prefetch=True) if x['track'])
     if current_track not in playlist_tracks:
         logger.warning(f'track {current_track} doesnt exist in playlist, skipping...')
         return
     api.remove_from_playlist([current_track], playlist_id, headers)
 
 
-def print_track_features(uri: str):
+def print_track_features(uri: str, audio_features=None, track_info=None):
     """
     Prints various information about a track
     :param uri: URI of track
+    :param audio_features: audio features of the track, retrieved from API if not given
+    :param track_info: data about the track, retrieved from API if not given
     """
     if not re.match(TRACK_URI_RE, uri):
         logger.error(f'{uri} is not a valid track URI')
         logger.log_file(crash=True)
         sys.exit(1)
-    audio_features = api.get_audio_features(uri.split(':')[2], headers)
-    track_info = api.request_data(uri, 'tracks', headers)
+    if audio_features is None or track_info is None:
+        async_api = sp_api.AsyncAPI(api)
+        audio_features, track_info = sp_api.run_concurrently(
+            async_api.get_audio_features(uri.split(':')[2], headers),
+            async_api.request_data(uri, 'tracks', headers))
     print('\t' + '\033[1m' + f'{track_info["name"]} - '
                              f'{", ".join(x["name"] for x in track_info["artists"])}' + '\033[0m')
     print(f'Track URI{" " * 21}{track_info["uri"]}')
@@ -906,6 +1033,32 @@ def print_track_features(uri: str):
     print(f'Tempo{" " * 25}{audio_features["tempo"]} bpm')
 
 
+def print_tracks_features(uris: list):
+    """
+    Prints various information about several tracks, retrieving the data for all of them at once
+    :param uris: list of track URIs
+    """
+    for x in uris:
+        if not re.match(TRACK_URI_RE, x):
+            logger.error(f'{x} is not a valid track URI')
+            logger.log_file(crash=True)
+            sys.exit(1)
+    async_api = sp_api.AsyncAPI(api)
+    audio_features, track_info = sp_api.run_concurrently(
+        async_api.get_audio_features_batch([x.split(':')[2] for x in uris], headers),
+        async_api.request_data_batch(uris, 'tracks', headers))
+    printed = False
+    for x in range(0, len(uris)):
+        # Unknown tracks are null in responses of several ids
+        if audio_features[x] is None or track_info[x] is None:
+            logger.error(f'could not find {uris[x]}, skipping...')
+            continue
+        if printed:
+            print()
+        print_track_features(uris[x], audio_features=audio_features[x], track_info=track_info[x])
+        printed = True
+
+
 def millis_to_stamp(x: int):
     """
     Convert milliseconds to a timestamp on the form "{hours}h {minutes}m {seconds}s".
@@ -937,29 +1090,170 @@ def transfer_playback(device_id):
     api.transfer_playback(device, headers)
 
 
+def load_blacklist_index() -> sp_blacklist.BlacklistIndex:
+    """
+    Build the exact blacklist index from config
+    :return: blacklist index
+    """
+    logger.verbose('building blacklist index')
+    return sp_blacklist.BlacklistIndex(conf.get_blacklist())
+
+
+def get_blacklist_index():
+    """
+    Retrieve the blacklist index on first use. Large blacklists are prefiltered with their bloom
+    filter, such that the exact index is only built if a track may be blacklisted.
+    :return: blacklist index
+    """
+    global blacklist_index
+    if blacklist_index is None:
+        bloom = conf.get_blacklist_filter()
+        if bloom is None:
+            blacklist_index = load_blacklist_index()
+        else:
+            blacklist_index = sp_blacklist.PrefilteredBlacklistIndex(
+                bloom, load_blacklist_index, conf.get_blacklist_entries('genres').keys())
+        logger.debug(f'blacklist entries: {len(blacklist_index)}')
+    return blacklist_index
+
+
 def filter_recommendations(data: json) -> list:
     """
-    Filter blacklisted artists and tracks from recommendations.
+    Filter blacklisted tracks, artists, albums and genres from recommendations.
     :param data: recommendations as json object.
     :return: list of eligible track URIs
     """
     logger.verbose('filtering tracks')
-    valid_tracks = []
-    blacklist = conf.get_blacklist()
-    for x in data['tracks']:
-        # If the URI of the current track is blacklisted or there is an intersection between
-        # the set of blacklisted artists and the set of artists of the current track,
-        # then skip - otherwise add to valid tracks
-        if any(x['uri'] == s for s in blacklist['tracks'].keys()) or len(
-                set(blacklist['artists'].keys()) & set(y['uri'] for y in x['artists'])) > 0:
-            continue
-        else:
-            valid_tracks.append(x['uri'])
+    index = get_blacklist_index()
+    artist_genres = None
+    if index.genres:
+        # Recommended tracks only carry simplified artists without genres, so look up the genres
+        # of all artists of the response at once
+        artist_genres = api.request_artist_genres(
+            [y['uri'] for x in data['tracks'] for y in x['artists']], headers)
+    valid_tracks = index.filter(data['tracks'], artist_genres)
     logger.debug(f'tracks filtered: {len(data["tracks"]) - len(valid_tracks)}')
     logger.debug(f'tracks left after filter: {len(valid_tracks)}')
     return valid_tracks
 
 
+def diff_playlist(current: list, new: list):
+    """
+    Compute the operations that turn the contents of a playlist into a new list of tracks. Tracks
+    that are not in the new list are removed, tracks that are out of order are moved, and new
+    tracks are inserted in runs. Tracks in the longest subsequence that is already in order are
+    never moved.
+    :param current: current track uris of the playlist
+    :param new: new track uris
+    :return: dict of operations, or None if either list contains duplicates
+    """
+    current_set = set(current)
+    new_set = set(new)
+    if len(current_set) != len(current) or len(new_set) != len(new):
+        return None
+    remove = [x for x in current if x not in new_set]
+    kept = [x for x in current if x in new_set]
+    target = [x for x in new if x in current_set]
+
+    # Find longest subsequence of kept tracks that is already in target order (patience sorting)
+    target_index = {x: i for i, x in enumerate(target)}
+    tails, tail_pos, previous = [], [], [None] * len(kept)
+    for i, x in enumerate(kept):
+        pos = bisect.bisect_left(tails, target_index[x])
+        if pos == len(tails):
+            tails.append(target_index[x])
+            tail_pos.append(i)
+        else:
+            tails[pos] = target_index[x]
+            tail_pos[pos] = i
+        previous[i] = tail_pos[pos - 1] if pos > 0 else None
+    stay = set()
+    i = tail_pos[-1] if tail_pos else None
+    while i is not None:
+        stay.add(kept[i])
+        i = previous[i]
+
+    # Move every other track to directly after its predecessor in target order
+    moves = []
+    order = list(kept)
+    position = {x: i for i, x in enumerate(order)}
+    for i, x in enumerate(target):
+        if x in stay:
+            continue
+        start = position[x]
+        insert_before = position[target[i - 1]] + 1 if i > 0 else 0
+        moves.append((start, insert_before))
+        track = order.pop(start)
+        order.insert(insert_before if insert_before < start else insert_before - 1, track)
+        position = {y: j for j, y in enumerate(order)}
+
+    # Insert new tracks in runs of consecutive positions
+    add = []
+    for i, x in enumerate(new):
+        if x in current_set:
+            continue
+        if add and add[-1][0] + len(add[-1][1]) == i:
+            add[-1][1].append(x)
+        else:
+            add.append((i, [x]))
+    return {'remove': remove, 'moves': moves, 'add': add}
+
+
+def refresh_playlist(playlist: dict, tracks: list):
+    """
+    Update the default playlist with the minimal set of operations, rather than replacing all of
+    its tracks. Falls back to replacing the tracks if that takes fewer requests. Playlist details
+    are only updated if they changed since the last refresh.
+    :param playlist: default playlist entry from config
+    :param tracks: list of track uris
+    :return: hash of the tracks if the cover image needs to be updated, otherwise None - the hash
+             should only be saved once the new cover is uploaded
+    """
+    logger.info('refreshing playlist')
+    current = [x['track']['uri'] if x['track'] else None
+               for x in api.iter_playlist_tracks(rec.playlist_id, headers, prefetch=True)]
+    operations = diff_playlist(current, tracks) if None not in current else None
+    replace_requests = max(1, math.ceil(len(tracks) / api.PLAYLIST_CHUNK))
+    if operations is None:
+        diff_requests = replace_requests
+    else:
+        chunks = [math.ceil(len(x[1]) / api.PLAYLIST_CHUNK) for x in operations['add']]
+        chunks.append(math.ceil(len(operations['remove']) / api.PLAYLIST_CHUNK))
+        diff_requests = sum(chunks) + len(operations['moves'])
+        if logger.enabled_for(log.DEBUG):
+            logger.debug(f'remove: {len(operations["remove"])}, move: {len(operations["moves"])}, '
+                         f'add: {sum(len(x[1]) for x in operations["add"])}')
+    if diff_requests >= replace_requests:
+        logger.verbose('replacing playlist tracks')
+        api.replace_playlist_tracks(rec.playlist_id, tracks, headers=headers)
+    else:
+        logger.verbose(f'updating playlist with {diff_requests} request(s)')
+        snapshot_id = None
+        if operations['remove']:
+            snapshot_id = api.remove_from_playlist(operations['remove'], rec.playlist_id, headers)
+        for start, insert_before in operations['moves']:
+            snapshot_id = api.reorder_playlist_tracks(rec.playlist_id, start, insert_before,
+                                                      headers, snapshot_id=snapshot_id)
+        for position, uris in operations['add']:
+            api.add_to_playlist(uris, rec.playlist_id, headers, position=position)
+    details_hash = hashlib.sha256(f'{rec.playlist_name}{rec.based_on}{rec.seed_info}'
+                                  .encode('utf-8')).hexdigest()
+    if playlist.get('details_hash') != details_hash:
+        api.update_playlist_details(rec.playlist_name, rec.playlist_description(),
+                                    rec.playlist_id, headers=headers)
+    else:
+        logger.verbose('playlist details are unchanged')
+    entry = {'name': playlist['name'], 'uri': playlist['uri'], 'details_hash': details_hash}
+    if 'image_hash' in playlist:
+        entry['image_hash'] = playlist['image_hash']
+    conf.save_playlist(entry, 'spotirec-default')
+    image_hash = hash_tracks(tracks)
+    if playlist.get('image_hash') == image_hash:
+        logger.verbose('playlist cover image is unchanged')
+        return None
+    return image_hash
+
+
 def print_tuning_options():
     """
     Prints available tuning options
@@ -984,6 +1278,78 @@ def print_tuning_options():
           'recommended range is not available, they may only be scarce at extreme values.')
 
 
+def vary_rec_params(params: dict, variant: int) -> dict:
+    """
+    Create a variant of recommendation parameters, such that concurrent requests yield different
+    tracks. Variant 0 is a copy of the parameters, other variants leave out one of the seeds. With
+    a single seed, variants target different popularities instead, unless popularity is tuned.
+    :param params: recommendation parameters
+    :param variant: index of the variant
+    :return: recommendation parameters as dict
+    """
+    params = dict(params)
+    seeds = [(key, x) for key in ['seed_artists', 'seed_genres', 'seed_tracks']
+             for x in params.get(key, '').split(',') if x]
+    if variant == 0:
+        return params
+    if len(seeds) < 2:
+        if not any(x.endswith('_popularity') for x in params):
+            targets = REC_POPULARITY_TARGETS
+            params['target_popularity'] = str(targets[(variant - 1) % len(targets)])
+        return params
+    key, seed = seeds[(variant - 1) % len(seeds)]
+    params[key] = ','.join(x for x in params[key].split(',') if x != seed)
+    return params
+
+
+def gather_recommendations() -> list:
+    """
+    Gather eligible recommendations until the playlist limit is reached. After the first request,
+    each round over-fetches by the share of tracks that were filtered or duplicates so far, and
+    sends several requests with varied seeds concurrently. Gathering stops after a bounded number
+    of rounds, or once a round yields no new tracks.
+    :return: list of unique track uris, at most as many as the playlist limit
+    """
+    limit = rec.limit_original
+    async_api = sp_api.AsyncAPI(api)
+    max_limit = api.BATCH_LIMITS['recommendations']
+    data = api.get_recommendations(rec.rec_params, headers)
+    received = len(data['tracks'])
+    tracks = filter_list_duplicates(filter_recommendations(data))
+    variant = 0
+    for _ in range(REC_ROUNDS):
+        missing = limit - len(tracks)
+        if missing <= 0:
+            break
+        rate = max(len(tracks) / received if received else 0, REC_MIN_RATE)
+        wanted = math.ceil(missing / rate)
+        requests = min(REC_CONCURRENCY, math.ceil(wanted / max_limit))
+        params = []
+        for _ in range(requests):
+            variant += 1
+            variant_params = dict(vary_rec_params(rec.rec_params, variant),
+                                  limit=str(min(max_limit, math.ceil(wanted / requests))))
+            # Identical requests would only yield duplicates
+            if variant_params not in params:
+                params.append(variant_params)
+        logger.debug(f'tracks missing: {missing}, eligible rate: {rate:.2f}, '
+                     f'requests: {len(params)}')
+        responses = sp_api.run_concurrently(*(async_api.get_recommendations(x, headers)
+                                              for x in params))
+        candidates = [x for response in responses for x in response['tracks']]
+        received += len(candidates)
+        # Only filter new candidates, and filter all responses at once such that any lookups are
+        # batched
+        known = set(tracks)
+        new_tracks = filter_recommendations(
+            {'tracks': [x for x in filter_list_duplicates(candidates) if x['uri'] not in known]})
+        if not new_tracks:
+            logger.verbose('no new recommendations received, stopping')
+            break
+        tracks += new_tracks
+    return tracks[:limit]
+
+
 def recommend():
     """
     Main function for recommendations. Retrieves recommendations and tops up list if any tracks
@@ -996,20 +1362,14 @@ def recommend():
     # Save as preset if requested
     if args.save_preset:
         save_preset(args.save_preset[0])
-    # Filter blacklisted artists and tracks from recommendations
-    tracks = filter_recommendations(api.get_recommendations(rec.rec_params, headers))
+    tracks = gather_recommendations()
     # If no tracks are left, notify an error and exit
     if len(tracks) == 0:
         logger.error('received zero tracks with your options - adjust and try again')
         logger.log_file(crash=True)
         sys.exit(1)
-    if len(tracks) <= rec.limit_original / 2:
-        logger.warning(f'only received {len(tracks)} different recommendations, you may receive '
-                       f'duplicates of these (this might take a few seconds)')
-    # Filter recommendations until length of track list matches limit preference
-    while len(tracks) < rec.limit_original:
-        rec.update_limit(rec.limit_original - len(tracks))
-        tracks += filter_recommendations(api.get_recommendations(rec.rec_params, headers))
+    if len(tracks) < rec.limit_original:
+        logger.warning(f'only received {len(tracks)} different recommendations')
 
     def create_new_playlist():
         rec.playlist_id = api.create_playlist(rec.playlist_name, rec.playlist_description(),
@@ -1017,22 +1377,38 @@ def recommend():
         api.add_to_playlist(tracks, rec.playlist_id, headers=headers)
 
     # Create playlist and add tracks
+    update_image = True
+    image_hash = None
     if args.preserve:
         logger.info('preserving playlist and creating new default')
         create_new_playlist()
     else:
         try:
-            rec.playlist_id = conf.get_playlists()['spotirec-default']['uri'].split(':')[2]
+            playlist = conf.get_playlists()['spotirec-default']
+            rec.playlist_id = playlist['uri'].split(':')[2]
             assert api.check_if_playlist_exists(rec.playlist_id, headers) is True
-            api.replace_playlist_tracks(rec.playlist_id, tracks, headers=headers)
-            api.update_playlist_details(rec.playlist_name, rec.playlist_description(),
-                                        rec.playlist_id, headers=headers)
+            if args.diff:
+                image_hash = refresh_playlist(playlist, tracks)
+                update_image = image_hash is not None
+            else:
+                api.replace_playlist_tracks(rec.playlist_id, tracks, headers=headers)
+                api.update_playlist_details(rec.playlist_name, rec.playlist_description(),
+                                            rec.playlist_id, headers=headers)
+                if 'details_hash' in playlist:
+                    # Hashes of a previous refresh no longer describe the playlist
+                    conf.save_playlist({'name': playlist['name'], 'uri': playlist['uri']},
+                                       'spotirec-default')
         except (KeyError, AssertionError):
             logger.info('playlist has either been deleted, or made private, creating new '
                         'default...')
             create_new_playlist()
     # Generate and upload dank-ass image
-    add_image_to_playlist(tracks)
+    if update_image:
+        add_image_to_playlist(tracks)
+        if image_hash is not None:
+            # Only remember the cover once it is uploaded, such that a failed upload is retried
+            playlist = conf.get_playlists()['spotirec-default']
+            conf.save_playlist({**playlist, 'image_hash': image_hash}, 'spotirec-default')
     # Print seed selection
     rec.print_selection()
     # Start playing on input device if auto-play is present
@@ -1102,10 +1478,10 @@ def parse():
             print_artists_or_tracks(data=api.get_top_list('tracks', 50, headers), prompt=False)
         if 'genres' in args.print:
             print('\033[4m\033[1m' + 'Top genres' + '\033[0m')
-            print_choices(data=get_user_top_genres(), sort=True, prompt=False)
+            print_choices(data=get_user_top_genres(args.all_time_ranges), sort=True, prompt=False)
         if 'genre-seeds' in args.print:
             print('\033[4m\033[1m' + 'Genre seeds' + '\033[0m')
-            print_choices(data=api.get_genre_seeds(headers)['genres'], prompt=False)
+            print_choices(data=list(api.get_genre_seed_registry(headers)), prompt=False)
         if 'blacklist' in args.print:
             print('\033[4m\033[1m' + 'Blacklist' + '\033[0m')
             print_blacklist()
@@ -1123,8 +1499,8 @@ def parse():
             print_tuning_options()
         sys.exit(0)
     if args.track_features:
-        print_track_features(api.get_current_track(headers) if
-                             args.track_features[0] == 'current' else args.track_features[0])
+        print_tracks_features([api.get_current_track(headers) if x == 'current' else x
+                               for x in args.track_features])
         sys.exit(0)
 
     if args.play:
@@ -1148,7 +1524,7 @@ def parse():
         parse_seed_info([x['track'] for x in api.get_saved_tracks(headers, limit=args.st)['items']])
     elif args.gcs:
         rec.based_on = 'custom seed genres'
-        print_choices(data=api.get_genre_seeds(headers)['genres'])
+        print_choices(data=list(api.get_genre_seed_registry(headers)))
     elif args.ac:
         rec.based_on = 'custom artists'
         rec.seed_type = 'artists'
@@ -1164,11 +1540,11 @@ def parse():
                                            for x in api.get_saved_tracks(headers)['items']]})
     elif args.gc:
         rec.based_on = 'custom top genres'
-        print_choices(data=get_user_top_genres(), sort=True)
+        print_choices(data=get_user_top_genres(args.all_time_ranges), sort=True)
     elif args.c:
         rec.based_on = 'custom mix'
         rec.seed_type = 'custom'
-        print_choices(data=get_user_top_genres(), prompt=False, sort=True)
+        print_choices(data=get_user_top_genres(args.all_time_ranges), prompt=False, sort=True)
         try:
             user_input = input('Enter a combination of 1-5 whitespace separated genre names, '
                                'track uris, and artist uris. \nGenres with several words should '
@@ -1183,7 +1559,7 @@ def parse():
         parse_seed_info(seeds)
     else:
         logger.info(f'basing recommendations off your top {args.n} genres')
-        add_top_genres_seed(args.n)
+        add_top_genres_seed(args.n, args.all_time_ranges)
 
     if args.l:
         rec.update_limit(args.l[0], init=True)
@@ -1196,7 +1572,7 @@ def parse():
 
 
 def init():
-    global rec, headers
+    global rec, headers, conf
 
     # Logging handler
     if args.verbose:
@@ -1208,17 +1584,34 @@ def init():
 
     if args.suppress_warnings:
         logger.suppress_warnings(True)
+    if args.log_json:
+        logger.set_structured(True)
+    if args.log or args.log_json:
+        logger.stream_to_file()
 
     logger.verbose('initialising')
     logger.debug(f'log level: {logger.LEVEL} ({log.LOG_LEVELS[logger.LEVEL]})')
     logger.debug(f'suppress warnings: {logger.SUPPRESS_WARNINGS}')
 
     # Config handler
+    use_database = args.sqlite or os.path.isfile(f'{conf.CONFIG_DIR}/{conf.DATABASE_FILE}')
+    if use_database and not isinstance(conf, sp_conf.SQLiteConfig):
+        sqlite_conf = sp_conf.SQLiteConfig()
+        sqlite_conf.CONFIG_DIR = conf.CONFIG_DIR
+        sqlite_conf.CONFIG_FILE = conf.CONFIG_FILE
+        conf = sqlite_conf
     conf.set_logger(logger)
 
     # API handler
     api.set_logger(logger)
     api.set_conf(conf)
+    if args.no_cache:
+        logger.verbose('response cache disabled')
+        api.set_cache(None)
+    else:
+        response_cache.CACHE_DIR = f'{CONFIG_PATH}/cache'
+        response_cache.set_logger(logger)
+        api.set_cache(response_cache)
 
     # OAuth handler
     sp_oauth.set_logger(logger)
@@ -1,3 +1,5 @@
+from urllib import parse
+
 URL_MAP = {}
 
 
@@ -44,6 +46,9 @@ class MockAPI:
                     'genres': ['metalcore', 'making-up-genres-is-hard'], 'id': 'testid4'}]}
     ARTIST = {'name': 'frankie0', 'uri': 'spotify:artist:testartist', 'type': 'artist',
               'genres': ['pop', 'metal', 'vapor-death-pop'], 'id': 'testartist'}
+    ALBUM = {'name': 'cool album', 'uri': 'spotify:album:testalbum', 'type': 'album',
+             'id': 'testalbum', 'artists': [{'name': 'frankie0', 'uri': 'spotify:artist:testartist',
+                                             'type': 'artist'}]}
 
     SAVED_TRACKS = {'items':
                     [{'track':
@@ -152,6 +157,8 @@ class MockAPI:
     PLAYLIST_TRACKS = {'id': 'testplaylist', 'name': 'testplaylist', 'type': 'playlist', 'uri':
                        'spotify:playlist:testid', 'tracks':
                        {'items': [{'track': {'uri': 'spotify:track:testtrack'}}]}, 'public': True}
+    ETAG = '"testetag"'
+    SNAPSHOT = {'snapshot_id': 'testsnapshot'}
     GENRES = {'genres': ['metal', 'metalcore', 'pop', 'vapor-death-pop', 'holidays']}
     DEVICES = {'devices': [{'id': 'testid0', 'name': 'test0', 'type': 'fridge'},
                {'id': 'testid1', 'name': 'test1', 'type': 'microwave'}]}
@@ -182,6 +189,22 @@ class MockAPI:
                         'token_type': 'Bearer', 'expires_in': 3600,
                         'scope': 'user-modify-playback-state ugc-image-upload user-library-modify'}
 
+    def Session(self):
+        return self
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def close(self):
+        pass
+
+    def request(self, method, url, **kwargs):
+        # next links of paging objects carry their parameters in the url
+        if '?' in url:
+            url, query = url.split('?', 1)
+            kwargs['params'] = dict(parse.parse_qsl(query))
+        return getattr(self, method.lower())(url, **kwargs)
+
     def get(self, url, **kwargs):
         error = self.test_validity(url, kwargs, 'GET')
         headers = kwargs.pop('headers')
@@ -226,6 +249,20 @@ class MockAPI:
         else:
             return error
 
+    def page(self, items: list, url: str, params: dict) -> dict:
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 20))
+        next_url = f'{url}?offset={offset + limit}&limit={limit}' \
+            if offset + limit < len(items) else None
+        return {'items': items[offset:offset + limit], 'next': next_url, 'offset': offset,
+                'limit': limit, 'total': len(items)}
+
+    def with_id(self, obj: dict, obj_type: str, iden: str) -> dict:
+        obj = dict(obj)
+        obj['id'] = iden
+        obj['uri'] = f'spotify:{obj_type}:{iden}'
+        return obj
+
     def test_validity(self, url: str, kwargs: dict, request_type: str):
         if not kwargs['headers']:
             return MockResponse(401, 'Unauthorized (missing headers)', request_type, {}, url)
@@ -293,6 +330,18 @@ class MockAPI:
         else:
             return MockResponse(403, 'Forbidden', method, headers, '/playlists/testplaylist')
 
+    @route('/playlists/testplaylistetag', ['GET'])
+    def playlist_etag(self, method, headers, data, json, params):
+        if method == 'GET':
+            if headers.get('If-None-Match') == self.ETAG:
+                return MockResponse(304, 'Not Modified', method, {'ETag': self.ETAG},
+                                    '/playlists/testplaylistetag')
+            return MockResponse(200, 'OK', method, {'ETag': self.ETAG},
+                                '/playlists/testplaylistetag',
+                                content=json_string(self.PLAYLIST_TRUE))
+        else:
+            return MockResponse(403, 'Forbidden', method, headers, '/playlists/testplaylistetag')
+
     @route('/playlists/testplaylistprivate', ['PUT', 'GET'])
     def playlist_private(self, method, headers, data, json, params):
         if method == 'GET':
@@ -309,17 +358,51 @@ class MockAPI:
         else:
             return MockResponse(403, 'Forbidden', method, headers, '/playlists/testplaylisttracks')
 
-    @route('/playlists/testplaylist/tracks', ['POST', 'PUT', 'DELETE'])
+    @route('/playlists/testplaylist/tracks', ['POST', 'PUT', 'DELETE', 'GET'])
     def playlist_tracks(self, method, headers, data, json, params):
-        if method == 'DELETE':
-            return MockResponse(200, 'OK', method, headers, '/playlists/testplaylist/tracks')
+        if method == 'GET':
+            return MockResponse(200, 'OK', method, headers, '/playlists/testplaylist/tracks',
+                                content=json_string(self.page([], '/playlists/testplaylist/tracks',
+                                                              params)))
+        elif method == 'DELETE':
+            return MockResponse(200, 'OK', method, headers, '/playlists/testplaylist/tracks',
+                                content=json_string(self.SNAPSHOT))
         elif method == 'POST':
-            return MockResponse(201, 'Created', method, headers, '/playlists/testplaylist/tracks')
+            return MockResponse(201, 'Created', method, headers, '/playlists/testplaylist/tracks',
+                                content=json_string(self.SNAPSHOT))
         elif method == 'PUT':
-            return MockResponse(201, 'Created', method, headers, '/playlists/testplaylist/tracks')
+            # reordering tracks responds with 200, replacing them with 201
+            code, reason = (200, 'OK') if 'range_start' in json else (201, 'Created')
+            return MockResponse(code, reason, method, headers, '/playlists/testplaylist/tracks',
+                                content=json_string(self.SNAPSHOT))
         else:
             return MockResponse(403, 'Forbidden', method, headers, '/playlists/testplaylist/tracks')
 
+    @route('/playlists/testplaylisttracks/tracks', ['GET'])
+    def playlist_with_tracks_tracks(self, method, headers, data, json, params):
+        if method == 'GET':
+            return MockResponse(200, 'OK', method, headers, '/playlists/testplaylisttracks/tracks',
+                                content=json_string(
+                                    self.page(self.PLAYLIST_TRACKS['tracks']['items'],
+                                              '/playlists/testplaylisttracks/tracks', params)))
+        else:
+            return MockResponse(403, 'Forbidden', method, headers,
+                                '/playlists/testplaylisttracks/tracks')
+
+    @route('/playlists/testplaylistlarge/tracks', ['GET'])
+    def playlist_large_tracks(self, method, headers, data, json, params):
+        if method == 'GET':
+            # the currently playing track is the last of 250 tracks
+            tracks = [{'track': {'uri': f'spotify:track:testid{x}'}} for x in range(0, 249)] + \
+                     [{'track': None}, {'track': {'uri': 'spotify:track:testtrack'}}]
+            return MockResponse(200, 'OK', method, headers, '/playlists/testplaylistlarge/tracks',
+                                content=json_string(
+                                    self.page(tracks, '/playlists/testplaylistlarge/tracks',
+                                              params)))
+        else:
+            return MockResponse(403, 'Forbidden', method, headers,
+                                '/playlists/testplaylistlarge/tracks')
+
     @route('/recommendations', ['GET'])
     def recommendations(self, method, headers, data, json, params):
         if method == 'GET':
@@ -344,6 +427,37 @@ class MockAPI:
         else:
             return MockResponse(403, 'Forbidden', method, headers, '/artists/testtrack')
 
+    @route('/artists', ['GET'])
+    def request_several_artists(self, method, headers, data, json, params):
+        if method == 'GET':
+            # unknown ids are returned as null, like the API does
+            artists = [self.with_id(self.ARTIST, 'artist', x) if x.startswith('test') else None
+                       for x in params['ids'].split(',')]
+            return MockResponse(200, 'OK', method, headers, '/artists',
+                                content=json_string({'artists': artists}))
+        else:
+            return MockResponse(403, 'Forbidden', method, headers, '/artists')
+
+    @route('/tracks', ['GET'])
+    def request_several_tracks(self, method, headers, data, json, params):
+        if method == 'GET':
+            tracks = [self.with_id(self.TRACK, 'track', x) if x.startswith('test') else None
+                      for x in params['ids'].split(',')]
+            return MockResponse(200, 'OK', method, headers, '/tracks',
+                                content=json_string({'tracks': tracks}))
+        else:
+            return MockResponse(403, 'Forbidden', method, headers, '/tracks')
+
+    @route('/albums', ['GET'])
+    def request_several_albums(self, method, headers, data, json, params):
+        if method == 'GET':
+            albums = [self.with_id(self.ALBUM, 'album', x) if x.startswith('test') else None
+                      for x in params['ids'].split(',')]
+            return MockResponse(200, 'OK', method, headers, '/albums',
+                                content=json_string({'albums': albums}))
+        else:
+            return MockResponse(403, 'Forbidden', method, headers, '/albums')
+
     @route('/recommendations/available-genre-seeds', ['GET'])
     def genre_seeds(self, method, headers, data, json, params):
         if method == 'GET':
@@ -403,6 +517,28 @@ class MockAPI:
         else:
             return MockResponse(403, 'Forbidden', method, headers, '/audio-features/testtrack')
 
+    @route('/ratelimit', ['GET', 'POST'])
+    def rate_limit(self, method, headers, data, json, params):
+        # params hold the amount of failures remaining before the request succeeds
+        if params.get('limited', 0) > 0:
+            params['limited'] -= 1
+            return MockResponse(429, 'Too Many Requests', method, {'Retry-After': '0'},
+                                '/ratelimit')
+        if params.get('failing', 0) > 0:
+            params['failing'] -= 1
+            return MockResponse(503, 'Service Unavailable', method, headers, '/ratelimit')
+        return MockResponse(200, 'OK', method, headers, '/ratelimit', content=json_string({}))
+
+    @route('/audio-features', ['GET'])
+    def several_audio_features(self, method, headers, data, json, params):
+        if method == 'GET':
+            features = [self.with_id(self.AUDIO_FEATURES, 'track', x) if x.startswith('test')
+                        else None for x in params['ids'].split(',')]
+            return MockResponse(200, 'OK', method, headers, '/audio-features',
+                                content=json_string({'audio_features': features}))
+        else:
+            return MockResponse(403, 'Forbidden', method, headers, '/audio-features')
+
     @route('/api/token', ['POST'])
     def token(self, method, headers, data, json, params):
         if data:
@@ -442,18 +578,22 @@ class MockArgs:
     def __init__(self, **kwargs):
         self.a = kwargs.pop('a', None)
         self.ac = kwargs.pop('ac', False)
+        self.all_time_ranges = kwargs.pop('all_time_ranges', False)
         self.add_to = kwargs.pop('add_to', None)
         self.auth = kwargs.pop('auth', False)
         self.blacklist_add = kwargs.pop('blacklist_add', None)
         self.blacklist_remove = kwargs.pop('blacklist_remove', None)
         self.c = kwargs.pop('c', False)
         self.debug = kwargs.pop('debug', False)
+        self.diff = kwargs.pop('diff', False)
         self.gc = kwargs.pop('gc', False)
         self.gcs = kwargs.pop('gcs', False)
         self.l = kwargs.pop('l', None)
         self.load_preset = kwargs.pop('load_preset', None)
         self.log = kwargs.pop('log', False)
+        self.log_json = kwargs.pop('log_json', False)
         self.n = kwargs.pop('n', 5)
+        self.no_cache = kwargs.pop('no_cache', False)
         self.play = kwargs.pop('play', None)
         self.preserve = kwargs.pop('preserve', False)
         self.print = kwargs.pop('print', None)
@@ -466,6 +606,7 @@ class MockArgs:
         self.save_device = kwargs.pop('save_device', False)
         self.save_playlist = kwargs.pop('save_playlist', False)
         self.save_preset = kwargs.pop('save_preset', None)
+        self.sqlite = kwargs.pop('sqlite', False)
         self.sr = kwargs.pop('sr', False)
         self.st = kwargs.pop('st', None)
         self.stc = kwargs.pop('stc', False)
@@ -1,8 +1,14 @@
 from tests.lib import ordered, mock, runner
 from tests.lib.ut_ext import SpotirecTestCase
-from spotirec import api as sp_api, conf, log
+from spotirec import api as sp_api, cache, conf, log
+import contextlib
+import gc
+import io
 import os
+import shutil
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 class TestAPI(SpotirecTestCase):
@@ -70,6 +76,174 @@ class TestAPI(SpotirecTestCase):
         self.api.set_conf(expected)
         self.assertEqual(expected, self.api.CONF)
 
+    @ordered
+    def test_get_session(self):
+        """
+        Testing get_session()
+        """
+        session = self.api.get_session()
+        self.assertIsNotNone(session)
+        # ensure session is reused between calls
+        self.assertIs(session, self.api.get_session())
+
+    @ordered
+    def test_get_session_concurrent(self):
+        """
+        Testing get_session() and get_scheduler() create one object when called concurrently
+        """
+        requests_preserve = sp_api.requests
+        created = []
+
+        class SlowRequests:
+            def Session(self):
+                time.sleep(0.05)
+                created.append(1)
+                return requests_preserve.Session()
+
+        api = sp_api.API()
+        api.set_logger(self.logger)
+        sp_api.requests = SlowRequests()
+        try:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                schedulers = list(executor.map(lambda _: (api.get_session(),
+                                                          api.get_scheduler())[1], range(4)))
+        finally:
+            sp_api.requests = requests_preserve
+        self.assertEqual(len(created), 1)
+        self.assertTrue(all(x is schedulers[0] for x in schedulers))
+
+    @ordered
+    def test_set_pool_size(self):
+        """
+        Testing set_pool_size()
+        """
+        self.api.get_session()
+        self.api.set_pool_size(4)
+        self.assertEqual(self.api.POOL_SIZE, 4)
+        # ensure session is recreated on next use
+        self.assertIsNone(self.api.SESSION)
+        self.assertIsNotNone(self.api.get_session())
+        self.api.set_pool_size(10)
+
+    @ordered
+    def test_close_session(self):
+        """
+        Testing close_session()
+        """
+        self.api.get_session()
+        self.api.close_session()
+        self.assertIsNone(self.api.SESSION)
+        # should not fail when no session exists
+        self.api.close_session()
+
+    @ordered
+    def test_get_scheduler(self):
+        """
+        Testing get_scheduler()
+        """
+        scheduler = self.api.get_scheduler()
+        self.assertIsInstance(scheduler, sp_api.RequestScheduler)
+        self.assertIs(scheduler, self.api.get_scheduler())
+        self.assertEqual(scheduler.LOGGER, self.logger)
+
+    @ordered
+    def test_scheduler_endpoint(self):
+        """
+        Testing RequestScheduler.endpoint()
+        """
+        scheduler = sp_api.RequestScheduler()
+        self.assertEqual(scheduler.endpoint('GET', 'https://api.test/v1/tracks/'
+                                                   '4uLU6hMCjMI75M1A2tKUQC'), 'GET /v1/tracks/{id}')
+        self.assertEqual(scheduler.endpoint('GET', 'https://api.test/v1/me/top/artists?limit=5'),
+                         'GET /v1/me/top/artists')
+
+    @ordered
+    def test_scheduler_backoff(self):
+        """
+        Testing RequestScheduler.backoff()
+        """
+        scheduler = sp_api.RequestScheduler()
+        self.assertEqual(scheduler.backoff(3, retry_after='7'), 7.0)
+        self.assertEqual(scheduler.backoff(3, retry_after='-1'), 0.0)
+        for x in range(0, 10):
+            delay = scheduler.backoff(x, retry_after='not-a-number')
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(scheduler.BACKOFF_MAX, scheduler.BACKOFF_BASE * 2 ** x))
+
+    @ordered
+    def test_scheduler_acquire(self):
+        """
+        Testing RequestScheduler.acquire()
+        """
+        scheduler = sp_api.RequestScheduler()
+        scheduler.set_logger(self.logger)
+        scheduler.BURST = 1
+        scheduler.RATE = 1000.0
+        scheduler.acquire('GET /test')
+        self.assertEqual(scheduler.throttle_waits, 0)
+        # bucket is empty, second request has to wait for a token
+        scheduler.acquire('GET /test')
+        self.assertEqual(scheduler.throttle_waits, 1)
+        # other endpoints have their own bucket
+        scheduler.acquire('GET /other')
+        self.assertEqual(scheduler.throttle_waits, 1)
+
+    @ordered
+    def test_scheduler_retry_rate_limit(self):
+        """
+        Testing RequestScheduler.send() (429)
+        """
+        scheduler = sp_api.RequestScheduler()
+        scheduler.set_logger(self.logger)
+        response = scheduler.send(self.api.get_session(), 'GET', '/ratelimit',
+                                  headers=self.headers, params={'limited': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(scheduler.stats()['retries'], 2)
+        # every attempt is logged with the same request id
+        requests = [x[4] for x in list(self.logger.records)[-5:] if 'request_id' in x[4]]
+        self.assertListEqual([x['attempt'] for x in requests], [0, 1, 2])
+        self.assertEqual(len(set(x['request_id'] for x in requests)), 1)
+        self.assertListEqual([x['status_code'] for x in requests], [429, 429, 200])
+
+    @ordered
+    def test_scheduler_retry_server_error(self):
+        """
+        Testing RequestScheduler.send() (5xx)
+        """
+        scheduler = sp_api.RequestScheduler()
+        scheduler.set_logger(self.logger)
+        scheduler.BACKOFF_BASE = 0.0
+        response = scheduler.send(self.api.get_session(), 'GET', '/ratelimit',
+                                  headers=self.headers, params={'failing': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(scheduler.retries, 1)
+
+        # ensure last response is returned when retries are exhausted
+        scheduler.MAX_RETRIES = 2
+        response = scheduler.send(self.api.get_session(), 'GET', '/ratelimit',
+                                  headers=self.headers, params={'failing': 5})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(scheduler.retries, 3)
+
+        # non-idempotent requests are only retried when rate limited
+        response = scheduler.send(self.api.get_session(), 'POST', '/ratelimit',
+                                  headers=self.headers, params={'failing': 1})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(scheduler.retries, 3)
+        response = scheduler.send(self.api.get_session(), 'POST', '/ratelimit',
+                                  headers=self.headers, params={'limited': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(scheduler.retries, 4)
+
+    @ordered
+    def test_scheduler_stats(self):
+        """
+        Testing RequestScheduler.stats()
+        """
+        scheduler = sp_api.RequestScheduler()
+        self.assertDictEqual(scheduler.stats(), {'retries': 0, 'throttle_waits': 0,
+                                                 'throttle_time': 0.0})
+
     @ordered
     def test_error_handle_success(self):
         """
@@ -141,6 +315,24 @@ class TestAPI(SpotirecTestCase):
         self.assertTrue(any(x['name'] == 'track4' for x in tracks['items']))
         self.assertTrue(any(x['uri'] == 'spotify:track:testid2' for x in tracks['items']))
 
+    @ordered
+    def test_iter_top_list(self):
+        """
+        Testing iter_top_list()
+        """
+        artists = list(self.api.iter_top_list('artists', self.headers, time_range='long_term'))
+        self.assertEqual(len(artists), 5)
+        self.assertEqual(artists[3]['name'], 'frankie3')
+
+    @ordered
+    def test_get_full_top_list(self):
+        """
+        Testing get_full_top_list()
+        """
+        artists = self.api.get_full_top_list('artists', self.headers, time_range='short_term')
+        self.assertIsInstance(artists, list)
+        self.assertListEqual([x['name'] for x in artists], [f'frankie{x}' for x in range(5)])
+
     @ordered
     def test_get_user_id(self):
         """
@@ -186,6 +378,28 @@ class TestAPI(SpotirecTestCase):
         self.api.add_to_playlist(['spotify:track:trackid0', 'spotify:track:trackid1',
                                   'spotify:track:trackid2'], 'testplaylist', self.headers)
 
+    @ordered
+    def test_add_to_playlist_chunked(self):
+        """
+        Testing add_to_playlist() with more than 100 tracks
+        """
+        requests = []
+        send = self.api.send
+
+        def mock_send(method, url, **kwargs):
+            requests.append((method, kwargs['json']))
+            return send(method, url, **kwargs)
+
+        self.api.send = mock_send
+        tracks = [f'spotify:track:testid{x}' for x in range(0, 250)]
+        snapshot = self.api.add_to_playlist(tracks, 'testplaylist', self.headers)
+        del self.api.send
+        self.assertEqual(snapshot, 'testsnapshot')
+        self.assertListEqual([x[0] for x in requests], ['POST', 'POST', 'POST'])
+        self.assertListEqual([len(x[1]['uris']) for x in requests], [100, 100, 50])
+        # ensure order is preserved
+        self.assertListEqual([y for x in requests for y in x[1]['uris']], tracks)
+
     @ordered
     def test_get_recommendations(self):
         """
@@ -216,6 +430,127 @@ class TestAPI(SpotirecTestCase):
         self.assertEqual('spotify:track:testtrack', track['uri'])
         self.assertEqual('testtrack', track['id'])
 
+    @ordered
+    def test_request_data_batch(self):
+        """
+        Testing request_data_batch()
+        """
+        uris = [f'spotify:track:testid{x}' for x in range(0, 5)]
+        self.api.BATCH_LIMITS = {'artists': 2, 'tracks': 2, 'audio-features': 2}
+        tracks = self.api.request_data_batch(uris, 'tracks', self.headers)
+        del self.api.BATCH_LIMITS
+        # ensure order is preserved across chunks
+        self.assertListEqual([x['uri'] for x in tracks], uris)
+        artists = self.api.request_data_batch(['spotify:artist:testartist',
+                                               'spotify:artist:unknown'], 'artists', self.headers)
+        self.assertEqual(artists[0]['name'], 'frankie0')
+        self.assertIsNone(artists[1])
+        self.assertListEqual(self.api.request_data_batch([], 'tracks', self.headers), [])
+
+    @ordered
+    def test_request_artist_genres(self):
+        """
+        Testing request_artist_genres() requests each artist once, and caches them individually
+        """
+        calls = []
+
+        def mock_send(session, method, url, **kwargs):
+            calls.append(kwargs['params']['ids'])
+            return send(session, method, url, **kwargs)
+
+        response_cache = cache.ResponseCache()
+        response_cache.CACHE_DIR = 'tests/fixtures/cache'
+        response_cache.set_logger(self.logger)
+        scheduler = self.api.get_scheduler()
+        send = scheduler.send
+        scheduler.send = mock_send
+        self.api.set_cache(response_cache)
+        genres = self.api.request_artist_genres(['spotify:artist:testid0', 'spotify:artist:testid1',
+                                                 'spotify:artist:testid0',
+                                                 'spotify:artist:unknown'], self.headers)
+        expected = ['pop', 'metal', 'vapor-death-pop']
+        self.assertDictEqual(genres, {'spotify:artist:testid0': expected,
+                                      'spotify:artist:testid1': expected})
+        genres = self.api.request_artist_genres(['spotify:artist:testid1',
+                                                 'spotify:artist:testid2'], self.headers)
+        self.assertListEqual(sorted(genres.keys()), ['spotify:artist:testid1',
+                                                     'spotify:artist:testid2'])
+        self.assertListEqual(calls, ['testid0,testid1,unknown', 'testid2'])
+        # Cached artists also serve single artist lookups
+        self.assertEqual(self.api.request_data('spotify:artist:testid1', 'artists',
+                                               self.headers)['id'], 'testid1')
+        self.assertEqual(len(calls), 2)
+        self.api.set_cache(None)
+        del scheduler.send
+        shutil.rmtree(response_cache.CACHE_DIR)
+
+    @ordered
+    def test_chunks(self):
+        """
+        Testing chunks()
+        """
+        self.assertListEqual(sp_api.chunks([0, 1, 2, 3, 4], 2), [[0, 1], [2, 3], [4]])
+        self.assertListEqual(sp_api.chunks([0, 1], 2), [[0, 1]])
+        self.assertListEqual(sp_api.chunks([], 2), [])
+
+    @ordered
+    def test_send_cache(self):
+        """
+        Testing send() serves cached endpoints from the response cache
+        """
+        calls = []
+
+        def mock_send(session, method, url, **kwargs):
+            calls.append(url)
+            return send(session, method, url, **kwargs)
+
+        response_cache = cache.ResponseCache()
+        response_cache.CACHE_DIR = 'tests/fixtures/cache'
+        response_cache.set_logger(self.logger)
+        scheduler = self.api.get_scheduler()
+        send = scheduler.send
+        scheduler.send = mock_send
+        self.api.set_cache(response_cache)
+        for _ in range(2):
+            self.api.get_genre_seeds(self.headers)
+            self.api.request_data_batch(['spotify:artist:testartist'], 'artists', self.headers)
+            self.api.get_user_id(self.headers)
+        self.assertListEqual(calls, ['/recommendations/available-genre-seeds', '/artists', '/me',
+                                     '/me'])
+        self.assertDictEqual(response_cache.stats(), {'hits': 2, 'misses': 2, 'revalidated': 0})
+        self.api.set_cache(None)
+        del scheduler.send
+        shutil.rmtree(response_cache.CACHE_DIR)
+
+    @ordered
+    def test_send_cache_etag(self):
+        """
+        Testing send() revalidates cached responses with their ETag
+        """
+        responses = []
+
+        def mock_send(session, method, url, **kwargs):
+            response = send(session, method, url, **kwargs)
+            responses.append(response.status_code)
+            return response
+
+        response_cache = cache.ResponseCache()
+        response_cache.CACHE_DIR = 'tests/fixtures/cache'
+        response_cache.set_logger(self.logger)
+        scheduler = self.api.get_scheduler()
+        send = scheduler.send
+        scheduler.send = mock_send
+        self.api.set_cache(response_cache)
+        for _ in range(2):
+            self.assertTrue(self.api.check_if_playlist_exists('testplaylistetag', self.headers))
+            self.assertTrue(self.api.check_if_playlist_exists('testplaylist', self.headers))
+        self.assertListEqual(responses, [200, 200, 304, 200])
+        self.assertNotIn('If-None-Match', self.headers.keys())
+        self.assertDictEqual(response_cache.stats(), {'hits': 0, 'misses': 4, 'revalidated': 1})
+        self.api.set_cache(None)
+        del scheduler.send
+        shutil.rmtree(response_cache.CACHE_DIR)
+
     @ordered
     def test_get_genre_seeds(self):
         """
@@ -228,6 +563,43 @@ class TestAPI(SpotirecTestCase):
         self.assertEqual(seeds['genres'], ['metal', 'metalcore', 'pop', 'vapor-death-pop',
                                            'holidays'])
 
+    @ordered
+    def test_get_genre_seed_registry(self):
+        """
+        Testing get_genre_seed_registry()
+        """
+        calls = []
+
+        def mock_get_genre_seeds(headers):
+            calls.append(headers)
+            return get_genre_seeds(headers)
+
+        self.api.GENRE_SEEDS = None
+        get_genre_seeds = self.api.get_genre_seeds
+        self.api.get_genre_seeds = mock_get_genre_seeds
+        registry = self.api.get_genre_seed_registry(self.headers)
+        self.assertIsInstance(registry, sp_api.GenreSeeds)
+        self.assertIs(registry, self.api.get_genre_seed_registry(self.headers))
+        self.assertEqual(len(calls), 1)
+        self.assertListEqual(list(registry), ['metal', 'metalcore', 'pop', 'vapor-death-pop',
+                                              'holidays'])
+        del self.api.get_genre_seeds
+
+    @ordered
+    def test_genre_seeds(self):
+        """
+        Testing GenreSeeds
+        """
+        registry = sp_api.GenreSeeds(['metal', 'pop', 'metalcore', 'k-pop', 'post-metal'])
+        self.assertIn('metal', registry)
+        self.assertNotIn('meta', registry)
+        self.assertEqual(len(registry), 5)
+        self.assertListEqual(registry.complete('meta'), ['metal', 'metalcore'])
+        self.assertListEqual(registry.complete('metalcore'), ['metalcore'])
+        self.assertListEqual(registry.complete('jazz'), [])
+        self.assertListEqual(registry.complete(''), ['k-pop', 'metal', 'metalcore', 'pop',
+                                                     'post-metal'])
+
     @ordered
     def test_get_available_devices(self):
         """
@@ -345,6 +717,28 @@ class TestAPI(SpotirecTestCase):
         self.api.replace_playlist_tracks(
             'testplaylist', ['spotify:track:testid0', 'spotify:track:testid1'], self.headers)
 
+    @ordered
+    def test_replace_playlist_tracks_chunked(self):
+        """
+        Testing replace_playlist_tracks() with more than 100 tracks
+        """
+        requests = []
+        send = self.api.send
+
+        def mock_send(method, url, **kwargs):
+            requests.append((method, kwargs['json']))
+            return send(method, url, **kwargs)
+
+        self.api.send = mock_send
+        tracks = [f'spotify:track:testid{x}' for x in range(0, 201)]
+        snapshot = self.api.replace_playlist_tracks('testplaylist', tracks, self.headers)
+        del self.api.send
+        self.assertEqual(snapshot, 'testsnapshot')
+        # the first chunk replaces the playlist, the rest are appended
+        self.assertListEqual([x[0] for x in requests], ['PUT', 'POST', 'POST'])
+        self.assertListEqual([len(x[1]['uris']) for x in requests], [100, 100, 1])
+        self.assertListEqual([y for x in requests for y in x[1]['uris']], tracks)
+
     @ordered
     def test_get_playlist(self):
         """
@@ -355,6 +749,43 @@ class TestAPI(SpotirecTestCase):
         self.assertEqual('testplaylist', playlist['name'])
         self.assertEqual('spotify:playlist:testid', playlist['uri'])
 
+    @ordered
+    def test_iter_playlist_tracks(self):
+        """
+        Testing iter_playlist_tracks()
+        """
+        tracks = list(self.api.iter_playlist_tracks('testplaylistlarge', self.headers))
+        self.assertEqual(len(tracks), 251)
+        self.assertEqual(tracks[0]['track']['uri'], 'spotify:track:testid0')
+        self.assertEqual(tracks[-1]['track']['uri'], 'spotify:track:testtrack')
+        prefetched = list(self.api.iter_playlist_tracks('testplaylistlarge', self.headers,
+                                                        prefetch=True))
+        self.assertListEqual(prefetched, tracks)
+        self.assertListEqual(list(self.api.iter_playlist_tracks('testplaylist', self.headers)), [])
+
+    @ordered
+    def test_paginate_stop_early(self):
+        """
+        Testing paginate() stopping early
+        """
+        pages = []
+        get_page = self.api.get_page
+
+        def mock_get_page(url, headers, params=None):
+            pages.append(url)
+            return get_page(url, headers, params=params)
+
+        self.api.get_page = mock_get_page
+        tracks = self.api.iter_playlist_tracks('testplaylistlarge', self.headers)
+        self.assertEqual(next(tracks)['track']['uri'], 'spotify:track:testid0')
+        tracks.close()
+        self.assertEqual(len(pages), 1)
+        # the second page is only requested once the first has been consumed
+        tracks = self.api.iter_playlist_tracks('testplaylistlarge', self.headers)
+        self.assertIn('spotify:track:testid120', (x['track']['uri'] for x in tracks))
+        self.assertEqual(len(pages), 3)
+        del self.api.get_page
+
     @ordered
     def test_remove_from_playlist(self):
         """
@@ -364,6 +795,29 @@ class TestAPI(SpotirecTestCase):
         self.api.remove_from_playlist(['spotify:track:testid0', 'spotify:track:testid1'],
                                       'testplaylist', self.headers)
 
+    @ordered
+    def test_remove_from_playlist_chunked(self):
+        """
+        Testing remove_from_playlist() with more than 100 tracks
+        """
+        requests = []
+        send = self.api.send
+
+        def mock_send(method, url, **kwargs):
+            requests.append((method, kwargs['json']))
+            return send(method, url, **kwargs)
+
+        self.api.send = mock_send
+        tracks = [f'spotify:track:testid{x}' for x in range(0, 150)]
+        snapshot = self.api.remove_from_playlist(tracks, 'testplaylist', self.headers,
+                                                 snapshot_id='firstsnapshot')
+        del self.api.send
+        self.assertEqual(snapshot, 'testsnapshot')
+        self.assertListEqual([len(x[1]['tracks']) for x in requests], [100, 50])
+        # each chunk is removed from the snapshot of the previous chunk
+        self.assertListEqual([x[1]['snapshot_id'] for x in requests],
+                             ['firstsnapshot', 'testsnapshot'])
+
     @ordered
     def test_get_audio_features(self):
         """
@@ -386,6 +840,16 @@ class TestAPI(SpotirecTestCase):
         self.assertEqual('testid0', features['id'])
         self.assertEqual('spotify:track:testid0', features['uri'])
 
+    @ordered
+    def test_get_audio_features_batch(self):
+        """
+        Testing get_audio_features_batch()
+        """
+        ids = [f'testid{x}' for x in range(0, 250)]
+        features = self.api.get_audio_features_batch(ids, self.headers)
+        self.assertListEqual([x['id'] for x in features], ids)
+        self.assertEqual(features[0]['tempo'], 70.0)
+
     @ordered
     def test_check_if_playlist_exists_true(self):
         """
@@ -407,3 +871,58 @@ class TestAPI(SpotirecTestCase):
         """
         # should not raise sysexit
         self.api.transfer_playback('test0', self.headers)
+
+    @ordered
+    def test_iter_saved_tracks(self):
+        """
+        Testing iter_saved_tracks()
+        """
+        tracks = list(self.api.iter_saved_tracks(self.headers, prefetch=True))
+        self.assertEqual(len(tracks), 5)
+        self.assertEqual(tracks[0]['track']['uri'], 'spotify:track:testid0')
+
+    @ordered
+    def test_async_api(self):
+        """
+        Testing AsyncAPI
+        """
+        async_api = sp_api.AsyncAPI(self.api)
+        # ensure attributes are passed through
+        self.assertEqual(async_api.URL_BASE, self.api.URL_BASE)
+        iden, seeds = sp_api.run_concurrently(async_api.get_user_id(self.headers),
+                                              async_api.get_genre_seeds(self.headers))
+        self.assertEqual(iden, 'testuser')
+        self.assertDictEqual(seeds, self.api.get_genre_seeds(self.headers))
+
+    @ordered
+    def test_async_api_error(self):
+        """
+        Testing AsyncAPI with error
+        """
+        async_api = sp_api.AsyncAPI(self.api)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            self.assertRaises(SystemExit, sp_api.run_concurrently,
+                              async_api.get_user_id(self.headers), async_api.get_user_id({}))
+            gc.collect()
+        # the exit is raised in the calling thread, not left in a task
+        self.assertNotIn('exception was never retrieved', stderr.getvalue())
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            crash_file = stdout.split('/')[2].strip('\n')
+            os.remove(f'tests/fixtures/{crash_file}')
+
+    @ordered
+    def test_run_concurrently(self):
+        """
+        Testing run_concurrently()
+        """
+
+        async def identity(x):
+            return x
+
+        self.assertListEqual(sp_api.run_concurrently(*[identity(x) for x in range(0, 5)]),
+                             [0, 1, 2, 3, 4])
+        self.assertListEqual(sp_api.run_concurrently(), [])
@@ -0,0 +1,235 @@
+import os
+from tests.lib import ordered, runner
+from tests.lib.ut_ext import SpotirecTestCase
+from spotirec import blacklist
+
+
+class TestBlacklist(SpotirecTestCase):
+    """
+    Running tests for blacklist.py
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Setup any necessary data or states before any tests in this class is run
+        """
+        if runner.verbosity > 0:
+            super(TestBlacklist, cls).setUpClass()
+            print(f'file:/{__file__}\n')
+        cls.blacklist = {'tracks': {'spotify:track:testid2': {'name': 'track2'}},
+                         'artists': {'spotify:artist:testid1': {'name': 'frankie1'},
+                                     'spotify:artist:testid4': {'name': 'frankie4'}}}
+        cls.tracks = [{'uri': f'spotify:track:testid{x}',
+                       'artists': [{'uri': f'spotify:artist:testid{x}'},
+                                   {'uri': f'spotify:artist:testid{x + 10}'}]}
+                      for x in range(6)]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Clear or resolve any necessary data or states after all tests in this class are run
+        """
+        if runner.verbosity > 0:
+            super(TestBlacklist, cls).tearDownClass()
+
+    @ordered
+    def test_init(self):
+        """
+        Testing BlacklistIndex()
+        """
+        index = blacklist.BlacklistIndex(self.blacklist)
+        self.assertIsInstance(index.tracks, frozenset)
+        self.assertSetEqual(index.tracks, {'spotify:track:testid2'})
+        self.assertSetEqual(index.artists, {'spotify:artist:testid1', 'spotify:artist:testid4'})
+        self.assertEqual(len(index), 3)
+        self.assertEqual(len(blacklist.BlacklistIndex({})), 0)
+
+    @ordered
+    def test_is_blacklisted(self):
+        """
+        Testing is_blacklisted()
+        """
+        index = blacklist.BlacklistIndex(self.blacklist)
+        self.assertListEqual([index.is_blacklisted(x) for x in self.tracks],
+                             [False, True, True, False, True, False])
+
+    @ordered
+    def test_filter(self):
+        """
+        Testing filter()
+        """
+        index = blacklist.BlacklistIndex(self.blacklist)
+        self.assertListEqual(index.filter(self.tracks), ['spotify:track:testid0',
+                                                         'spotify:track:testid3',
+                                                         'spotify:track:testid5'])
+        self.assertListEqual(index.filter([]), [])
+
+    @ordered
+    def test_albums_genres(self):
+        """
+        Testing album and genre entries
+        """
+        index = blacklist.BlacklistIndex({'albums': {'spotify:album:testalbum0': {}},
+                                          'genres': {'genre:metal': {'name': 'metal'}}})
+        self.assertSetEqual(index.genres, {'metal'})
+        self.assertEqual(len(index), 2)
+        tracks = [dict(x, album={'uri': f'spotify:album:testalbum{i % 2}'})
+                  for i, x in enumerate(self.tracks)]
+        artist_genres = {'spotify:artist:testid3': ['metal', 'pop'],
+                         'spotify:artist:testid14': ['pop']}
+        self.assertSetEqual(blacklist.genre_blacklisted_artists(index.genres, artist_genres),
+                            {'spotify:artist:testid3'})
+        self.assertListEqual(index.filter(tracks, artist_genres), ['spotify:track:testid1',
+                                                                   'spotify:track:testid5'])
+        # Genres are not filtered without artist genres
+        self.assertListEqual(index.filter(tracks), ['spotify:track:testid1',
+                                                    'spotify:track:testid3',
+                                                    'spotify:track:testid5'])
+        self.assertListEqual([index.is_blacklisted(x, artist_genres) for x in tracks],
+                             [True, False, True, True, True, False])
+
+    @ordered
+    def test_genres_normalized(self):
+        """
+        Testing genre entries match artist genres regardless of case, spaces and dashes
+        """
+        self.assertEqual(blacklist.normalize_genre(' Indie Rock'), 'indie-rock')
+        index = blacklist.BlacklistIndex({'genres': {'genre:indie-rock': {},
+                                                     'genre:Death Metal': {}}})
+        self.assertSetEqual(index.genres, {'indie-rock', 'death-metal'})
+        artist_genres = {'spotify:artist:testid3': ['indie rock'],
+                         'spotify:artist:testid14': ['death metal'],
+                         'spotify:artist:testid5': ['pop']}
+        self.assertSetEqual(blacklist.genre_blacklisted_artists(index.genres, artist_genres),
+                            {'spotify:artist:testid3', 'spotify:artist:testid14'})
+        prefiltered = blacklist.PrefilteredBlacklistIndex(None, lambda: None, ['genre:indie-rock'])
+        self.assertTrue(prefiltered.is_blacklisted(self.tracks[3], artist_genres))
+
+
+class TestBloomFilter(SpotirecTestCase):
+    """
+    Running tests for BloomFilter and PrefilteredBlacklistIndex in blacklist.py
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Setup any necessary data or states before any tests in this class is run
+        """
+        if runner.verbosity > 0:
+            super(TestBloomFilter, cls).setUpClass()
+            print(f'file:/{__file__}\n')
+        cls.path = 'tests/fixtures/test.bloom'
+        cls.uris = [f'spotify:track:testid{x}' for x in range(1000)]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Clear or resolve any necessary data or states after all tests in this class are run
+        """
+        if runner.verbosity > 0:
+            super(TestBloomFilter, cls).tearDownClass()
+
+    def setUp(self) -> None:
+        """
+        Setup any necessary data or states before each test is run
+        """
+        self.bloom = blacklist.BloomFilter.create(self.path, self.uris, 2000, 0.01, (1, 2, 3))
+
+    def tearDown(self) -> None:
+        """
+        Clear or resolve any necessary data or states after each test is run
+        """
+        self.bloom.close()
+        os.remove(self.path)
+
+    @ordered
+    def test_create(self):
+        """
+        Testing create()
+        """
+        self.assertEqual(self.bloom.capacity, 2000)
+        self.assertEqual(self.bloom.hashes, 7)
+        self.assertEqual(len(self.bloom), 1000)
+        self.assertTupleEqual(self.bloom.key, (1, 2, 3))
+        self.assertEqual(os.path.getsize(self.path),
+                         blacklist.BloomFilter.HEADER.size + (self.bloom.bits + 7) // 8)
+        self.assertFalse(any(x.endswith('.tmp') for x in os.listdir('tests/fixtures')))
+
+    @ordered
+    def test_contains(self):
+        """
+        Testing __contains__() has no false negatives, and few false positives
+        """
+        self.assertTrue(all(x in self.bloom for x in self.uris))
+        false_positives = sum(f'spotify:artist:testid{x}' in self.bloom for x in range(1000))
+        self.assertLess(false_positives, 20)
+
+    @ordered
+    def test_persist(self):
+        """
+        Testing additions and keys are shared through the file
+        """
+        bloom = blacklist.BloomFilter(self.path)
+        self.assertNotIn('spotify:artist:testartist', bloom)
+        self.bloom.add('spotify:artist:testartist')
+        self.bloom.set_key((4, 5, 6))
+        self.bloom.flush()
+        self.assertIn('spotify:artist:testartist', bloom)
+        self.assertTupleEqual(bloom.key, (4, 5, 6))
+        self.assertEqual(len(bloom), 1001)
+        bloom.close()
+
+    @ordered
+    def test_invalid(self):
+        """
+        Testing BloomFilter() rejects files that are not bloom filters
+        """
+        with open('tests/fixtures/test-invalid.bloom', 'wb') as f:
+            f.write(b'this is not a bloom filter')
+        with self.assertRaises(ValueError):
+            blacklist.BloomFilter('tests/fixtures/test-invalid.bloom')
+        os.remove('tests/fixtures/test-invalid.bloom')
+
+    @ordered
+    def test_prefiltered_index(self):
+        """
+        Testing PrefilteredBlacklistIndex only loads the exact index on possible hits
+        """
+        loaded = []
+
+        def load_index():
+            loaded.append(True)
+            return blacklist.BlacklistIndex(
+                {'tracks': {x: {} for x in self.uris}, 'artists': {}})
+
+        index = blacklist.PrefilteredBlacklistIndex(self.bloom, load_index)
+        self.assertEqual(len(index), 1000)
+        tracks = [{'uri': f'spotify:track:testtrack{x}',
+                   'artists': [{'uri': f'spotify:artist:testartist{x}'}],
+                   'album': {'uri': f'spotify:album:testalbum{x}'}} for x in range(5)]
+        self.assertFalse(any(index.may_be_blacklisted(x) for x in tracks))
+        self.assertListEqual(index.filter(tracks), [x['uri'] for x in tracks])
+        self.assertListEqual(loaded, [])
+        tracks.append({'uri': 'spotify:track:testid3', 'artists': [],
+                       'album': {'uri': 'spotify:album:testalbum'}})
+        self.assertTrue(index.is_blacklisted(tracks[-1]))
+        self.assertListEqual(index.filter(tracks), [x['uri'] for x in tracks[:-1]])
+        self.assertListEqual(loaded, [True])
+
+    @ordered
+    def test_prefiltered_index_genres(self):
+        """
+        Testing PrefilteredBlacklistIndex checks genres exactly
+        """
+        index = blacklist.PrefilteredBlacklistIndex(self.bloom, lambda: None, ['genre:metal'])
+        self.assertSetEqual(index.genres, {'metal'})
+        tracks = [{'uri': f'spotify:track:testtrack{x}',
+                   'artists': [{'uri': f'spotify:artist:testartist{x}'}],
+                   'album': {'uri': f'spotify:album:testalbum{x}'}} for x in range(3)]
+        artist_genres = {'spotify:artist:testartist1': ['metal']}
+        self.assertListEqual(index.filter(tracks, artist_genres), ['spotify:track:testtrack0',
+                                                                   'spotify:track:testtrack2'])
+        self.assertTrue(index.is_blacklisted(tracks[1], artist_genres))
+        self.assertFalse(index.is_blacklisted(tracks[2], artist_genres))
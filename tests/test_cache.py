@@ -0,0 +1,166 @@
+from tests.lib import ordered, mock, runner
+from tests.lib.ut_ext import SpotirecTestCase
+from spotirec import cache, log
+import os
+import shutil
+import sys
+import time
+
+
+class TestCache(SpotirecTestCase):
+    """
+    Running tests for cache.py
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Setup any necessary data or states before any tests in this class is run
+        """
+        if runner.verbosity > 0:
+            super(TestCache, cls).setUpClass()
+            print(f'file:/{__file__}\n')
+        cls.stdout_preserve = sys.__stdout__
+        cls.test_log = 'tests/fixtures/test-cache'
+        cls.logger = log.Log()
+        cls.logger.LOG_PATH = 'tests/fixtures'
+        cls.response = mock.MockResponse(200, 'OK', 'GET', {}, '/artists',
+                                         content=mock.json_string({'artists': []}))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Clear or resolve any necessary data or states after all tests in this class are run
+        """
+        if runner.verbosity > 0:
+            super(TestCache, cls).tearDownClass()
+
+    def setUp(self):
+        """
+        Setup any necessary data or states before each test is run
+        """
+        self.cache = cache.ResponseCache()
+        self.cache.CACHE_DIR = 'tests/fixtures/cache'
+        self.cache.set_logger(self.logger)
+        self.log_file = open(self.test_log, 'w')
+        sys.stdout = self.log_file
+
+    def tearDown(self):
+        """
+        Clear or resolve any necessary data or states after each test is run
+        """
+        self.log_file.close()
+        sys.stdout = self.stdout_preserve
+        os.remove(self.test_log)
+        shutil.rmtree(self.cache.CACHE_DIR, ignore_errors=True)
+
+    @ordered
+    def test_get_ttl(self):
+        """
+        Testing get_ttl()
+        """
+        self.assertEqual(self.cache.get_ttl('/recommendations/available-genre-seeds'), 86400)
+        self.assertEqual(self.cache.get_ttl('/artists/testartist'), 604800)
+        self.assertEqual(self.cache.get_ttl('/tracks'), 604800)
+        self.assertEqual(self.cache.get_ttl('/audio-features'), float('inf'))
+        self.assertEqual(self.cache.get_ttl('/me/top/artists'), 0)
+        self.assertEqual(self.cache.get_ttl('/playlists/testplaylist/tracks?offset=100'), 0)
+        self.assertIsNone(self.cache.get_ttl('/me/player'))
+        self.assertIsNone(self.cache.get_ttl('/artists/testartist/top-tracks'))
+        self.assertIsNone(self.cache.get_ttl('/recommendations'))
+
+    @ordered
+    def test_key(self):
+        """
+        Testing key()
+        """
+        self.assertEqual(self.cache.key('/artists', {'ids': 'a,b', 'market': 'DK'}),
+                         self.cache.key('/artists', {'market': 'DK', 'ids': 'a,b'}))
+        self.assertNotEqual(self.cache.key('/artists', {'ids': 'a,b'}),
+                            self.cache.key('/artists', {'ids': 'b,a'}))
+        self.assertNotEqual(self.cache.key('/artists'), self.cache.key('/tracks'))
+
+    @ordered
+    def test_get_put(self):
+        """
+        Testing get() and put()
+        """
+        self.assertIsNone(self.cache.get('/artists', {'ids': 'testartist'}))
+        self.cache.put('/artists', {'ids': 'testartist'}, self.response)
+        response = self.cache.get('/artists', {'ids': 'testartist'})
+        self.assertIsInstance(response, cache.CachedResponse)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.response.content)
+        self.assertIsNone(self.cache.get('/artists', {'ids': 'testartist0'}))
+        self.assertDictEqual(self.cache.stats(), {'hits': 1, 'misses': 2, 'revalidated': 0})
+
+    @ordered
+    def test_put_not_cached(self):
+        """
+        Testing put() with uncached endpoint, missing ETag and failed response
+        """
+        self.cache.put('/me/player', None, self.response)
+        self.cache.put('/me/top/artists', None, self.response)
+        self.cache.put('/artists', None, mock.MockResponse(404, 'Not Found', 'GET', {}, ''))
+        self.assertFalse(os.path.isdir(self.cache.CACHE_DIR))
+        self.assertIsNone(self.cache.get('/me/player'))
+        self.assertDictEqual(self.cache.stats(), {'hits': 0, 'misses': 0, 'revalidated': 0})
+
+    @ordered
+    def test_get_expired(self):
+        """
+        Testing get() with expired entry
+        """
+        self.cache.TTLS = [(pattern, -1) for pattern, _ in self.cache.TTLS]
+        self.cache.put('/artists', None, self.response)
+        self.assertEqual(len(os.listdir(self.cache.CACHE_DIR)), 1)
+        self.assertIsNone(self.cache.get('/artists'))
+        self.assertEqual(len(os.listdir(self.cache.CACHE_DIR)), 0)
+
+    @ordered
+    def test_etag(self):
+        """
+        Testing get_etag() and revalidate()
+        """
+        response = mock.MockResponse(200, 'OK', 'GET', {'ETag': '"testetag"', 'Authorization': ''},
+                                     '/playlists/testplaylist',
+                                     content=mock.json_string({'public': True}))
+        self.assertIsNone(self.cache.get_etag('/playlists/testplaylist'))
+        self.assertIsNone(self.cache.revalidate('/playlists/testplaylist'))
+        self.cache.put('/playlists/testplaylist', None, response)
+        # Entries with a time to live of zero must always be revalidated
+        self.assertIsNone(self.cache.get('/playlists/testplaylist'))
+        self.assertEqual(self.cache.get_etag('/playlists/testplaylist'), '"testetag"')
+        cached = self.cache.revalidate('/playlists/testplaylist')
+        self.assertEqual(cached.content, response.content)
+        self.assertDictEqual(cached.headers, {'ETag': '"testetag"'})
+        self.assertDictEqual(self.cache.stats(), {'hits': 0, 'misses': 1, 'revalidated': 1})
+
+    @ordered
+    def test_evict(self):
+        """
+        Testing evict() removes least recently used entries
+        """
+        for x in range(5):
+            self.cache.put('/artists', {'ids': f'test{x}'}, self.response)
+            os.utime(f'{self.cache.CACHE_DIR}/{self.cache.key("/artists", {"ids": f"test{x}"})}',
+                     (time.time() - 100 + x, time.time() - 100 + x))
+        # test0 is the oldest entry, but was used most recently
+        self.assertIsNotNone(self.cache.get('/artists', {'ids': 'test0'}))
+        self.cache.MAX_SIZE = self.cache.get_size() - 1
+        self.cache.put('/artists', {'ids': 'test5'}, self.response)
+        self.assertLessEqual(self.cache.get_size(), self.cache.MAX_SIZE)
+        self.assertIsNone(self.cache.get('/artists', {'ids': 'test1'}))
+        self.assertIsNotNone(self.cache.get('/artists', {'ids': 'test0'}))
+        self.assertIsNotNone(self.cache.get('/artists', {'ids': 'test5'}))
+
+    @ordered
+    def test_clear(self):
+        """
+        Testing clear()
+        """
+        self.cache.clear()
+        self.cache.put('/artists', None, self.response)
+        self.cache.clear()
+        self.assertEqual(self.cache.get_size(), 0)
+        self.assertIsNone(self.cache.get('/artists'))
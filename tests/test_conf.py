@@ -2,6 +2,7 @@ from tests.lib import ordered, runner
 from tests.lib.ut_ext import SpotirecTestCase
 from spotirec import conf, log
 import os
+import shutil
 
 
 class TestConf(SpotirecTestCase):
@@ -45,6 +46,15 @@ class TestConf(SpotirecTestCase):
         with open('tests/fixtures/empty.conf', 'w') as f:
             f.write('')
 
+    def restore_config(self, content: str):
+        """
+        Write the original contents of the test config back, and drop the parsed config
+        :param content: original config file contents
+        """
+        with open('tests/fixtures/test.conf', 'w') as f:
+            f.write(content)
+        self.conf.cache_key = None
+
     @ordered
     def test_set_logger(self):
         """
@@ -53,6 +63,22 @@ class TestConf(SpotirecTestCase):
         self.conf.set_logger(self.logger)
         self.assertEqual(self.logger, self.conf.LOGGER)
 
+    @ordered
+    def test_encode_decode(self):
+        """
+        Testing encode() and decode()
+        """
+        preset = {'limit': 20, 'seed_info': {0: {'name': 'metal', 'type': 'genre'}},
+                  'auto_play': False, 'playback_device': {}, 'rec_params': {'limit': '20'}}
+        encoded = conf.encode(preset)
+        self.assertNotIn(' ', encoded)
+        self.assertEqual(conf.decode(encoded), preset)
+        # values written by older versions
+        self.assertEqual(conf.decode(str(preset)), preset)
+        self.assertEqual(conf.decode("{'spotify:track:testtrack': {'name': \"it's\"}}"),
+                         {'spotify:track:testtrack': {'name': "it's"}})
+        self.assertEqual(conf.decode('{}'), {})
+
     @ordered
     def test_open_config(self):
         """
@@ -98,6 +124,178 @@ class TestConf(SpotirecTestCase):
         c.remove_section('testsection')
         self.conf.save_config(c)
 
+    @ordered
+    def test_open_config_cached(self):
+        """
+        Testing open_config() only parses the config file again when it changes
+        """
+        c = self.conf.open_config()
+        self.assertIs(c, self.conf.open_config())
+        self.conf.save_config(c)
+        self.assertIs(c, self.conf.open_config())
+        # Modify the file behind the back of the config handler
+        with open('tests/fixtures/test.conf', 'a') as f:
+            f.write('\n[testsection]\n')
+        c = self.conf.open_config()
+        self.assertIn('testsection', c.sections())
+        c.remove_section('testsection')
+        self.conf.save_config(c)
+
+    @ordered
+    def test_get_section(self):
+        """
+        Testing get_section()
+        """
+        c = self.conf.open_config()
+        presets = self.conf.get_section(c, 'presets')
+        self.assertIn('presets', self.conf.sections.keys())
+        presets['test'] = {'limit': 20}
+        self.assertNotIn('test', self.conf.get_section(c, 'presets').keys())
+        self.conf.save_config(c)
+        self.assertDictEqual(self.conf.sections, {})
+
+    @ordered
+    def test_batch(self):
+        """
+        Testing batch() writes the config once
+        """
+        with open('tests/fixtures/test.conf', 'r') as f:
+            original = f.read()
+        self.addCleanup(self.restore_config, original)
+        with self.conf.batch():
+            with self.conf.batch():
+                for x in range(50):
+                    self.conf.add_to_blacklist({'name': f'frankie{x}'},
+                                               f'spotify:artist:testartist{x}')
+            self.conf.save_preset({'limit': 20}, 'test')
+            self.conf.remove_from_blacklist('spotify:artist:testartist0')
+            # Nothing is written until the outermost batch ends
+            with open('tests/fixtures/test.conf', 'r') as f:
+                self.assertEqual(original, f.read())
+            self.assertTrue(self.conf.check_item_in_blacklist('spotify:artist:testartist1'))
+            self.assertFalse(self.conf.check_item_in_blacklist('spotify:artist:testartist0'))
+        self.conf.cache_key = None
+        self.assertEqual(len(self.conf.get_blacklist()['artists']), 49)
+        self.assertIn('test', self.conf.get_presets().keys())
+        with self.conf.batch():
+            for x in range(50):
+                self.conf.remove_from_blacklist(f'spotify:artist:testartist{x}')
+            self.conf.remove_preset('test')
+        with open('tests/fixtures/test.conf', 'r') as f:
+            self.assertEqual(original, f.read())
+
+    @ordered
+    def test_batch_encode(self):
+        """
+        Testing batch() encodes each entry of a modified section once, rather than once per change
+        """
+        with open('tests/fixtures/test.conf', 'r') as f:
+            original = f.read()
+        self.addCleanup(self.restore_config, original)
+        calls = []
+        encode_preserve = conf.encode
+
+        def mock_encode(value):
+            calls.append(value)
+            return encode_preserve(value)
+
+        conf.encode = mock_encode
+        self.addCleanup(setattr, conf, 'encode', encode_preserve)
+        keys = self.conf.get_blacklist().keys()
+        with self.conf.batch():
+            for x in range(50):
+                self.conf.add_to_blacklist({'name': f'frankie{x}'},
+                                           f'spotify:artist:testartist{x}')
+            self.assertListEqual(calls, [])
+        self.assertEqual(len(calls), len(keys))
+        self.conf.cache_key = None
+        self.assertEqual(len(self.conf.get_blacklist()['artists']), 50)
+
+    @ordered
+    def test_batch_discard(self):
+        """
+        Testing batch() discards changes on exception
+        """
+        with open('tests/fixtures/test.conf', 'r') as f:
+            original = f.read()
+        with self.assertRaises(ValueError):
+            with self.conf.batch():
+                self.conf.add_to_blacklist({'name': 'frankie'}, 'spotify:artist:testartist')
+                raise ValueError
+        self.assertFalse(self.conf.check_item_in_blacklist('spotify:artist:testartist'))
+        self.assertEqual(self.conf.batch_depth, 0)
+        with open('tests/fixtures/test.conf', 'r') as f:
+            self.assertEqual(original, f.read())
+
+    @ordered
+    def test_write_config(self):
+        """
+        Testing write_config() replaces the config atomically
+        """
+        c = self.conf.open_config()
+        self.conf.write_config(c)
+        self.assertNotIn(f'test.conf.{os.getpid()}.tmp', os.listdir('tests/fixtures'))
+        self.conf.cache_key = None
+        self.assertEqual(self.conf.open_config().sections(), self.sections)
+
+    @ordered
+    def test_lock(self):
+        """
+        Testing lock() is reentrant
+        """
+        with self.conf.lock():
+            with self.conf.lock():
+                self.assertEqual(self.conf.lock_depth, 2)
+            self.assertEqual(self.conf.lock_depth, 1)
+        self.assertEqual(self.conf.lock_depth, 0)
+        self.assertIsNone(self.conf.lock_fd)
+
+    @ordered
+    def test_merge_values(self):
+        """
+        Testing merge_values()
+        """
+        base = conf.encode({'a': 1, 'b': 2})
+        ours = conf.encode({'a': 1, 'b': 3, 'c': 4})
+        theirs = conf.encode({'b': 2, 'd': 5})
+        self.assertEqual(conf.decode(conf.merge_values(base, ours, theirs)),
+                         {'b': 3, 'c': 4, 'd': 5})
+        self.assertEqual(conf.merge_values('3600', '7200', '1800'), '7200')
+        self.assertEqual(conf.merge_values('Bearer', 'Basic', 'Other'), 'Basic')
+
+    @ordered
+    def test_save_config_merge(self):
+        """
+        Testing save_config() merges changes made by another process
+        """
+        shutil.copyfile('tests/fixtures/test.conf', 'tests/fixtures/test-merge.conf')
+        self.addCleanup(os.remove, 'tests/fixtures/test-merge.conf')
+        handlers = []
+        for _ in range(2):
+            handler = conf.Config()
+            handler.set_logger(self.logger)
+            handler.CONFIG_DIR = 'tests/fixtures'
+            handler.CONFIG_FILE = 'test-merge.conf'
+            handler.open_config()
+            handlers.append(handler)
+        with handlers[1].batch():
+            handlers[1].add_to_blacklist({'name': 'track0'}, 'spotify:track:testtrack0')
+            handlers[1].add_to_blacklist({'name': 'frankie'}, 'spotify:artist:testartist')
+            c = handlers[1].open_config()
+            c['spotirecoauth']['access_token'] = 'test'
+            handlers[1].save_config(c)
+            # Written while the batch of the other handler is pending
+            handlers[0].add_to_blacklist({'name': 'track'}, 'spotify:track:testtrack')
+            handlers[0].save_preset({'limit': 20}, 'test')
+        handlers[0].cache_key = None
+        for handler in handlers:
+            blacklist = handler.get_blacklist()
+            self.assertListEqual(sorted(blacklist['tracks'].keys()),
+                                 ['spotify:track:testtrack', 'spotify:track:testtrack0'])
+            self.assertListEqual(list(blacklist['artists'].keys()), ['spotify:artist:testartist'])
+            self.assertDictEqual(handler.get_presets(), {'test': {'limit': 20}})
+            self.assertEqual(handler.get_oauth()['access_token'], 'test')
+
     @ordered
     def test_get_oauth(self):
         """
@@ -188,6 +386,28 @@ class TestConf(SpotirecTestCase):
         test_uri = 'spotify:artist:testuri0frankie'
         self.assertFalse(self.conf.check_item_in_blacklist(test_uri))
 
+    @ordered
+    def test_blacklist_albums_genres(self):
+        """
+        Testing album and genre entries are added to blacklists without them
+        """
+        shutil.copyfile('tests/fixtures/test.conf', 'tests/fixtures/test-genres.conf')
+        self.addCleanup(os.remove, 'tests/fixtures/test-genres.conf')
+        self.conf.CONFIG_FILE = 'test-genres.conf'
+        self.assertFalse(self.conf.check_item_in_blacklist('genre:metal'))
+        self.assertDictEqual(self.conf.get_blacklist_entries('genres'), {})
+        self.conf.add_to_blacklist({'name': 'metal'}, 'genre:metal')
+        self.conf.add_to_blacklist({'name': 'cool album', 'artists': [{'name': 'frankie'}]},
+                                   'spotify:album:testalbum')
+        self.assertTrue(self.conf.check_item_in_blacklist('genre:metal'))
+        self.assertTrue(self.conf.check_item_in_blacklist('spotify:album:testalbum'))
+        self.assertDictEqual(self.conf.get_blacklist_entries('genres'),
+                             {'genre:metal': {'name': 'metal', 'uri': 'genre:metal'}})
+        self.assertEqual(self.conf.get_blacklist()['albums']['spotify:album:testalbum']['artists'],
+                         ['frankie'])
+        self.conf.remove_from_blacklist('genre:metal')
+        self.assertFalse(self.conf.check_item_in_blacklist('genre:metal'))
+
     @ordered
     def test_get_presets(self):
         """
@@ -320,3 +540,200 @@ class TestConf(SpotirecTestCase):
 
         # coverage lol
         self.conf.remove_playlist('this-does-not-exist')
+
+    @ordered
+    def test_blacklist_filter(self):
+        """
+        Testing get_blacklist_filter() is built for large blacklists, kept up to date, and rebuilt
+        when stale
+        """
+        shutil.copyfile('tests/fixtures/test.conf', 'tests/fixtures/test-bloom.conf')
+        self.addCleanup(os.remove, 'tests/fixtures/test-bloom.conf')
+        handler = conf.Config()
+        handler.set_logger(self.logger)
+        handler.CONFIG_DIR = 'tests/fixtures'
+        handler.CONFIG_FILE = 'test-bloom.conf'
+        handler.BLOOM_FILE = 'test-blacklist.bloom'
+        handler.BLOOM_THRESHOLD = 5
+        path = 'tests/fixtures/test-blacklist.bloom'
+        # Cleanups run in reverse, such that the filter is closed before its file is removed
+        self.addCleanup(lambda: os.path.isfile(path) and os.remove(path))
+        self.addCleanup(handler.close_filter)
+        self.assertIsNone(handler.get_blacklist_filter())
+        self.assertFalse(os.path.isfile(path))
+        with handler.batch():
+            for x in range(5):
+                handler.add_to_blacklist({'name': f'frankie{x}'}, f'spotify:artist:testartist{x}')
+        bloom = handler.get_blacklist_filter()
+        self.assertTrue(os.path.isfile(path))
+        self.assertEqual(len(bloom), 5)
+        self.assertIn('spotify:artist:testartist0', bloom)
+        self.assertTrue(handler.check_item_in_blacklist('spotify:artist:testartist0'))
+        self.assertFalse(handler.check_item_in_blacklist('spotify:artist:testartist5'))
+        # Additions are added to the filter as the config is written
+        handler.add_to_blacklist({'name': 'frankie5'}, 'spotify:artist:testartist5')
+        self.assertIs(handler.get_blacklist_filter(), bloom)
+        self.assertIn('spotify:artist:testartist5', bloom)
+        self.assertTrue(handler.check_item_in_blacklist('spotify:artist:testartist5'))
+        # Removals are only checked against the blacklist itself
+        handler.remove_from_blacklist('spotify:artist:testartist5')
+        self.assertIs(handler.get_blacklist_filter(), bloom)
+        self.assertFalse(handler.check_item_in_blacklist('spotify:artist:testartist5'))
+        # Changes not made through the handler invalidate the filter
+        c = handler.open_config()
+        c.set('blacklist', 'tracks', conf.encode({'spotify:track:testtrack': {'name': 'track'}}))
+        handler.write_config(c)
+        self.assertTrue(handler.check_item_in_blacklist('spotify:track:testtrack'))
+        self.assertIsNot(handler.get_blacklist_filter(), bloom)
+        self.assertIn('spotify:track:testtrack', handler.get_blacklist_filter())
+
+
+class TestSQLiteConfig(SpotirecTestCase):
+    """
+    Running tests for SQLiteConfig in conf.py
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Setup any necessary data or states before any tests in this class is run
+        """
+        if runner.verbosity > 0:
+            super(TestSQLiteConfig, cls).setUpClass()
+            print(f'file:/{__file__}\n')
+        cls.logger = log.Log()
+        cls.logger.set_level(0)
+        cls.preset = {'limit': 20, 'based_on': 'top genres', 'seed': 'metal',
+                      'seed_type': 'genres', 'seed_info': {0: {'name': 'metal', 'type': 'genre'}},
+                      'rec_params': {'limit': '20', 'seed_genres': 'metal'},
+                      'auto_play': False, 'playback_device': {}}
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Clear or resolve any necessary data or states after all tests in this class are run
+        """
+        if runner.verbosity > 0:
+            super(TestSQLiteConfig, cls).tearDownClass()
+
+    def setUp(self) -> None:
+        """
+        Setup any necessary data or states before each test is run
+        """
+        shutil.copyfile('tests/fixtures/test.conf', 'tests/fixtures/test-sqlite.conf')
+        self.conf = conf.SQLiteConfig()
+        self.conf.set_logger(self.logger)
+        self.conf.CONFIG_DIR = 'tests/fixtures'
+        self.conf.CONFIG_FILE = 'test-sqlite.conf'
+        self.conf.DATABASE_FILE = 'test.db'
+
+    def tearDown(self) -> None:
+        """
+        Clear or resolve any necessary data or states after each test is run
+        """
+        self.conf.close()
+        os.remove('tests/fixtures/test-sqlite.conf')
+        os.remove('tests/fixtures/test.db')
+
+    @ordered
+    def test_migrate(self):
+        """
+        Testing migrate()
+        """
+        ini = conf.Config()
+        ini.set_logger(self.logger)
+        ini.CONFIG_DIR = 'tests/fixtures'
+        ini.CONFIG_FILE = 'test-sqlite.conf'
+        ini.add_to_blacklist({'name': 'frankie'}, 'spotify:artist:testartist')
+        ini.add_to_blacklist({'name': 'track', 'artists': [{'name': 'frankie'}]},
+                             'spotify:track:testtrack')
+        ini.save_preset(self.preset, 'test')
+        ini.save_device({'id': 'testid', 'name': 'test', 'type': 'fridge'}, 'test')
+        ini.save_playlist({'name': 'test', 'uri': 'spotify:playlist:testplaylist'}, 'test')
+        self.assertDictEqual(self.conf.get_blacklist(), ini.get_blacklist())
+        self.assertDictEqual(self.conf.get_presets(), ini.get_presets())
+        self.assertDictEqual(self.conf.get_devices(), ini.get_devices())
+        self.assertDictEqual(self.conf.get_playlists(), ini.get_playlists())
+        # Migration only happens once
+        ini.remove_preset('test')
+        self.conf.close()
+        self.assertIn('test', self.conf.get_presets().keys())
+
+    @ordered
+    def test_blacklist(self):
+        """
+        Testing add_to_blacklist(), check_item_in_blacklist() and remove_from_blacklist()
+        """
+        self.assertDictEqual(self.conf.get_blacklist(), {'tracks': {}, 'artists': {}})
+        self.conf.add_to_blacklist({'name': 'frankie'}, 'spotify:artist:testartist')
+        self.conf.add_to_blacklist({'name': 'track', 'artists': [{'name': 'frankie'}]},
+                                   'spotify:track:testtrack')
+        self.conf.add_to_blacklist({'name': 'invalid'}, 'this-is-not-a-uri')
+        self.assertTrue(self.conf.check_item_in_blacklist('spotify:artist:testartist'))
+        self.assertFalse(self.conf.check_item_in_blacklist('spotify:artist:testartist0'))
+        self.assertDictEqual(self.conf.get_blacklist(),
+                             {'tracks': {'spotify:track:testtrack':
+                                         {'name': 'track', 'uri': 'spotify:track:testtrack',
+                                          'artists': ['frankie']}},
+                              'artists': {'spotify:artist:testartist':
+                                          {'name': 'frankie', 'uri': 'spotify:artist:testartist'}}})
+        self.conf.remove_from_blacklist('spotify:artist:testartist')
+        self.conf.remove_from_blacklist('spotify:artist:testartist')
+        self.conf.remove_from_blacklist('this-is-not-a-uri')
+        self.assertFalse(self.conf.check_item_in_blacklist('spotify:artist:testartist'))
+        self.assertIn('spotify:track:testtrack', self.conf.get_blacklist()['tracks'].keys())
+        self.conf.add_to_blacklist({'name': 'metal'}, 'genre:metal')
+        self.assertTrue(self.conf.check_item_in_blacklist('genre:metal'))
+        self.assertDictEqual(self.conf.get_blacklist_entries('genres'),
+                             {'genre:metal': {'name': 'metal', 'uri': 'genre:metal'}})
+
+    @ordered
+    def test_batch(self):
+        """
+        Testing batch() commits once, and rolls back on exception
+        """
+        with self.conf.batch():
+            for x in range(50):
+                self.conf.add_to_blacklist({'name': f'frankie{x}'},
+                                           f'spotify:artist:testartist{x}')
+            self.assertTrue(self.conf.connection.in_transaction)
+        self.assertFalse(self.conf.connection.in_transaction)
+        with self.assertRaises(ValueError):
+            with self.conf.batch():
+                self.conf.remove_from_blacklist('spotify:artist:testartist0')
+                self.conf.save_preset({'limit': 20}, 'test')
+                raise ValueError
+        self.assertTrue(self.conf.check_item_in_blacklist('spotify:artist:testartist0'))
+        self.assertDictEqual(self.conf.get_presets(), {})
+        self.assertEqual(len(self.conf.get_blacklist()['artists']), 50)
+
+    @ordered
+    def test_entries(self):
+        """
+        Testing saving and removing presets, devices and playlists
+        """
+        self.conf.save_preset(self.preset, 'test')
+        self.conf.save_device({'id': 'testid', 'name': 'test', 'type': 'fridge'}, 'test')
+        self.conf.save_playlist({'name': 'test', 'uri': 'spotify:playlist:testplaylist'}, 'test')
+        self.assertDictEqual(self.conf.get_presets(), {'test': self.preset})
+        self.assertEqual(self.conf.get_devices()['test']['type'], 'fridge')
+        self.assertEqual(self.conf.get_playlists()['test']['uri'], 'spotify:playlist:testplaylist')
+        self.conf.remove_preset('test')
+        self.conf.remove_device('test')
+        self.conf.remove_playlist('test')
+        self.conf.remove_playlist('this-does-not-exist')
+        self.assertDictEqual(self.conf.get_presets(), {})
+        self.assertDictEqual(self.conf.get_devices(), {})
+        self.assertDictEqual(self.conf.get_playlists(), {})
+
+    @ordered
+    def test_save_config(self):
+        """
+        Testing save_config() still writes the config file
+        """
+        self.assertDictEqual(self.conf.get_presets(), {})
+        self.assertIsNone(self.conf.get_blacklist_filter())
+        c = self.conf.open_config()
+        c.set('spotirecoauth', 'token_type', 'Bearer2')
+        self.conf.save_config(c)
+        self.assertEqual(self.conf.get_oauth()['token_type'], 'Bearer2')
@@ -0,0 +1,87 @@
+from tests.lib import ordered, runner
+from tests.lib.ut_ext import SpotirecTestCase
+from spotirec import api, genres
+import math
+import time
+
+
+class TestGenres(SpotirecTestCase):
+    """
+    Running tests for genres.py
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Setup any necessary data or states before any tests in this class is run
+        """
+        if runner.verbosity > 0:
+            super(TestGenres, cls).setUpClass()
+            print(f'file:/{__file__}\n')
+        cls.seeds = api.GenreSeeds(['metal', 'death-metal', 'pop', 'hip-hop'])
+        cls.artists = [{'genres': ['death metal', 'metal', 'swedish death metal']},
+                       {'genres': ['pop', 'hip hop']},
+                       {'genres': ['metal', 'pop']},
+                       {'genres': []}]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Clear or resolve any necessary data or states after all tests in this class are run
+        """
+        if runner.verbosity > 0:
+            super(TestGenres, cls).tearDownClass()
+
+    @ordered
+    def test_top_genres(self):
+        """
+        Testing top_genres()
+        """
+        counts = {'metal': 1, 'pop': 3, 'hip-hop': 3, 'jazz': 2}
+        self.assertListEqual(genres.top_genres(counts, 3), ['pop', 'hip-hop', 'jazz'])
+        self.assertListEqual(genres.top_genres(counts, 10), ['pop', 'hip-hop', 'jazz', 'metal'])
+        self.assertListEqual(genres.top_genres({}, 5), [])
+
+    @ordered
+    def test_to_seed(self):
+        """
+        Testing to_seed()
+        """
+        aggregator = genres.GenreAggregator(self.seeds)
+        self.assertEqual(aggregator.to_seed('death metal'), 'death-metal')
+        self.assertEqual(aggregator.to_seed('metal'), 'metal')
+        self.assertIsNone(aggregator.to_seed('swedish death metal'))
+        self.assertIsNone(aggregator.to_seed('swedish death metal'))
+
+    @ordered
+    def test_add(self):
+        """
+        Testing add() weights artists by rank
+        """
+        aggregator = genres.GenreAggregator(self.seeds)
+        aggregator.add(self.artists)
+        self.assertEqual(len(aggregator), 4)
+        self.assertListEqual(list(aggregator.counts.keys()),
+                             ['death-metal', 'metal', 'pop', 'hip-hop'])
+        self.assertAlmostEqual(aggregator.counts['metal'], 1 + 1 / math.log2(4))
+        self.assertAlmostEqual(aggregator.counts['hip-hop'], 1 / math.log2(3))
+        self.assertListEqual(aggregator.top(2), ['metal', 'pop'])
+        # Further lists are added to the same counts
+        aggregator.add(self.artists[1:2], weight=2)
+        self.assertAlmostEqual(aggregator.counts['hip-hop'], 2 + 1 / math.log2(3))
+        self.assertListEqual(aggregator.top(2), ['pop', 'hip-hop'])
+
+    @ordered
+    def test_add_many(self):
+        """
+        Testing add() with thousands of artists
+        """
+        seeds = api.GenreSeeds([f'genre-{x}' for x in range(100)])
+        artists = [{'genres': [f'genre {(x * y) % 150}' for y in range(10)]}
+                   for x in range(5000)]
+        aggregator = genres.GenreAggregator(seeds)
+        start = time.time()
+        aggregator.add(artists)
+        self.assertEqual(len(aggregator.top(5)), 5)
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(aggregator.top(1), ['genre-0'])
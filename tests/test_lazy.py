@@ -0,0 +1,59 @@
+from tests.lib import ordered, runner
+from tests.lib.ut_ext import SpotirecTestCase
+from spotirec import lazy
+import subprocess
+import sys
+
+
+class TestLazy(SpotirecTestCase):
+    """
+    Running tests for lazy.py
+    """
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        Setup any necessary data or states before any tests in this class is run
+        """
+        if runner.verbosity > 0:
+            super(TestLazy, cls).setUpClass()
+            print(f'file:/{__file__}\n')
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        Clear or resolve any necessary data or states after all tests in this class are run
+        """
+        if runner.verbosity > 0:
+            super(TestLazy, cls).tearDownClass()
+
+    @ordered
+    def test_lazy_module(self):
+        """
+        Testing LazyImport of a module
+        """
+        module = lazy.LazyImport('colorsys')
+        self.assertIsNone(module.obj)
+        self.assertEqual(module.rgb_to_hsv(0.0, 0.0, 0.0), (0.0, 0.0, 0.0))
+        self.assertIs(module.obj, sys.modules['colorsys'])
+
+    @ordered
+    def test_lazy_attribute(self):
+        """
+        Testing LazyImport of an attribute of a module
+        """
+        func = lazy.LazyImport('colorsys', 'hsv_to_rgb')
+        self.assertEqual(func(0.0, 0.0, 1.0), (1.0, 1.0, 1.0))
+        self.assertIs(func.resolve(), sys.modules['colorsys'].hsv_to_rgb)
+        self.assertEqual(func.__name__, 'hsv_to_rgb')
+
+    @ordered
+    def test_startup_imports(self):
+        """
+        Testing heavy dependencies are not imported at startup
+        """
+        modules = ['requests', 'asyncio', 'PIL.Image', 'bottle', 'webbrowser']
+        code = f'import sys, spotirec.main; print([x for x in {modules} if x in sys.modules])'
+        stdout = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                check=True).stdout
+        self.assertEqual(stdout.strip(), '[]')
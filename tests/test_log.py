@@ -1,8 +1,11 @@
 from tests.lib import ordered, runner
 from tests.lib.ut_ext import SpotirecTestCase
 from spotirec import log
+import json
 import os
+import subprocess
 import sys
+import time
 
 
 class TestLog(SpotirecTestCase):
@@ -106,7 +109,7 @@ class TestLog(SpotirecTestCase):
         """
         s = 'test_error'
         self.logger.error(s)
-        self.assertIn(s, self.logger.LOG)
+        self.assertIn(s, self.logger.get_log())
         sys.stdout.close()
         sys.stdout = self.stdout_preserve
         with open(self.test_log, 'r') as f:
@@ -121,7 +124,7 @@ class TestLog(SpotirecTestCase):
         """
         s = 'test_warning'
         self.logger.warning(s)
-        self.assertIn(s, self.logger.LOG)
+        self.assertIn(s, self.logger.get_log())
         sys.stdout.close()
         sys.stdout = self.stdout_preserve
         with open(self.test_log, 'r') as f:
@@ -136,7 +139,7 @@ class TestLog(SpotirecTestCase):
         """
         s = 'test_info'
         self.logger.info(s)
-        self.assertIn(s, self.logger.LOG)
+        self.assertIn(s, self.logger.get_log())
         sys.stdout.close()
         sys.stdout = self.stdout_preserve
         with open(self.test_log, 'r') as f:
@@ -151,7 +154,7 @@ class TestLog(SpotirecTestCase):
         """
         s = 'test_verbose'
         self.logger.verbose(s)
-        self.assertIn(s, self.logger.LOG)
+        self.assertIn(s, self.logger.get_log())
         sys.stdout.close()
         sys.stdout = self.stdout_preserve
         with open(self.test_log, 'r') as f:
@@ -166,7 +169,7 @@ class TestLog(SpotirecTestCase):
         """
         s = 'test_debug'
         self.logger.debug(s)
-        self.assertIn(s, self.logger.LOG)
+        self.assertIn(s, self.logger.get_log())
         sys.stdout.close()
         sys.stdout = self.stdout_preserve
         with open(self.test_log, 'r') as f:
@@ -180,4 +183,183 @@ class TestLog(SpotirecTestCase):
         Testing append_log()
         """
         self.logger.append_log('TEST', 'test_message')
-        self.assertIn('test_message', self.logger.LOG)
+        self.assertIn('test_message', self.logger.get_log())
+
+    @ordered
+    def test_capacity(self):
+        """
+        Testing records are kept in a bounded buffer
+        """
+        logger = log.Log()
+        logger.set_level(log.NOTSET)
+        logger.set_capacity(3)
+        for x in range(5):
+            logger.debug(f'test_capacity{x}')
+        self.assertEqual(len(logger.records), 3)
+        self.assertNotIn('test_capacity1', logger.get_log())
+        self.assertIn('test_capacity2', logger.get_log())
+        self.assertIn('test_capacity4', logger.get_log())
+        logger.set_capacity(2)
+        self.assertListEqual([x[2] for x in logger.records], ['test_capacity3', 'test_capacity4'])
+
+    @ordered
+    def test_stream_to_file(self):
+        """
+        Testing stream_to_file()
+        """
+        logger = log.Log()
+        logger.set_level(log.NOTSET)
+        logger.LOG_PATH = 'tests/fixtures/logs'
+        logger.set_capacity(2)
+        logger.info('test_stream0')
+        logger.stream_to_file()
+        for x in range(1, 5):
+            logger.debug(f'test_stream{x}')
+        path = f'{logger.LOG_PATH}/{logger.get_file_name()}'
+        logger.stream.flush()
+        with open(path, 'r') as f:
+            stdout = f.read()
+            # records dropped from memory are still written
+            for x in range(5):
+                self.assertIn(f'test_stream{x}', stdout)
+        logger.log_file(crash=True)
+        with open(f'{logger.LOG_PATH}/{logger.get_file_name(crash=True)}', 'r') as f:
+            self.assertNotIn('test_stream0', f.read())
+        os.remove(f'{logger.LOG_PATH}/{logger.get_file_name(crash=True)}')
+        logger.log_file()
+        self.assertIsNone(logger.stream)
+        os.remove(path)
+        os.rmdir(logger.LOG_PATH)
+
+    @ordered
+    def test_enabled_for(self):
+        """
+        Testing enabled_for()
+        """
+        logger = log.Log()
+        logger.set_level(log.INFO)
+        self.assertTrue(logger.enabled_for(log.INFO))
+        self.assertFalse(logger.enabled_for(log.DEBUG))
+        logger.stream = sys.stdout
+        self.assertTrue(logger.enabled_for(log.DEBUG))
+
+    @ordered
+    def test_lazy_message(self):
+        """
+        Testing messages are only rendered when needed
+        """
+        logger = log.Log()
+        logger.set_level(log.INFO)
+        calls = []
+
+        def message():
+            calls.append(1)
+            return 'test_lazy'
+
+        logger.debug(message)
+        logger.debug('test_lazy %s %d', 'args', 2)
+        self.assertListEqual(calls, [])
+        self.assertIn('test_lazy\n', logger.get_log())
+        self.assertIn('test_lazy args 2', logger.get_log())
+        self.assertListEqual(calls, [1, 1])
+        logger.info(message)
+        logger.info('test_lazy %s', 'info')
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn('test_lazy\n', stdout)
+            self.assertIn('test_lazy info', stdout)
+
+    @ordered
+    def test_lazy_args(self):
+        """
+        Testing format args are only rendered when a sink needs them
+        """
+        calls = []
+
+        class Tracks(list):
+            def __repr__(self):
+                calls.append(1)
+                return super().__repr__()
+
+        logger = log.Log()
+        logger.set_level(log.INFO)
+        logger.LOG_PATH = 'tests/fixtures/logs'
+        logger.debug('test_lazy_args %s', Tracks(['spotify:track:testtrack']))
+        self.assertListEqual(calls, [])
+        self.assertFalse(logger.enabled_for(log.DEBUG))
+        logger.stream_to_file()
+        self.addCleanup(os.rmdir, logger.LOG_PATH)
+        self.addCleanup(os.remove, f'{logger.LOG_PATH}/{logger.get_file_name()}')
+        self.addCleanup(logger.close)
+        # Records kept in memory are rendered once as they are streamed
+        self.assertListEqual(calls, [1])
+        logger.debug('test_lazy_args %s', Tracks(['spotify:track:testtrack']))
+        self.assertListEqual(calls, [1, 1])
+        logger.close()
+        with open(f'{logger.LOG_PATH}/{logger.get_file_name()}', 'r') as f:
+            self.assertEqual(f.read().count("test_lazy_args ['spotify:track:testtrack']"), 2)
+
+    @ordered
+    def test_structured(self):
+        """
+        Testing structured logs written as JSON lines
+        """
+        logger = log.Log()
+        logger.set_level(log.NOTSET)
+        logger.set_structured(True)
+        logger.LOG_PATH = 'tests/fixtures/logs'
+        logger.info('test_structured0')
+        logger.stream_to_file()
+        logger.debug('test_structured%d', 1, request_id='abc', duration=0.5)
+        path = f'{logger.LOG_PATH}/{logger.writer.file_name}'
+        self.assertIn(str(os.getpid()), path)
+        logger.writer.flush()
+        with open(path, 'r') as f:
+            lines = [json.loads(x) for x in f.readlines()]
+        self.assertEqual(lines[0]['event'], 'test_structured0')
+        self.assertEqual(lines[0]['level'], 'INFO')
+        self.assertIsNone(lines[0]['request_id'])
+        self.assertEqual(lines[1]['event'], 'test_structured1')
+        self.assertEqual(lines[1]['request_id'], 'abc')
+        self.assertEqual(lines[1]['duration'], 0.5)
+        self.assertIn('timestamp', lines[1])
+        # records are written to the file of the day they were created on
+        writer = logger.writer
+        writer.write((time.time() + 24 * 60 * 60, 'INFO', 'test_rotate', (), {}))
+        writer.flush()
+        rotated = f'{logger.LOG_PATH}/{writer.file_name}'
+        self.assertNotEqual(path, rotated)
+        with open(rotated, 'r') as f:
+            self.assertEqual(json.loads(f.read())['event'], 'test_rotate')
+        logger.log_file()
+        self.assertIsNone(logger.writer)
+        self.assertFalse(writer.thread.is_alive())
+        os.remove(path)
+        os.remove(rotated)
+        os.rmdir(logger.LOG_PATH)
+
+    @ordered
+    def test_structured_exit(self):
+        """
+        Testing structured logs are written in full when exiting without log_file()
+        """
+        log_path = 'tests/fixtures/logs'
+        code = ('import sys\n'
+                'from spotirec import log\n'
+                'logger = log.Log()\n'
+                'logger.set_level(log.NOTSET)\n'
+                'logger.set_structured(True)\n'
+                f'logger.LOG_PATH = "{log_path}"\n'
+                'logger.stream_to_file()\n'
+                'for x in range(5000):\n'
+                '    logger.debug("test_exit%d", x)\n'
+                'print(logger.writer.file_name)\n'
+                'sys.exit(0)\n')
+        file_name = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                   check=True).stdout.strip()
+        with open(f'{log_path}/{file_name}', 'r') as f:
+            self.assertEqual(len(f.readlines()), 5000)
+        os.remove(f'{log_path}/{file_name}')
+        os.rmdir(log_path)
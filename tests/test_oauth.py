@@ -18,7 +18,7 @@ class TestOauth2(SpotirecTestCase):
         if runner.verbosity > 0:
             super(TestOauth2, cls).setUpClass()
             print(f'file:/{__file__}\n')
-        oauth2.requests = mock.MockAPI()
+        api.requests = mock.MockAPI()
         cls.logger = log.Log()
         cls.conf = conf.Config()
         cls.oauth = oauth2.SpotifyOAuth()
@@ -1,10 +1,12 @@
 from tests.lib import ordered, mock, runner
 from tests.lib.ut_ext import SpotirecTestCase
-from spotirec import oauth2, api, conf, log, recommendation, spotirec
+from spotirec import oauth2, api, blacklist, conf, log, recommendation, spotirec
 import os
+import shutil
 import sys
 import time
 import errno
+import random
 from PIL import Image
 
 
@@ -31,6 +33,8 @@ class TestSpotirec(SpotirecTestCase):
         spotirec.api.requests = mock.MockAPI()
         spotirec.api.set_logger(spotirec.logger)
         spotirec.api.set_conf(spotirec.conf)
+        # recommend() tops up tracks with many successive requests, do not throttle these
+        spotirec.api.get_scheduler().RATE = 1000000.0
         spotirec.sp_oauth.set_api(spotirec.api)
         spotirec.headers = \
             {'Content-Type': 'application/json', 'Authorization':
@@ -64,6 +68,8 @@ class TestSpotirec(SpotirecTestCase):
         Setup any necessary data or states before each test is run
         """
         spotirec.CONFIG_PATH = 'tests/fixtures/.config'
+        spotirec.api.set_cache(None)
+        spotirec.blacklist_index = None
         spotirec.logger.set_level(0)
         spotirec.rec = recommendation.Recommendation()
         spotirec.rec.set_logger(spotirec.logger)
@@ -183,6 +189,17 @@ class TestSpotirec(SpotirecTestCase):
         self.assertEqual(list(genres.keys()),
                          ['pop', 'metal', 'vapor-death-pop', 'holidays', 'metalcore'])
 
+    @ordered
+    def test_get_user_top_genres_all_time_ranges(self):
+        """
+        Testing get_user_top_genres() over every time range
+        """
+        genres = spotirec.get_user_top_genres()
+        all_genres = spotirec.get_user_top_genres(all_time_ranges=True)
+        self.assertEqual(list(all_genres.keys()), list(genres.keys()))
+        for genre, count in genres.items():
+            self.assertAlmostEqual(all_genres[genre], count * len(spotirec.TIME_RANGES))
+
     @ordered
     def test_add_top_genres_seed(self):
         """
@@ -457,6 +474,8 @@ class TestSpotirec(SpotirecTestCase):
         li_mix = [1, 2, 1, 'metal', 'metal', {'skdjf': 3, 'sdkfj': 4, 'uri': 'pe'},
                   {'skdjf': 3, 'sdkfj': 4, 'uri': 'nis'}, {'skdjf': 3, 'sdkfj': 6, 'uri': 'nis'}]
         self.assertListEqual([1, 2, 'metal'], spotirec.filter_list_duplicates(li))
+        self.assertListEqual([3, 1, 2], spotirec.filter_list_duplicates([3, 1, 3, 2, 1]))
+        self.assertListEqual([], spotirec.filter_list_duplicates([]))
         self.assertListEqual([{'skdjf': 3, 'sdkfj': 4, 'uri': 'pe'},
                               {'skdjf': 3, 'sdkfj': 4, 'uri': 'nis'}],
                              spotirec.filter_list_duplicates(li_dict))
@@ -574,6 +593,33 @@ class TestSpotirec(SpotirecTestCase):
                              {0: {'name': 'track0', 'id': 'testtrack', 'type': 'track',
                                   'artists': ['frankie0', 'frankie1']}})
 
+    @ordered
+    def test_parse_seed_info_custom_mix(self):
+        """
+        Testing parse_seed_info() custom mix of genres and uris
+        """
+        spotirec.rec.seed_type = 'custom'
+        spotirec.parse_seed_info(['spotify:artist:testartist', 'metal', 'spotify:track:testtrack'])
+        self.assertDictEqual(spotirec.rec.seed_info,
+                             {0: {'name': 'frankie0', 'id': 'testartist', 'type': 'artist'},
+                              1: {'name': 'metal', 'type': 'genre'},
+                              2: {'name': 'track0', 'id': 'testtrack', 'type': 'track',
+                                  'artists': ['frankie0', 'frankie1']}})
+
+    @ordered
+    def test_request_uri_data(self):
+        """
+        Testing request_uri_data()
+        """
+        data = spotirec.request_uri_data(['spotify:track:testid0', 'spotify:artist:testid1',
+                                          'spotify:track:testid2'])
+        self.assertListEqual(sorted(data.keys()), ['spotify:artist:testid1',
+                                                   'spotify:track:testid0',
+                                                   'spotify:track:testid2'])
+        self.assertEqual(data['spotify:artist:testid1']['name'], 'frankie0')
+        self.assertEqual(data['spotify:track:testid2']['name'], 'track0')
+        self.assertDictEqual(spotirec.request_uri_data([]), {})
+
     @ordered
     def test_parse_seed_info_custom_warning(self):
         """
@@ -590,6 +636,38 @@ class TestSpotirec(SpotirecTestCase):
             stdout = f.read()
             self.assertIn(expected, stdout)
 
+    @ordered
+    def test_parse_seed_info_custom_unknown_uri(self):
+        """
+        Testing parse_seed_info() custom uri that does not exist
+        """
+        spotirec.logger.set_level(log.WARNING)
+        spotirec.rec.seed_type = 'custom'
+        spotirec.parse_seed_info(['spotify:track:unknown'])
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn('could not find spotify:track:unknown, skipping...', stdout)
+            self.assertNotIn('does not match a genre', stdout)
+        self.assertDictEqual(spotirec.rec.seed_info, {})
+
+    @ordered
+    def test_parse_seed_info_custom_completion(self):
+        """
+        Testing parse_seed_info() custom genre completion
+        """
+        expected = 'did you mean: metal, metalcore'
+        spotirec.logger.set_level(log.INFO)
+        spotirec.rec.seed_type = 'custom'
+        spotirec.parse_seed_info(['met'])
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn(expected, stdout)
+        self.assertDictEqual(spotirec.rec.seed_info, {})
+
     @ordered
     def test_add_to_blacklist(self):
         """
@@ -605,6 +683,54 @@ class TestSpotirec(SpotirecTestCase):
         blacklist = spotirec.conf.get_blacklist()
         self.assertDictEqual(blacklist['tracks'], {})
 
+    @ordered
+    def test_add_to_blacklist_several(self):
+        """
+        Testing add_to_blacklist() (several entries)
+        """
+        spotirec.logger.set_level(log.WARNING)
+        spotirec.add_to_blacklist(['spotify:track:testid0', 'spotify:artist:testid1',
+                                   'spotify:track:unknown', 'not-a-uri'])
+        blacklist = spotirec.conf.get_blacklist()
+        self.assertListEqual(list(blacklist['tracks'].keys()), ['spotify:track:testid0'])
+        self.assertListEqual(list(blacklist['artists'].keys()), ['spotify:artist:testid1'])
+        spotirec.remove_from_blacklist(['spotify:track:testid0', 'spotify:artist:testid1'])
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn('could not find spotify:track:unknown, skipping...', stdout)
+            self.assertIn('uri not-a-uri is not a valid uri', stdout)
+
+    @ordered
+    def test_add_to_blacklist_albums_genres(self):
+        """
+        Testing add_to_blacklist() and remove_from_blacklist() (albums and genres)
+        """
+        shutil.copyfile('tests/fixtures/test.conf', 'tests/fixtures/test-genres.conf')
+        spotirec.conf.CONFIG_FILE = 'test-genres.conf'
+        spotirec.add_to_blacklist(['spotify:album:testalbum', 'genre: Death Metal'])
+        blacklist = spotirec.conf.get_blacklist()
+        self.assertDictEqual(blacklist['albums'],
+                             {'spotify:album:testalbum': {'name': 'cool album',
+                                                          'uri': 'spotify:album:testalbum',
+                                                          'artists': ['frankie0']}})
+        self.assertDictEqual(blacklist['genres'],
+                             {'genre:death-metal': {'name': 'death-metal',
+                                                    'uri': 'genre:death-metal'}})
+        spotirec.print_blacklist()
+        spotirec.remove_from_blacklist(['spotify:album:testalbum', 'genre:DEATH METAL'])
+        blacklist = spotirec.conf.get_blacklist()
+        self.assertDictEqual(blacklist['albums'], {})
+        self.assertDictEqual(blacklist['genres'], {})
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn('cool album by frankie0 - spotify:album:testalbum', stdout)
+            self.assertIn('Genres', stdout)
+        os.remove('tests/fixtures/test-genres.conf')
+
     @ordered
     def test_remove_from_blacklist(self):
         """
@@ -1064,6 +1190,73 @@ class TestSpotirec(SpotirecTestCase):
         # should not cause system exit
         spotirec.add_current_track('spotify:playlist:testplaylist')
 
+    @ordered
+    def test_add_current_track_large_playlist(self):
+        """
+        Testing add_current_track() (track exists past the first page)
+        """
+        expected = 'track spotify:track:testtrack already exists in playlist, skipping...'
+        spotirec.logger.set_level(log.WARNING)
+        spotirec.add_current_track('spotify:playlist:testplaylistlarge')
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn(expected, stdout)
+
+    @ordered
+    def test_diff_playlist(self):
+        """
+        Testing diff_playlist()
+        """
+        rand = random.Random(0)
+        pool = [f'spotify:track:test{x}' for x in range(300)]
+        for _ in range(50):
+            current = rand.sample(pool, rand.randint(0, 150))
+            new = rand.sample(pool, rand.randint(0, 150))
+            operations = spotirec.diff_playlist(current, new)
+            result = [x for x in current if x not in operations['remove']]
+            for start, insert_before in operations['moves']:
+                track = result.pop(start)
+                result.insert(insert_before if insert_before < start else insert_before - 1,
+                              track)
+            for position, uris in operations['add']:
+                result[position:position] = uris
+            self.assertListEqual(result, new)
+        self.assertDictEqual(spotirec.diff_playlist(pool[:10], pool[:10]),
+                             {'remove': [], 'moves': [], 'add': []})
+        self.assertEqual(len(spotirec.diff_playlist(pool[:10], pool[9::-1])['moves']), 9)
+        self.assertEqual(len(spotirec.diff_playlist(pool[:10], pool[1:10] + pool[:1])['moves']), 1)
+        self.assertIsNone(spotirec.diff_playlist(['a', 'a'], ['a']))
+
+    @ordered
+    def test_refresh_playlist(self):
+        """
+        Testing refresh_playlist() (unchanged playlist)
+        """
+        calls = []
+
+        def mock_update(*args, **kwargs):
+            calls.append(args)
+
+        spotirec.api.update_playlist_details = mock_update
+        spotirec.rec.playlist_id = 'testplaylist'
+        playlist = {'name': 'test', 'uri': 'spotify:playlist:testplaylist'}
+        image_hash = spotirec.refresh_playlist(playlist, [])
+        self.assertEqual(image_hash, spotirec.hash_tracks([]))
+        self.assertEqual(len(calls), 1)
+        # the image hash is not saved until the cover is uploaded
+        playlist = spotirec.conf.get_playlists()['spotirec-default']
+        self.assertNotIn('image_hash', playlist.keys())
+        self.assertEqual(spotirec.refresh_playlist(playlist, []), image_hash)
+        self.assertEqual(len(calls), 1)
+        playlist['image_hash'] = image_hash
+        self.assertIsNone(spotirec.refresh_playlist(playlist, []))
+        self.assertEqual(spotirec.conf.get_playlists()['spotirec-default']['image_hash'],
+                         image_hash)
+        del spotirec.api.update_playlist_details
+        spotirec.conf.remove_playlist('spotirec-default')
+
     @ordered
     def test_add_current_track_ep_show(self):
         """
@@ -1207,6 +1400,61 @@ class TestSpotirec(SpotirecTestCase):
         spotirec.conf.remove_from_blacklist('spotify:track:testid2')
         spotirec.conf.remove_from_blacklist('spotify:artist:testid1')
 
+    @ordered
+    def test_filter_recommendations_genres(self):
+        """
+        Testing filter_recommendations() (albums and genres)
+        """
+        shutil.copyfile('tests/fixtures/test.conf', 'tests/fixtures/test-genres.conf')
+        spotirec.conf.CONFIG_FILE = 'test-genres.conf'
+        test_data = {'tracks': [{'uri': f'spotify:track:testid{x}',
+                                 'artists': [{'uri': f'spotify:artist:testid{x}'}],
+                                 'album': {'uri': f'spotify:album:testid{x}'}}
+                                for x in range(3)]}
+        spotirec.add_to_blacklist(['spotify:album:testid1', 'genre:hip-hop'])
+        self.assertListEqual(spotirec.filter_recommendations(test_data),
+                             ['spotify:track:testid0', 'spotify:track:testid2'])
+        # All artists of the mock API are metal artists
+        spotirec.add_to_blacklist(['genre:metal'])
+        self.assertListEqual(spotirec.filter_recommendations(test_data), [])
+        os.remove('tests/fixtures/test-genres.conf')
+
+    @ordered
+    def test_get_blacklist_index(self):
+        """
+        Testing get_blacklist_index() is built once and rebuilt after blacklist changes
+        """
+        index = spotirec.get_blacklist_index()
+        self.assertIsInstance(index, blacklist.BlacklistIndex)
+        self.assertIs(index, spotirec.get_blacklist_index())
+        spotirec.add_to_blacklist(['spotify:track:testtrack'])
+        self.assertIn('spotify:track:testtrack', spotirec.get_blacklist_index().tracks)
+        spotirec.remove_from_blacklist(['spotify:track:testtrack'])
+        self.assertNotIn('spotify:track:testtrack', spotirec.get_blacklist_index().tracks)
+
+    @ordered
+    def test_get_blacklist_index_prefiltered(self):
+        """
+        Testing get_blacklist_index() prefilters large blacklists with their bloom filter
+        """
+        spotirec.conf.BLOOM_THRESHOLD = 1
+        spotirec.conf.BLOOM_FILE = 'test.bloom'
+        spotirec.add_to_blacklist(['spotify:track:testtrack'])
+        index = spotirec.get_blacklist_index()
+        self.assertIsInstance(index, blacklist.PrefilteredBlacklistIndex)
+        tracks = [{'uri': 'spotify:track:testtrack', 'artists': [],
+                   'album': {'uri': 'spotify:album:testalbum'}},
+                  {'uri': 'spotify:track:testtrack0', 'artists': [],
+                   'album': {'uri': 'spotify:album:testalbum'}}]
+        self.assertListEqual(index.filter(tracks[1:]), ['spotify:track:testtrack0'])
+        self.assertIsNone(index.index)
+        self.assertListEqual(index.filter(tracks), ['spotify:track:testtrack0'])
+        spotirec.remove_from_blacklist(['spotify:track:testtrack'])
+        spotirec.conf.close_filter()
+        os.remove('tests/fixtures/test.bloom')
+        spotirec.conf.BLOOM_THRESHOLD = conf.Config.BLOOM_THRESHOLD
+        spotirec.conf.BLOOM_FILE = conf.Config.BLOOM_FILE
+
     @ordered
     def test_print_tuning_options_no_file(self):
         """
@@ -1330,6 +1578,115 @@ class TestSpotirec(SpotirecTestCase):
         spotirec.recommend()
         spotirec.conf.remove_playlist('spotirec-default')
 
+    @ordered
+    def test_recommend_diff(self):
+        """
+        Testing recommend() with diff arg
+        """
+        spotirec.args = mock.MockArgs(diff=True)
+        spotirec.conf.save_playlist({'name': 'test', 'uri': 'spotify:playlist:testplaylist'},
+                                    'spotirec-default')
+
+        def mock_add_image(tracks):
+            sys.exit(1)
+
+        # the image hash is not saved if the cover upload fails
+        add_image_preserve = spotirec.add_image_to_playlist
+        spotirec.add_image_to_playlist = mock_add_image
+        self.assertRaises(SystemExit, spotirec.recommend)
+        spotirec.add_image_to_playlist = add_image_preserve
+        playlist = spotirec.conf.get_playlists()['spotirec-default']
+        self.assertNotIn('image_hash', playlist.keys())
+        spotirec.recommend()
+        playlist = spotirec.conf.get_playlists()['spotirec-default']
+        self.assertIn('details_hash', playlist.keys())
+        self.assertIn('image_hash', playlist.keys())
+        spotirec.args = mock.MockArgs()
+        spotirec.recommend()
+        playlist = spotirec.conf.get_playlists()['spotirec-default']
+        self.assertNotIn('details_hash', playlist.keys())
+        spotirec.conf.remove_playlist('spotirec-default')
+
+    @ordered
+    def test_vary_rec_params(self):
+        """
+        Testing vary_rec_params()
+        """
+        params = {'limit': '20', 'seed_artists': 'testid0,testid1', 'seed_genres': 'metal',
+                  'seed_tracks': ''}
+        self.assertDictEqual(spotirec.vary_rec_params(params, 0), params)
+        self.assertEqual(spotirec.vary_rec_params(params, 1)['seed_artists'], 'testid1')
+        self.assertEqual(spotirec.vary_rec_params(params, 2)['seed_artists'], 'testid0')
+        variant = spotirec.vary_rec_params(params, 3)
+        self.assertEqual(variant['seed_genres'], '')
+        self.assertEqual(variant['seed_artists'], 'testid0,testid1')
+        self.assertEqual(spotirec.vary_rec_params(params, 4)['seed_artists'], 'testid1')
+        self.assertEqual(params['seed_artists'], 'testid0,testid1')
+        # single seeds are varied by popularity, unless popularity is tuned
+        single = {'limit': '20', 'seed_genres': 'metal'}
+        targets = [spotirec.vary_rec_params(single, x).get('target_popularity')
+                   for x in range(0, 5)]
+        self.assertListEqual(targets, [None, '20', '40', '60', '80'])
+        self.assertEqual(spotirec.vary_rec_params(single, 1)['seed_genres'], 'metal')
+        tuned = dict(single, min_popularity='50')
+        self.assertDictEqual(spotirec.vary_rec_params(tuned, 1), tuned)
+
+    @ordered
+    def test_gather_recommendations(self):
+        """
+        Testing gather_recommendations() over-fetches concurrently and deduplicates
+        """
+        requests = []
+
+        def mock_recommendations(rec_params, headers):
+            requests.append(rec_params)
+            # every other track is a repeat of the first track
+            return {'tracks': [{'uri': f'spotify:track:testid{len(requests)}-{x}'
+                                if x % 2 else 'spotify:track:testid0', 'artists': []}
+                               for x in range(int(rec_params['limit']))]}
+
+        def mock_filter(data):
+            # tracks ending in 0, 3, 6 or 9 are blacklisted
+            return [x['uri'] for x in data['tracks'] if int(x['uri'].split('-')[-1][-1]) % 3]
+
+        filter_func = spotirec.filter_recommendations
+        spotirec.filter_recommendations = mock_filter
+        spotirec.api.get_recommendations = mock_recommendations
+        spotirec.rec.update_limit(100, init=True)
+        spotirec.rec.rec_params['seed_genres'] = 'metal,pop'
+        tracks = spotirec.gather_recommendations()
+        self.assertEqual(len(tracks), 100)
+        self.assertEqual(len(set(tracks)), 100)
+        self.assertEqual(requests[0], spotirec.rec.rec_params)
+        # the first round over-fetches with several concurrent requests of varied seeds
+        self.assertGreater(len(requests), 2)
+        self.assertLessEqual(len(requests), 1 + spotirec.REC_ROUNDS * spotirec.REC_CONCURRENCY)
+        self.assertIn('pop', [x['seed_genres'] for x in requests[1:]])
+        self.assertTrue(all(int(x['limit']) <= 100 for x in requests))
+        # rounds are bounded, even if nothing is eligible
+        requests.clear()
+        spotirec.filter_recommendations = lambda data: []
+        self.assertListEqual(spotirec.gather_recommendations(), [])
+        self.assertLessEqual(len(requests), 1 + spotirec.REC_ROUNDS * spotirec.REC_CONCURRENCY)
+        # identical variants are only requested once
+        requests.clear()
+        spotirec.rec.rec_params['seed_genres'] = 'metal'
+        spotirec.rec.rec_params['min_popularity'] = '50'
+        self.assertListEqual(spotirec.gather_recommendations(), [])
+        self.assertEqual(len(requests), 2)
+        del spotirec.rec.rec_params['min_popularity']
+        del spotirec.api.get_recommendations
+        spotirec.filter_recommendations = filter_func
+
+    @ordered
+    def test_gather_recommendations_exhausted(self):
+        """
+        Testing gather_recommendations() stops once no new tracks are received
+        """
+        spotirec.rec.update_limit(20, init=True)
+        tracks = spotirec.gather_recommendations()
+        self.assertListEqual(tracks, [f'spotify:track:testid{x}' for x in range(5)])
+
     @ordered
     def test_recommend_auto_play(self):
         """
@@ -1709,6 +2066,52 @@ class TestSpotirec(SpotirecTestCase):
             self.assertIn(expected0, stdout)
             self.assertIn(expected1, stdout)
 
+    @ordered
+    def test_print_tracks_features(self):
+        """
+        Testing print_tracks_features()
+        """
+        spotirec.print_tracks_features(['spotify:track:testid0', 'spotify:track:testid1'])
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertEqual(stdout.count('track0 - frankie0, frankie1'), 2)
+            self.assertIn(f'Track URI{" " * 21}spotify:track:testid0', stdout)
+            self.assertIn(f'Track URI{" " * 21}spotify:track:testid1', stdout)
+            self.assertEqual(stdout.count(f'Tempo{" " * 25}70.0 bpm'), 2)
+
+    @ordered
+    def test_print_tracks_features_error(self):
+        """
+        Testing print_tracks_features() invalid uri
+        """
+        spotirec.logger.set_level(log.INFO)
+        self.assertRaises(SystemExit, spotirec.print_tracks_features,
+                          uris=['spotify:track:testid0', 'this is not a URI'])
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn('this is not a URI is not a valid track URI', stdout)
+            crash_file = stdout.split('/')[2].strip('\n')
+            os.remove(f'tests/fixtures/{crash_file}')
+
+    @ordered
+    def test_print_tracks_features_unknown(self):
+        """
+        Testing print_tracks_features() unknown track
+        """
+        spotirec.logger.set_level(log.INFO)
+        spotirec.print_tracks_features(['spotify:track:unknown', 'spotify:track:testid1'])
+        sys.stdout.close()
+        sys.stdout = self.stdout_preserve
+        with open(self.test_log, 'r') as f:
+            stdout = f.read()
+            self.assertIn('could not find spotify:track:unknown, skipping...', stdout)
+            self.assertEqual(stdout.count('Track URI'), 1)
+            self.assertIn(f'Track URI{" " * 21}spotify:track:testid1', stdout)
+
     @ordered
     def test_args_track_features_current(self):
         """
@@ -2287,6 +2690,61 @@ class TestSpotirec(SpotirecTestCase):
         spotirec.get_token = get_token_save
         spotirec.get_user_top_genres = top_genres_save
 
+    @ordered
+    def test_init_args_no_cache(self):
+        """
+        Testing init() with no cache arg
+        """
+
+        def mock_get_token():
+            return 'f6952d6eef555ddd87aca66e56b91530222d6e318414816f3ba7cf5bf694bf0f'
+
+        def mock_get_user_top_genres():
+            return {'metal': 3, 'vapor-death-pop': 7, 'metalcore': 2, 'pop': 1, 'poo': 23}
+
+        get_token_save = spotirec.get_token
+        top_genres_save = spotirec.get_user_top_genres
+        spotirec.get_token = mock_get_token
+        spotirec.get_user_top_genres = mock_get_user_top_genres
+        spotirec.args = mock.MockArgs()
+        spotirec.init()
+        self.assertIs(spotirec.api.CACHE, spotirec.response_cache)
+        self.assertEqual(spotirec.response_cache.CACHE_DIR, 'tests/fixtures/.config/cache')
+        spotirec.args = mock.MockArgs(no_cache=True)
+        spotirec.init()
+        self.assertIsNone(spotirec.api.CACHE)
+        spotirec.get_token = get_token_save
+        spotirec.get_user_top_genres = top_genres_save
+
+    @ordered
+    def test_init_args_sqlite(self):
+        """
+        Testing init() with sqlite arg
+        """
+
+        def mock_get_token():
+            return 'f6952d6eef555ddd87aca66e56b91530222d6e318414816f3ba7cf5bf694bf0f'
+
+        def mock_get_user_top_genres():
+            return {'metal': 3, 'vapor-death-pop': 7, 'metalcore': 2, 'pop': 1, 'poo': 23}
+
+        get_token_save = spotirec.get_token
+        top_genres_save = spotirec.get_user_top_genres
+        conf_save = spotirec.conf
+        spotirec.get_token = mock_get_token
+        spotirec.get_user_top_genres = mock_get_user_top_genres
+        spotirec.args = mock.MockArgs(sqlite=True)
+        spotirec.init()
+        self.assertIsInstance(spotirec.conf, conf.SQLiteConfig)
+        self.assertEqual(spotirec.conf.CONFIG_DIR, conf_save.CONFIG_DIR)
+        self.assertEqual(spotirec.conf.CONFIG_FILE, conf_save.CONFIG_FILE)
+        self.assertIs(spotirec.api.CONF, spotirec.conf)
+        spotirec.conf = conf_save
+        spotirec.api.set_conf(conf_save)
+        spotirec.sp_oauth.set_conf(conf_save)
+        spotirec.get_token = get_token_save
+        spotirec.get_user_top_genres = top_genres_save
+
     @ordered
     def test_init_args_load_preset(self):
         """